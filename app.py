@@ -1,16 +1,37 @@
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 
 # Local imports
-from src.llm.model import initialize_llm
-from src.agent.math_agent import create_math_agent
-from src.memory.chat_memory import initialize_memory
+from src.core.solver import solve, get_session
+from src.llm.model import LLMConfigurationError
+from src.agent.resources import OBJECTS_BUILT
+from src.tools.registry import TOOL_NAMES
+from src.agent.router import get_route_stats
+from src.agent.prompt_budget import PromptBudgetHandler, get_compaction_stats, PROMPT_TOKENS_PER_REQUEST
+from src.agent.planner import PARALLEL_ANSWERS
+from src.memory.retrieval import RETRIEVAL_SECONDS
+from src.cache.tool_cache import get_tool_cache_stats
+from src.ui.streaming import FinalAnswerStreamHandler, LLM_TTFT, ANSWER_TTFT
+from src.ui.rendering import prepare_markdown
+from src.utils import metrics
+from src.utils.tracing import get_recent_traces
+from src.llm.providers import get_provider_status
+from src.llm.rate_limit import get_rate_limit_stats
 from src.ui.components import (
     setup_page_config,
     display_chat_history,
     display_memory_debug,
+    display_trace_waterfall,
+    display_rerun_stats,
+    display_tool_cache_stats,
+    display_latency_stats,
+    display_route_stats,
+    display_prompt_budget_stats,
+    display_llm_provider_stats,
     handle_clear_history,
     create_sidebar_options,
+    handle_dataset_upload,
     display_footer
 )
 
@@ -21,18 +42,31 @@ def main():
     # Set up the Streamlit app
     setup_page_config()
     
-    # Initialize the LLM
-    llm = initialize_llm()
+    # Track how many objects this rerun had to construct
+    objects_built_before = metrics.get_count(OBJECTS_BUILT)
     
-    # Initialize memory system
-    memory, msgs = initialize_memory()
+    # Identify this session for session-scoped caches and its stored history.
+    # The id travels in the URL, so a reload or another replica resumes the same session
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    session_id = st.session_state.session_id
+    if st.query_params.get("session") != session_id:
+        st.query_params["session"] = session_id
     
-    # Create the math agent
-    assistant_agent = create_math_agent(llm, memory)
+    # Load the session's memory; the shared LLM and tools are built once per process
+    try:
+        session = get_session(session_id)
+    except LLMConfigurationError as e:
+        st.error(str(e))
+        st.stop()
+    memory, msgs = session.memory, session.msgs
     
     # Create sidebar options
     create_sidebar_options()
     
+    # Allow uploading matrices and datasets for the tools
+    handle_dataset_upload(session_id)
+    
     # Display chat history
     display_chat_history(msgs)
     
@@ -42,20 +76,31 @@ def main():
     # Add a sidebar option to display conversation memory
     display_memory_debug(memory)
     
+    # Show where the last request of this session spent its time
+    trace_placeholder = st.sidebar.empty()
+    recent_traces = get_recent_traces(limit=1, session_id=session_id)
+    display_trace_waterfall(recent_traces[0] if recent_traces else None, trace_placeholder.container())
+    
+    # Show how much work this rerun did
+    display_rerun_stats(metrics.get_count(OBJECTS_BUILT) - objects_built_before)
+    display_tool_cache_stats(get_tool_cache_stats(TOOL_NAMES))
+    display_latency_stats({
+        "LLM time to first token": metrics.summarize(LLM_TTFT),
+        "Answer time to first token": metrics.summarize(ANSWER_TTFT),
+        "Memory retrieval": metrics.summarize(RETRIEVAL_SECONDS),
+    })
+    display_route_stats({**get_route_stats(), "parallel": metrics.get_count(PARALLEL_ANSWERS)})
+    display_prompt_budget_stats(metrics.summarize(PROMPT_TOKENS_PER_REQUEST), get_compaction_stats())
+    display_llm_provider_stats(get_provider_status(), get_rate_limit_stats())
+    
     # Set up layout for better chat experience
     chat_container = st.container()
     
     # Chat input handling
     if prompt := st.chat_input("Ask me a math problem...", key="chat_input"):
-        # Add user message to chat history for display
-        st.session_state.ui_messages.append({"role": "user", "content": prompt})
-        
         # Display user message in chat container
         with st.chat_message("user"):
-            st.markdown(prompt)
-        
-        # Store in LangChain's memory
-        msgs.add_user_message(prompt)
+            st.markdown(prepare_markdown(prompt))
         
         # Display assistant response in chat container
         with st.chat_message("assistant"):
@@ -69,24 +114,21 @@ def main():
             with st.spinner("Solving your math problem..."):
                 from langchain.callbacks import StreamlitCallbackHandler
                 st_cb = StreamlitCallbackHandler(callback_container, expand_new_thoughts=False)
+                stream_cb = FinalAnswerStreamHandler(message_placeholder)
+                budget_cb = PromptBudgetHandler()
                 
                 try:
-                    # Run the agent with input
-                    response = assistant_agent.run(input=prompt, callbacks=[st_cb])
-                    message_placeholder.markdown(response)
-                    
-                    # Add assistant response to both UI messages and LangChain memory
-                    st.session_state.ui_messages.append({"role": "assistant", "content": response})
-                    msgs.add_ai_message(response)
-                    
-                    # Optional: Extract and store mathematical concepts for enhanced memory
-                    # This would call a function to parse the response for math concepts
-                    
+                    # The same solver the HTTP server uses; this page only renders its answer
+                    result = solve(prompt, session_id, callbacks=[st_cb, stream_cb, budget_cb])
+                    if result.route == "agent":
+                        budget_cb.report()
+                    message_placeholder.markdown(prepare_markdown(result.answer))
+                    if result.trace:
+                        display_trace_waterfall(result.trace, trace_placeholder.container())
                 except Exception as e:
                     error_message = f"An error occurred: {str(e)}"
                     message_placeholder.markdown(error_message)
-                    st.session_state.ui_messages.append({"role": "assistant", "content": error_message})
-                    msgs.add_ai_message(error_message)
+                    memory.save_context({"input": prompt}, {"output": error_message})
     
     # Add a small footer
     display_footer()
@@ -8,10 +8,40 @@ import os
 LLM_MODEL = "Gemma2-9b-It"  # Consider using a more powerful model if available
 LLM_TEMPERATURE = 0.2  # Lower temperature for more precise math reasoning
 MAX_TOKENS = 4096  # Ensure enough tokens for complex explanations
+LLM_STREAMING = True  # Stream tokens so the final answer renders as it is generated
 
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# LLM provider settings
+OFFLINE_MODE = os.getenv("MATHGPT_OFFLINE", "false").lower() == "true"  # Use only local models and no network services
+LLM_PROVIDERS = [name.strip() for name in os.getenv("MATHGPT_LLM_PROVIDERS", "groq,llamacpp").split(",") if name.strip()]  # Tried in this order; later ones take over when earlier ones fail
+LLM_TASK_PROVIDERS = {
+    "expression": ["llamacpp"],  # Writing calculator expressions
+    "summary": ["llamacpp"],  # Summarizing older conversation turns
+}  # Cheap sub-tasks try these providers first, then fall back to the main model
+LLM_PROVIDER_TIMEOUT_SECONDS = 30  # A provider call slower than this fails over to the next provider
+LLM_PROVIDER_FAILURE_THRESHOLD = 2  # Consecutive failures before a provider is skipped
+LLM_PROVIDER_COOLDOWN_SECONDS = 30  # A skipped provider is tried again after this long
+LOCAL_MODEL_PATH = os.getenv("MATHGPT_LOCAL_MODEL", "")  # Quantized GGUF model for the llama.cpp provider
+LOCAL_MODEL_CONTEXT = 4096  # Context window of the local model (tokens)
+LOCAL_MODEL_MAX_TOKENS = 1024  # Longest reply from the local model
+LOCAL_MODEL_THREADS = int(os.getenv("MATHGPT_LOCAL_MODEL_THREADS", "0")) or None  # CPU threads (None lets llama.cpp choose)
+
+# LLM rate limiting, per provider (defaults are Groq's free-tier quotas for Gemma2-9b-It)
+LLM_RATE_LIMITS = {
+    "groq": {
+        "requests_per_minute": int(os.getenv("MATHGPT_GROQ_RPM", "30")),
+        "tokens_per_minute": int(os.getenv("MATHGPT_GROQ_TPM", "15000")),
+    },
+}
+LLM_RATE_LIMIT_MAX_WAIT_SECONDS = 20  # Calls that would wait longer for quota are shed (and fail over)
+LLM_RATE_LIMIT_MAX_QUEUED = 64  # Calls waiting for quota at once before more are shed
+LLM_EXPECTED_OUTPUT_TOKENS = 500  # Tokens reserved for a reply until its real usage is known
+LLM_RETRY_ATTEMPTS = 3  # Retries of rate-limited (429) and server (5xx) errors, replacing the client's own
+LLM_RETRY_BASE_SECONDS = 1.0  # Jittered exponential backoff base when the provider sends no reset header
+LLM_REQUEST_COALESCING = True  # Identical prompts in flight at the same time share one upstream call
+
 # Application settings
 APP_TITLE = "Advanced Math Problem Solver"
 APP_ICON = "🧮"
@@ -19,7 +49,94 @@ VERBOSE_AGENT = False  # Set to True to see agent's reasoning process
 
 # Memory settings
 MEMORY_KEY = "chat_messages"
-MEMORY_WINDOW_SIZE = 10  # Number of conversation turns to keep in memory
+CHAT_HISTORY_BACKEND = os.getenv("MATHGPT_CHAT_HISTORY_BACKEND", "sqlite")  # "sqlite" (shared, persistent), "streamlit" (session state) or "memory" (process only)
+CHAT_HISTORY_PATH = os.getenv("MATHGPT_CHAT_HISTORY", os.path.join("data", "history", "chat.sqlite3"))
+CHAT_HISTORY_PAGE_SIZE = 20  # Messages shown at first; "Load earlier messages" adds another page
+MEMORY_WINDOW_SIZE = 2  # Number of recent conversation turns kept verbatim (older ones are retrieved)
+MEMORY_MAX_TOKENS = 1500  # Hard cap on what memory injects into the prompt
+MEMORY_SUMMARY_MAX_TOKENS = 400  # Older turns are folded into a running summary of at most this size
+MATH_CONTEXT_MAX_ENTRIES = 200  # Variables/equations/concepts indexed per kind before the oldest are evicted
+MATH_CONTEXT_MAX_TOKENS = 200  # Budget for the relevant math context injected with each question
+
+# Retrieval over past turns
+RETRIEVAL_ENABLED = True  # Retrieve relevant turns that have left the verbatim window
+RETRIEVAL_DIR = os.getenv("MATHGPT_RETRIEVAL_DIR", os.path.join("data", "memory"))  # Per-session vector stores
+RETRIEVAL_TOP_K = 3  # Past turns retrieved per question
+RETRIEVAL_MIN_SCORE = 0.05  # Cosine similarity below which a turn is not relevant (about 0.3 suits a dense model)
+RETRIEVAL_MAX_TOKENS = 500  # Budget for retrieved turns in the prompt
+EMBEDDING_MODEL = os.getenv("MATHGPT_EMBEDDING_MODEL", "")  # sentence-transformers model name; empty uses hashed TF-IDF
+EMBEDDING_DIM = 1024  # Dimensions of the hashed TF-IDF vectors
+
+# Engine settings
+CAS_CACHE_SIZE = 256  # Parsed/simplified SymPy expressions kept in the LRU cache
+CAS_TIMEOUT_SECONDS = 10  # A symbolic computation taking longer is abandoned and the LLM answers instead
+CAS_MAX_WORKERS = 4  # Symbolic computations running at once, including abandoned ones still finishing
+UPLOAD_DIR = os.getenv("MATHGPT_UPLOAD_DIR", os.path.join("data", "uploads"))  # Uploaded CSV/NPY files
+
+# Response cache settings
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_PATH = os.getenv("MATHGPT_RESPONSE_CACHE", os.path.join("data", "cache", "responses.sqlite3"))
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # Cached answers expire after a week
+RESPONSE_CACHE_MAX_ENTRIES = 10000  # Least recently used answers are evicted beyond this
+
+# Tool result memoization: "none", "request", "session" or "global" per tool
+TOOL_CACHE_POLICIES = {
+    "Calculator": "global",
+    "Wikipedia": "global",
+    "Calculus": "global",
+    "LinearAlgebra": "session",  # May reference uploaded files
+    "Statistics": "session",  # May reference uploaded files
+    "Reasoning tool": "request",
+    "ComplexProblemSolver": "request",
+}
+TOOL_CACHE_DEFAULT_POLICY = "request"
+TOOL_CACHE_MAX_ENTRIES = 512
+TOOL_CACHE_TTL_SECONDS = 60 * 60
+
+# Agent execution pool shared by all sessions
+AGENT_MAX_IN_FLIGHT = 8  # Concurrent agent runs per process
+AGENT_MAX_QUEUED = 32  # Requests waiting beyond this are rejected
+AGENT_REQUEST_TIMEOUT_SECONDS = 120
+
+# Solver core and HTTP server settings
+SESSION_CACHE_SIZE = 256  # Sessions whose memory and agent stay loaded per process (others reload from storage)
+SERVER_HOST = os.getenv("MATHGPT_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("MATHGPT_SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("MATHGPT_SERVER_WORKERS", "2"))  # Solver processes; 0 solves in the server process
+SERVER_MAX_PENDING = 64  # Requests accepted but not yet answered; more are rejected with 503
+SERVER_WORKER_THREADS = AGENT_MAX_IN_FLIGHT + AGENT_MAX_QUEUED  # Requests each worker process handles at once; its agent pool bounds and sheds them
+SERVER_HEARTBEAT_SECONDS = 1.0  # How often each worker process reports that it is responsive
+SERVER_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("MATHGPT_SERVER_HEARTBEAT_TIMEOUT_SECONDS", "30"))  # A worker silent this long is restarted
+
+# Request tracing settings
+TRACING_ENABLED = True  # Record a span trace (stages, agent iterations, tool and LLM calls) for every request
+TRACE_LOG_PATH = os.getenv("MATHGPT_TRACE_LOG", os.path.join("data", "traces", "traces.jsonl"))  # Empty disables the file export
+TRACE_LOG_MAX_BYTES = 50 * 1024 * 1024  # The log is rotated to <path>.1 beyond this size
+TRACE_HISTORY_SIZE = 100  # Recent traces kept in memory for the sidebar and /traces
+
+# Batch runner settings
+BATCH_CONCURRENCY = 4  # Problems solved at the same time
+BATCH_RATE_LIMIT_PER_SECOND = 0  # Maximum problems started per second (0 for no limit)
+
+# Wikipedia tool settings
+WIKIPEDIA_INDEX_PATH = os.getenv("MATHGPT_WIKIPEDIA_INDEX", os.path.join("data", "wikipedia", "math.sqlite3"))
+WIKIPEDIA_LIVE_FALLBACK = os.getenv("MATHGPT_WIKIPEDIA_LIVE_FALLBACK", str(not OFFLINE_MODE)).lower() == "true"  # Disable when air-gapped
+WIKIPEDIA_TOP_K = 3  # Articles returned per search
+WIKIPEDIA_MAX_CHARS = 4000  # Characters of article text returned per search
+
+# Query router settings
+ROUTER_ENABLED = True  # Answer single-step problems directly with a tool
+ROUTER_MAX_DIRECT_WORDS = 40  # Longer questions always go to the agent
+
+# Plan-and-execute settings
+PLAN_EXECUTE_ENABLED = True  # Solve multi-part questions by running their parts concurrently
+PLAN_MAX_PARALLEL = 4  # Sub-problems of one question solved at the same time
+PLAN_MAX_STEPS = 6  # Sub-problems per plan
+PLAN_RESULT_TOKENS = 300  # Size of an earlier result substituted into a dependent step
+
+# Prompt budget settings
+PROMPT_COMPACTION_ENABLED = True  # Compact tool observations before they enter the agent scratchpad
+OBSERVATION_TOKEN_BUDGET = 600  # Maximum (estimated) tokens kept per tool observation
 
 # Welcome message
 WELCOME_MESSAGE = """Hi, I'm an Advanced Math Problem Solver that can help with everything from basic arithmetic to calculus, linear algebra, statistics, and more.
@@ -37,6 +154,14 @@ CLEAR_HISTORY_MESSAGE = "Chat history cleared. What math problem can I help you
 # Footer info
 FOOTER_TEXT = "Developed by Siddhartha Pathak | Enhanced Math Edition"
 
+# Example problems shown in the sidebar
+EXAMPLE_PROBLEMS = [
+    "Solve the quadratic equation: 2x² + 5x - 3 = 0",
+    "Find the derivative of f(x) = x³ - 4x² + 7x - 9",
+    "Calculate the eigenvalues of matrix [[4, 2], [1, 3]]",
+    "What's the probability of getting at least 2 heads in 5 coin flips?"
+]
+
 # Math domains supported
 SUPPORTED_MATH_DOMAINS = [
     "Arithmetic",
@@ -0,0 +1,247 @@
+"""
+Asynchronous agent execution with bounded concurrency.
+
+All sessions share one asyncio event loop running on a background thread.
+A semaphore caps how many agent runs are in flight, a bounded queue sheds
+load beyond that, and each run has a timeout. Callers on other threads
+(such as the Streamlit script thread) submit work and block only on their
+own result, while UI callbacks are replayed on the caller's thread.
+"""
+
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from src.utils import metrics
+from config.settings import AGENT_MAX_IN_FLIGHT, AGENT_MAX_QUEUED, AGENT_REQUEST_TIMEOUT_SECONDS
+
+QUEUE_WAIT = "agent_pool.queue_wait_seconds"
+RUN_TIME = "agent_pool.run_seconds"
+SHED = "agent_pool.shed"
+TIMEOUTS = "agent_pool.timeouts"
+
+# How often the caller checks for replayed callbacks while waiting
+CALLBACK_POLL_SECONDS = 0.05
+
+class AgentPoolFullError(RuntimeError):
+    """Raised when a request is rejected because the queue is full."""
+
+class AgentTimeoutError(TimeoutError):
+    """Raised when an agent run exceeds its timeout."""
+
+class DeferredCallbackHandler(BaseCallbackHandler):
+    """
+    Forward callback events to a queue so they can be replayed on another thread.
+    
+    UI frameworks like Streamlit only allow updates from the thread that owns
+    the page, so events raised on the event loop thread are queued instead.
+    """
+    
+    run_inline = True
+    
+    def __init__(self, handler, events):
+        """
+        Initialize the handler.
+        
+        Args:
+            handler: The callback handler to replay events on
+            events: The queue (handler, event name, args, kwargs) tuples are put on
+        """
+        self.handler = handler
+        self.events = events
+        for name in ("ignore_llm", "ignore_chain", "ignore_agent", "ignore_retriever",
+                     "ignore_chat_model", "ignore_retry", "ignore_custom_event"):
+            setattr(self, name, getattr(handler, name, False))
+    
+    # Handlers are queried as properties by the callback manager
+    ignore_llm = ignore_chain = ignore_agent = ignore_retriever = False
+    ignore_chat_model = ignore_retry = ignore_custom_event = False
+    
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        """Forward chat model starts, or let the manager fall back to on_llm_start."""
+        if type(self.handler).on_chat_model_start is BaseCallbackHandler.on_chat_model_start:
+            raise NotImplementedError
+        self.events.put((self.handler, "on_chat_model_start", (serialized, messages), kwargs))
+
+def _make_forwarder(name):
+    def forward(self, *args, **kwargs):
+        self.events.put((self.handler, name, args, kwargs))
+    forward.__name__ = name
+    return forward
+
+for _name in dir(BaseCallbackHandler):
+    if _name.startswith("on_") and _name != "on_chat_model_start":
+        setattr(DeferredCallbackHandler, _name, _make_forwarder(_name))
+
+def replay_events(events):
+    """
+    Replay queued callback events on the current thread.
+    
+    Args:
+        events: The queue filled by DeferredCallbackHandler instances
+    """
+    while True:
+        try:
+            handler, name, args, kwargs = events.get_nowait()
+        except queue.Empty:
+            return
+        getattr(handler, name)(*args, **kwargs)
+
+class AgentPool:
+    """Run agents on a shared event loop with bounded concurrency and timeouts."""
+    
+    def __init__(self, max_in_flight=AGENT_MAX_IN_FLIGHT, max_queued=AGENT_MAX_QUEUED,
+                 timeout=AGENT_REQUEST_TIMEOUT_SECONDS):
+        """Start the background event loop."""
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._counts_lock = threading.Lock()
+        
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-pool", daemon=True)
+        self._thread.start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(self._create_semaphore(), self._loop).result()
+    
+    async def _create_semaphore(self):
+        return asyncio.Semaphore(self.max_in_flight)
+    
+    def _admit(self):
+        with self._counts_lock:
+            if self.queued >= self.max_queued:
+                metrics.increment(SHED)
+                raise AgentPoolFullError("Too many requests are waiting; please try again shortly.")
+            self.queued += 1
+    
+    async def arun(self, agent, inputs, callbacks=None, timeout=None):
+        """
+        Run an agent asynchronously within the pool's limits.
+        
+        Must be awaited on the pool's event loop (use submit from other threads).
+        
+        Args:
+            agent: The agent executor to run
+            inputs: The agent inputs, e.g. {"input": question}
+            callbacks: Callback handlers for the run
+            timeout: Seconds before the run is cancelled (defaults to the pool timeout)
+            
+        Returns:
+            str: The agent's output
+        """
+        self._admit()
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            with self._counts_lock:
+                self.queued -= 1
+        
+        started = time.perf_counter()
+        metrics.observe(QUEUE_WAIT, started - queued_at)
+        for handler in callbacks or []:
+            if hasattr(handler, "on_queue_wait"):
+                handler.on_queue_wait(started - queued_at)
+        with self._counts_lock:
+            self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(
+                agent.ainvoke(inputs, config={"callbacks": callbacks or []}),
+                timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError as e:
+            metrics.increment(TIMEOUTS)
+            raise AgentTimeoutError(f"The request timed out after {timeout or self.timeout} seconds.") from e
+        finally:
+            with self._counts_lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+            metrics.observe(RUN_TIME, time.perf_counter() - started)
+        return result["output"]
+    
+    async def _arun_in_context(self, context, *args):
+        # Tasks start from the loop thread's context; restore the submitter's
+        # context variables (e.g. the tool cache scope) inside this task
+        for variable, value in context.items():
+            variable.set(value)
+        return await self.arun(*args)
+    
+    def submit(self, agent, inputs, callbacks=None, timeout=None):
+        """
+        Submit an agent run from any thread.
+        
+        Context variables of the calling thread are visible to the run.
+        
+        Returns:
+            concurrent.futures.Future: Resolves to the agent's output
+        """
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(
+            self._arun_in_context(context, agent, inputs, callbacks, timeout),
+            self._loop
+        )
+    
+    def run(self, agent, question, callbacks=None, timeout=None):
+        """
+        Run an agent on the pool and wait for its answer on the calling thread.
+        
+        The agent's memory is read and written on the calling thread, and
+        callback events are replayed there, so thread-bound state such as
+        Streamlit session state and page elements is never touched from
+        the event loop. Handlers with a true `thread_safe` attribute are
+        called directly instead.
+        
+        Args:
+            agent: The agent executor to run
+            question: The user's question
+            callbacks: Callback handlers for the run
+            timeout: Seconds before the run is cancelled
+            
+        Returns:
+            str: The agent's output
+        """
+        events = queue.Queue()
+        # Thread-safe handlers (such as tracers) see events as they happen; others are replayed here
+        deferred = [
+            handler if getattr(handler, "thread_safe", False) else DeferredCallbackHandler(handler, events)
+            for handler in callbacks or []
+        ]
+        
+        inputs = {"input": question}
+        memory = agent.memory
+        if memory is not None:
+            agent = agent.model_copy(update={"memory": None})
+            inputs.update(memory.load_memory_variables(inputs))
+        
+        future = self.submit(agent, inputs, deferred, timeout)
+        while not future.done():
+            try:
+                handler, name, args, kwargs = events.get(timeout=CALLBACK_POLL_SECONDS)
+                getattr(handler, name)(*args, **kwargs)
+            except queue.Empty:
+                pass
+        replay_events(events)
+        
+        output = future.result()
+        if memory is not None:
+            memory.save_context({"input": question}, {"output": output})
+        return output
+    
+    def stats(self):
+        """
+        Get the pool's current load.
+        
+        Returns:
+            dict: in_flight, queued and the configured limits
+        """
+        with self._counts_lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+            }
@@ -2,63 +2,82 @@
 Enhanced math problem solving agent configuration.
 """
 
-from langchain.agents.agent_types import AgentType
-from langchain.agents import initialize_agent, AgentExecutor, load_tools
-from src.tools.calculator import create_calculator_tool
-from src.tools.wikipedia import create_wikipedia_tool
-from src.tools.reasoning import create_reasoning_tool
-from src.tools.advanced_math import (
-    create_calculus_tool,
-    create_linear_algebra_tool, 
-    create_statistics_tool,
-    create_chain_of_thought_tool
-)
+from src.tools.registry import TOOL_SPECS, create_lazy_tools
+from src.cache.tool_cache import memoize_tool
+from src.agent.prompt_budget import compact_tool
 from src.prompts.templates import get_system_message
-from config.settings import VERBOSE_AGENT
+from config.settings import VERBOSE_AGENT, PROMPT_COMPACTION_ENABLED, PLAN_EXECUTE_ENABLED
 
-def create_math_agent(llm, memory):
+# ReAct suffix with the conversation history injected before the question
+CONVERSATION_SUFFIX = """Begin!
+
+Previous conversation:
+{chat_history}
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+def build_math_tools(llm, expression_llm=None):
+    """
+    Build the stateless math tools used by the agent.
+    
+    The tools hold no per-session state, so the result can be shared by
+    every agent in the process. Each tool is declared in the tool registry
+    and only imported and built on its first call.
+    
+    Args:
+        llm: The language model to use for the tools
+        expression_llm: Cheaper model that only writes calculator expressions (defaults to llm)
+        
+    Returns:
+        list: The initialized tools
+    """
+    models = {"main": llm, "expression": expression_llm or llm}
+    
+    # Independent sub-problems of a complex problem run concurrently on the step tools.
+    # The planning tool reads this list when it is built, after it has been filled in
+    step_tools = []
+    all_tools = create_lazy_tools(models, step_tools=step_tools)
+    if PLAN_EXECUTE_ENABLED:
+        step_names = {spec.name for spec in TOOL_SPECS if spec.step}
+        step_tools.extend(memoize_tool(tool) for tool in all_tools if tool.name in step_names)
+    
+    # Serve repeated tool calls from cache according to each tool's policy
+    return [memoize_tool(tool) for tool in all_tools]
+
+def create_math_agent(llm, memory, tools=None):
     """
     Create and return an enhanced math problem solving agent.
     
     Args:
         llm: The language model to use for the agent
         memory: The memory system for the agent
+        tools: Prebuilt tools to reuse (built from the llm if not provided)
         
     Returns:
         Agent: The initialized math problem solving agent
     """
-    # Initialize standard tools
-    calculator_tool = create_calculator_tool(llm)
-    wikipedia_tool = create_wikipedia_tool()
-    reasoning_tool = create_reasoning_tool(llm)
+    all_tools = tools if tools is not None else build_math_tools(llm)
     
-    # Initialize advanced math tools
-    calculus_tool = create_calculus_tool(llm)
-    linear_algebra_tool = create_linear_algebra_tool(llm)
-    statistics_tool = create_statistics_tool(llm)
-    cot_tool = create_chain_of_thought_tool(llm)
-    
-    # Additional LangChain tools that might be useful
-    additional_tools = load_tools(
-        ["llm-math"],
-        llm=llm
-    )
-    
-    # Compile all tools
-    all_tools = [
-        calculator_tool, 
-        wikipedia_tool, 
-        reasoning_tool,
-        calculus_tool,
-        linear_algebra_tool,
-        statistics_tool,
-        cot_tool,
-        *additional_tools
-    ]
+    # Observations are re-sent on every later iteration, so keep them short
+    if PROMPT_COMPACTION_ENABLED:
+        all_tools = [compact_tool(tool) for tool in all_tools]
     
     # Get system message
     system_message = get_system_message()
     
+    agent_kwargs = {
+        "system_message": system_message
+    }
+    # Give the prompt a slot for the conversation history the memory provides
+    if memory is not None:
+        agent_kwargs["suffix"] = CONVERSATION_SUFFIX
+        agent_kwargs["input_variables"] = ["input", "chat_history", "agent_scratchpad"]
+    
+    # The agent framework is slow to import, so it is loaded with the first agent
+    from langchain.agents import initialize_agent
+    from langchain.agents.agent_types import AgentType
+    
     # Initialize the agent with memory and enhanced system message
     agent = initialize_agent(
         tools=all_tools,
@@ -67,9 +86,7 @@ def create_math_agent(llm, memory):
         verbose=VERBOSE_AGENT,
         handle_parsing_errors=True,
         memory=memory,
-        agent_kwargs={
-            "system_message": system_message
-        },
+        agent_kwargs=agent_kwargs,
         max_iterations=6,  # Allow more iterations for complex math problems
         early_stopping_method="generate"  # Better handling of complex reasoning
     )
@@ -0,0 +1,372 @@
+"""
+Plan-and-execute solving of multi-part problems.
+
+A question is decomposed into a small DAG of sub-problems, each assigned to
+one of the math tools. Sub-problems whose dependencies are satisfied run
+concurrently, so a multi-part question takes about as long as its slowest
+part instead of the sum of all parts.
+
+Questions that are already split into parts ("(a) ... (b) ...", numbered
+lines, several questions in a row) are planned locally without an LLM call.
+Other problems can be planned by the LLM, which may chain steps by
+referring to earlier results as {s1}, {s2}, ...
+"""
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+
+from langchain_core.prompts import PromptTemplate
+from src.agent.router import classify_question, ROUTE_TOOLS, AGENT_ROUTE
+from src.memory.math_context import BACK_REFERENCE
+from src.utils import metrics
+from src.utils.tokens import truncate_to_tokens
+from config.settings import PLAN_MAX_PARALLEL, PLAN_MAX_STEPS, PLAN_RESULT_TOKENS
+
+PARALLEL_ANSWERS = "planner.parallel_answers"
+PLAN_STEPS = "planner.steps"
+
+# Tools a plan may use
+PLANNABLE_TOOLS = ("Calculator", "Calculus", "LinearAlgebra", "Statistics", "Reasoning tool")
+
+# "(a) ...", "b) ...", "1. ...", "(ii) ..." at the start of the text or after whitespace
+PART_MARKER = re.compile(r"(?:^|(?<=\s))\(?([a-h]|[1-9]|i{1,3}|iv|v|vi)[).]\s+", re.IGNORECASE)
+# Part labels in order, for each numbering style
+PART_SEQUENCES = (tuple("abcdefgh"), tuple("123456789"), ("i", "ii", "iii", "iv", "v", "vi"))
+
+PLACEHOLDER = re.compile(r"\{(s\d+)\}")
+
+PLAN_PROMPT = PromptTemplate(
+    input_variables=["question", "tools"],
+    template="""Break the math problem below into at most {max_steps} sub-problems that can each be solved by one tool.
+Independent sub-problems must not depend on each other, so they can be solved at the same time.
+A sub-problem that needs an earlier result refers to it as {{s1}}, {{s2}}, ... in its input.
+
+Tools: {tools}
+
+Problem: {question}
+
+Reply with only a JSON list, for example:
+[{{"id": "s1", "tool": "Calculus", "input": "derivative of x^2", "depends_on": []}},
+ {{"id": "s2", "tool": "Calculator", "input": "evaluate {{s1}} at x = 3", "depends_on": ["s1"]}}]
+""",
+    partial_variables={"max_steps": str(PLAN_MAX_STEPS)}
+)
+
+MERGE_PROMPT = PromptTemplate(
+    input_variables=["question", "results"],
+    template="""You are an expert mathematician. The problem below was split into sub-problems that have already been solved.
+
+Problem: {question}
+
+Solved sub-problems:
+{results}
+
+Combine them into one complete, step-by-step solution with a clear final answer. Do not change the computed results.
+"""
+)
+
+class PlanError(ValueError):
+    """Raised when a plan is malformed (unknown steps or tools, or a cycle)."""
+
+@dataclass
+class PlanStep:
+    """One sub-problem of a plan."""
+
+    id: str
+    tool: str
+    input: str
+    depends_on: tuple = field(default_factory=tuple)
+    label: str = ""
+
+def _part_markers(question):
+    # Keep only markers that count up from the first label ("x = 1. Then" is not a part)
+    for sequence in PART_SEQUENCES:
+        markers = []
+        for marker in PART_MARKER.finditer(question):
+            if marker.group(1).lower() == sequence[len(markers)]:
+                markers.append(marker)
+                if len(markers) == len(sequence):
+                    break
+        if len(markers) >= 2:
+            return markers
+    return []
+
+def split_question_parts(question):
+    """
+    Split a question that is already written as several parts.
+
+    Text before the first part marker (for example the data the parts share)
+    is prepended to every part.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        list: (label, part text) tuples; a single tuple if the question has no parts
+    """
+    markers = _part_markers(question)
+    if len(markers) >= 2:
+        preamble = question[:markers[0].start()].strip()
+        parts = []
+        for index, marker in enumerate(markers):
+            end = markers[index + 1].start() if index + 1 < len(markers) else len(question)
+            text = question[marker.end():end].strip().rstrip(";,")
+            parts.append((f"({marker.group(1)})", f"{preamble} {text}".strip() if preamble else text))
+        return parts
+
+    # Several questions in a row: "What is 2^10? What is the integral of x^2?"
+    questions = [part.strip() for part in re.findall(r"[^?]+\?", question)]
+    if len(questions) >= 2 and not question[question.rfind("?") + 1:].strip():
+        return [(f"({index + 1})", text) for index, text in enumerate(questions)]
+    return [("", question.strip())]
+
+def plan_locally(question, context_index=None):
+    """
+    Plan a question that is already split into independent, tool-sized parts.
+
+    Args:
+        question: The user's question
+        context_index: The session's MathContextIndex, if any
+
+    Returns:
+        list: PlanStep objects, or None if the question cannot be planned without the LLM
+    """
+    parts = split_question_parts(question)
+    if not 2 <= len(parts) <= PLAN_MAX_STEPS:
+        return None
+
+    steps = []
+    for index, (label, text) in enumerate(parts):
+        if index > 0 and BACK_REFERENCE.search(text):
+            return None
+        route = classify_question(text, context_index)
+        if route == AGENT_ROUTE:
+            return None
+        steps.append(PlanStep(id=f"s{index + 1}", tool=ROUTE_TOOLS[route], input=text, label=label))
+    return steps
+
+def parse_plan(text, tool_names=PLANNABLE_TOOLS):
+    """
+    Parse and validate a plan written by the LLM.
+
+    Args:
+        text: The LLM output containing a JSON list of steps
+        tool_names: Tools a step may use
+
+    Returns:
+        list: PlanStep objects in dependency order (a step depends on every
+            step it refers to as {sN}, even if depends_on leaves it out)
+    """
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match is None:
+        raise PlanError("The plan contains no JSON list")
+    try:
+        raw_steps = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise PlanError(f"The plan is not valid JSON: {e}") from e
+
+    steps = []
+    for raw in raw_steps[:PLAN_MAX_STEPS]:
+        if not isinstance(raw, dict) or not raw.get("input"):
+            raise PlanError("Every step needs an input")
+        tool = raw.get("tool")
+        if tool not in tool_names:
+            raise PlanError(f"Unknown tool in plan: {tool}")
+        step_input = str(raw["input"])
+        declared = [str(dependency) for dependency in raw.get("depends_on") or ()]
+        # A step waits for every step whose result it uses, listed or not
+        referenced = PLACEHOLDER.findall(step_input)
+        steps.append(PlanStep(
+            id=str(raw.get("id") or f"s{len(steps) + 1}"),
+            tool=tool,
+            input=step_input,
+            depends_on=tuple(dict.fromkeys(declared + referenced)),
+        ))
+    return order_steps(steps)
+
+def order_steps(steps):
+    """
+    Sort steps so every step comes after its dependencies.
+
+    Args:
+        steps: The plan's steps
+
+    Returns:
+        list: The steps in dependency order
+    """
+    by_id = {step.id: step for step in steps}
+    if len(by_id) != len(steps):
+        raise PlanError("Step ids must be unique")
+    for step in steps:
+        missing = [dependency for dependency in step.depends_on if dependency not in by_id]
+        if missing:
+            raise PlanError(f"Step {step.id} depends on unknown steps: {', '.join(missing)}")
+
+    ordered, done = [], set()
+    remaining = list(steps)
+    while remaining:
+        ready = [step for step in remaining if set(step.depends_on) <= done]
+        if not ready:
+            raise PlanError("The plan has a dependency cycle")
+        ordered.extend(ready)
+        done.update(step.id for step in ready)
+        remaining = [step for step in remaining if step.id not in done]
+    return ordered
+
+def _fill_placeholders(text, results):
+    return PLACEHOLDER.sub(
+        lambda match: truncate_to_tokens(results[match.group(1)], PLAN_RESULT_TOKENS) if match.group(1) in results else match.group(0),
+        text
+    )
+
+async def aexecute_plan(steps, tools, max_parallel=PLAN_MAX_PARALLEL, callbacks=None):
+    """
+    Run a plan, starting each step as soon as its dependencies are done.
+
+    Args:
+        steps: PlanStep objects in dependency order
+        tools: The available tools
+        max_parallel: Steps allowed to run at the same time
+        callbacks: Callback handlers for the tool runs
+
+    Returns:
+        dict: {step id: result text}
+    """
+    tools_by_name = {}
+    for tool in tools:
+        # The first tool with a name wins, as in the router
+        tools_by_name.setdefault(tool.name, tool)
+    semaphore = asyncio.Semaphore(max_parallel)
+    results = {}
+    tasks = {}
+
+    async def run_step(step):
+        if step.depends_on:
+            await asyncio.gather(*(tasks[dependency] for dependency in step.depends_on))
+        tool_input = _fill_placeholders(step.input, results)
+        async with semaphore:
+            try:
+                result = await tools_by_name[step.tool].arun(tool_input, callbacks=callbacks)
+            except Exception as e:
+                # One failed part should not sink the others
+                result = f"Could not solve this part: {e}"
+        results[step.id] = str(result)
+
+    for step in steps:
+        tasks[step.id] = asyncio.ensure_future(run_step(step))
+    await asyncio.gather(*tasks.values())
+    metrics.increment(PLAN_STEPS, len(steps))
+    return results
+
+def format_results(steps, results):
+    """
+    Lay out the results of a plan step by step.
+
+    Args:
+        steps: The plan's steps
+        results: {step id: result text}
+
+    Returns:
+        str: The combined answer
+    """
+    sections = []
+    for index, step in enumerate(steps):
+        heading = f"**Part {step.label or index + 1}**: {step.input}"
+        sections.append(f"{heading}\n\n{results[step.id]}")
+    return "\n\n".join(sections)
+
+async def aanswer_in_parallel(question, tools, callbacks=None, context_index=None):
+    """
+    Answer a question made of independent parts by solving the parts concurrently.
+
+    Args:
+        question: The user's question
+        tools: The available tools
+        callbacks: Callback handlers for the tool runs
+        context_index: The session's MathContextIndex, if any
+
+    Returns:
+        str or None: The combined answer, or None if the question has no independent parts
+    """
+    steps = plan_locally(question, context_index)
+    available = {tool.name for tool in tools}
+    if steps is None or any(step.tool not in available for step in steps):
+        return None
+    results = await aexecute_plan(steps, tools, callbacks=callbacks)
+    metrics.increment(PARALLEL_ANSWERS)
+    return format_results(steps, results)
+
+def answer_in_parallel(question, tools, callbacks=None, context_index=None):
+    """
+    Synchronous version of aanswer_in_parallel for threads without a running event loop.
+
+    Callbacks fire on the calling thread.
+    """
+    if plan_locally(question, context_index) is None:
+        return None
+    return asyncio.run(aanswer_in_parallel(question, tools, callbacks=callbacks, context_index=context_index))
+
+class PlanAndExecuteSolver:
+    """Decompose a problem into a DAG of tool calls, run it concurrently and merge the results."""
+
+    def __init__(self, llm, tools, fallback_chain):
+        """
+        Initialize the solver.
+
+        Args:
+            llm: The language model used to plan and merge
+            tools: The tools steps may use
+            fallback_chain: Chain that solves the problem in one call when no useful plan exists
+        """
+        from langchain.chains import LLMChain
+
+        self.tools = [tool for tool in tools if tool.name in PLANNABLE_TOOLS]
+        self.plan_chain = LLMChain(llm=llm, prompt=PLAN_PROMPT)
+        self.merge_chain = LLMChain(llm=llm, prompt=MERGE_PROMPT)
+        self.fallback_chain = fallback_chain
+
+    async def aplan(self, question):
+        """
+        Plan a problem, locally if it is already split into parts, otherwise with the LLM.
+
+        Args:
+            question: The problem
+
+        Returns:
+            tuple: (steps, planned_locally), with steps None if no multi-step plan was found
+        """
+        steps = plan_locally(question)
+        if steps is not None:
+            return steps, True
+        tool_names = [tool.name for tool in self.tools]
+        try:
+            steps = parse_plan(await self.plan_chain.arun(question=question, tools=", ".join(tool_names)), tool_names)
+        except PlanError:
+            return None, False
+        return (steps if len(steps) >= 2 else None), False
+
+    async def arun(self, question):
+        """
+        Solve a problem with plan-and-execute, falling back to a single chain call.
+
+        Args:
+            question: The problem
+
+        Returns:
+            str: The solution
+        """
+        steps, planned_locally = await self.aplan(question)
+        if steps is None:
+            return await self.fallback_chain.arun(question)
+
+        results = await aexecute_plan(steps, self.tools)
+        if planned_locally:
+            return format_results(steps, results)
+        summary = "\n\n".join(f"[{step.id}] {step.tool}: {step.input}\n{results[step.id]}" for step in steps)
+        return await self.merge_chain.arun(question=question, results=summary)
+
+    def run(self, question):
+        """Synchronous version of arun for threads without a running event loop."""
+        return asyncio.run(self.arun(question))
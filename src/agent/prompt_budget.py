@@ -0,0 +1,160 @@
+"""
+Prompt size accounting and compaction for the agent.
+
+Every ReAct iteration re-sends the prompt prefix, the tool descriptions and
+the growing scratchpad, so long tool observations are paid for again on
+each later iteration. This module measures prompt size per LLM call and
+compacts tool observations before they enter the scratchpad.
+"""
+
+import hashlib
+import re
+
+from langchain_core.tools import Tool
+from langchain_core.callbacks import BaseCallbackHandler
+from src.cache.tool_cache import get_request_state
+from src.utils import metrics
+from src.utils.tokens import estimate_tokens, CHARS_PER_TOKEN
+from config.settings import OBSERVATION_TOKEN_BUDGET
+
+PROMPT_TOKENS_PER_CALL = "prompt.tokens_per_call"
+PROMPT_TOKENS_PER_REQUEST = "prompt.tokens_per_request"
+ORIGINAL_TOKENS = "prompt.compaction.original_tokens"
+SAVED_TOKENS = "prompt.compaction.saved_tokens"
+
+# Share of the budget kept from the start of a long observation; the rest comes from its end
+HEAD_FRACTION = 0.8
+
+class PromptBudgetHandler(BaseCallbackHandler):
+    """Record the prompt size of every LLM call in one request."""
+    
+    def __init__(self):
+        """Initialize an empty per-request record."""
+        self.calls = []
+    
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        """Measure a completion-style prompt."""
+        self._record(sum(estimate_tokens(prompt) for prompt in prompts))
+    
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        """Measure a chat prompt."""
+        self._record(sum(estimate_tokens(str(message.content)) for batch in messages for message in batch))
+    
+    def _record(self, tokens):
+        self.calls.append(tokens)
+        metrics.observe(PROMPT_TOKENS_PER_CALL, tokens)
+    
+    def report(self):
+        """
+        Summarize this request's prompt sizes and record the total.
+        
+        Returns:
+            dict: Number of calls, total prompt tokens and tokens per call
+        """
+        total = sum(self.calls)
+        metrics.observe(PROMPT_TOKENS_PER_REQUEST, total)
+        return {"calls": len(self.calls), "total_prompt_tokens": total, "per_call": list(self.calls)}
+
+def deduplicate_lines(text):
+    """
+    Drop repeated paragraphs and lines, keeping the first occurrence.
+    
+    Args:
+        text: The text to deduplicate
+        
+    Returns:
+        str: The text without repeats
+    """
+    seen = set()
+    kept = []
+    for line in text.splitlines():
+        key = " ".join(line.split()).lower()
+        if key and key in seen:
+            continue
+        if key:
+            seen.add(key)
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept))
+
+def compact_observation(text, budget=OBSERVATION_TOKEN_BUDGET):
+    """
+    Shrink a tool observation to fit a token budget.
+    
+    Repeated lines are removed first; if the text is still too long, its
+    beginning and end are kept and the middle is replaced by a marker.
+    
+    Args:
+        text: The tool observation
+        budget: Maximum tokens to keep
+        
+    Returns:
+        str: The compacted observation
+    """
+    text = deduplicate_lines(text)
+    if estimate_tokens(text) <= budget:
+        return text
+    
+    max_chars = budget * CHARS_PER_TOKEN
+    head = text[:int(max_chars * HEAD_FRACTION)]
+    tail = text[len(text) - (max_chars - len(head)):]
+    omitted = estimate_tokens(text) - estimate_tokens(head) - estimate_tokens(tail)
+    return f"{head}\n[... {omitted} tokens omitted ...]\n{tail}"
+
+def _compact(tool_name, output, budget):
+    output = str(output)
+    original_tokens = estimate_tokens(output)
+    
+    # Identical observations within one request are only shown once
+    state = get_request_state()
+    if state is not None:
+        seen = state.setdefault("seen_observations", set())
+        digest = hashlib.sha1(output.encode("utf-8")).hexdigest()
+        if digest in seen:
+            compacted = f"Same result as the earlier {tool_name} call above."
+        else:
+            seen.add(digest)
+            compacted = compact_observation(output, budget)
+    else:
+        compacted = compact_observation(output, budget)
+    
+    metrics.increment(ORIGINAL_TOKENS, original_tokens)
+    metrics.increment(SAVED_TOKENS, max(0, original_tokens - estimate_tokens(compacted)))
+    return compacted
+
+def compact_tool(tool, budget=OBSERVATION_TOKEN_BUDGET):
+    """
+    Wrap a tool so its observations are compacted before reaching the agent.
+    
+    Args:
+        tool: The LangChain tool to wrap
+        budget: Maximum tokens per observation
+        
+    Returns:
+        Tool: The wrapped tool
+    """
+    def func(tool_input):
+        return _compact(tool.name, tool.func(tool_input), budget)
+    
+    coroutine = None
+    if tool.coroutine is not None:
+        async def coroutine(tool_input):
+            return _compact(tool.name, await tool.coroutine(tool_input), budget)
+    
+    return Tool(
+        name=tool.name,
+        func=func,
+        coroutine=coroutine,
+        description=tool.description,
+        return_direct=tool.return_direct,
+    )
+
+def get_compaction_stats():
+    """
+    Get the tokens removed from tool observations so far.
+    
+    Returns:
+        dict: original_tokens, saved_tokens and saved_fraction
+    """
+    original = metrics.get_count(ORIGINAL_TOKENS)
+    saved = metrics.get_count(SAVED_TOKENS)
+    return {"original_tokens": original, "saved_tokens": saved, "saved_fraction": saved / original if original else 0.0}
@@ -0,0 +1,126 @@
+"""
+Process-wide resource layer so expensive objects survive Streamlit reruns.
+
+The LLM client and the stateless tool chains are built once per process and
+shared by every session. Only the memory-bound agent is built per session.
+"""
+
+import threading
+from src.llm.model import initialize_llm, EXPRESSION_TASK
+from src.agent.executor import AgentPool
+from src.cache.response_cache import ResponseCache
+from src.utils import metrics
+
+# Counter incremented every time a resource, tool set or agent is constructed
+OBJECTS_BUILT = "resources.objects_built"
+
+SESSION_AGENT_KEY = "math_agent"
+
+_resources = {}
+# Re-entrant so factories may request other resources (tools need the LLM)
+_lock = threading.RLock()
+
+def get_resource(name, factory):
+    """
+    Return a process-wide resource, building it on first use.
+    
+    Args:
+        name: Unique name of the resource
+        factory: Zero-argument callable that builds the resource
+        
+    Returns:
+        The cached resource
+    """
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+    
+    with _lock:
+        if name not in _resources:
+            _resources[name] = factory()
+            metrics.increment(OBJECTS_BUILT)
+        return _resources[name]
+
+def _provider_model(name):
+    from src.llm.providers import build_provider
+    
+    # One client (or loaded local model) per provider, shared by the main model and cheap tasks
+    return get_resource(f"llm_provider.{name}", lambda: build_provider(name))
+
+def get_llm(task=None):
+    """
+    Get the shared language model client.
+    
+    A single client keeps one HTTP connection pool alive across requests.
+    
+    Args:
+        task: A cheap sub-task (e.g. "summary") to route to its own providers
+            first, falling back to the main model; None for the main model
+    
+    Returns:
+        The shared language model
+    """
+    if task is None:
+        return get_resource("llm", lambda: initialize_llm(build=_provider_model))
+    return get_resource(f"llm.{task}", lambda: initialize_llm(task, fallback=get_llm(), build=_provider_model))
+
+def get_math_tools():
+    """
+    Get the shared, stateless math tools.
+    
+    Returns:
+        list: The tools bound to the shared language model
+    """
+    # Imported on first use so that loading a session does not load the agent framework
+    from src.agent.math_agent import build_math_tools
+    
+    return get_resource("math_tools", lambda: build_math_tools(get_llm(), expression_llm=get_llm(EXPRESSION_TASK)))
+
+def get_response_cache():
+    """
+    Get the shared response cache.
+    
+    Returns:
+        ResponseCache: The process-wide handle on the on-disk cache
+    """
+    def build():
+        from src.llm.providers import provider_fingerprint
+        
+        # Answers of different providers and models are kept apart
+        return ResponseCache(model=provider_fingerprint())
+    
+    return get_resource("response_cache", build)
+
+def get_agent_pool():
+    """
+    Get the agent execution pool shared by all sessions.
+    
+    Returns:
+        AgentPool: The process-wide pool
+    """
+    return get_resource("agent_pool", AgentPool)
+
+def get_session_agent(store, memory):
+    """
+    Get the agent bound to a session's memory, building it once per session.
+    
+    Args:
+        store: Per-session mapping to keep the agent in (e.g. st.session_state)
+        memory: The session's memory object
+        
+    Returns:
+        Agent: The session's math agent
+    """
+    agent = store.get(SESSION_AGENT_KEY)
+    if agent is None or agent.memory is not memory:
+        from src.agent.math_agent import create_math_agent
+        
+        agent = create_math_agent(get_llm(), memory, tools=get_math_tools())
+        metrics.increment(OBJECTS_BUILT)
+        store[SESSION_AGENT_KEY] = agent
+    return agent
+
+def clear_resources():
+    """Drop all cached process-wide resources so they are rebuilt on next use."""
+    with _lock:
+        _resources.clear()
@@ -0,0 +1,124 @@
+"""
+Rule-based query router that skips the ReAct agent for simple problems.
+
+Each question is classified with cheap local checks. Single-step problems
+go straight to the matching tool; only multi-step or context-dependent
+questions run the full agent loop.
+"""
+
+import re
+from src.cache.response_cache import CONTEXT_REFERENCE
+from src.engines.arithmetic import parse_expression, ExpressionParseError
+from src.memory.math_context import refers_to_context
+from src.engines.linear_algebra import is_linear_algebra_question
+from src.engines.statistics import is_statistics_question
+from src.utils import metrics
+from config.settings import ROUTER_MAX_DIRECT_WORDS
+
+AGENT_ROUTE = "agent"
+
+# Route name -> tool that answers it directly
+ROUTE_TOOLS = {
+    "arithmetic": "Calculator",
+    "calculus": "Calculus",
+    "linear_algebra": "LinearAlgebra",
+    "statistics": "Statistics",
+    "conceptual": "Reasoning tool",
+}
+
+ROUTES = (*ROUTE_TOOLS, AGENT_ROUTE)
+
+# Signs that a question has several parts or steps
+MULTI_STEP = re.compile(
+    r"\b(and then|then use|after that|using (the|this|that) result|step \d|part \(?[a-z]\)|both|each of)\b"
+    r"|^\s*\(?[a-z1-9][).]\s|\n\s*\(?[a-z1-9][).]\s|\?.+\?",
+    re.IGNORECASE | re.DOTALL
+)
+
+CONCEPTUAL = re.compile(
+    r"^\s*(what (is|are)|what's|explain|define|describe|why|how (does|do|is)|tell me about|what does)\b",
+    re.IGNORECASE
+)
+
+def _route_metric(route):
+    return f"router.route.{route}"
+
+def classify_question(question, context_index=None):
+    """
+    Decide how a question should be answered.
+    
+    Follow-ups that lean on the conversation ("why does that work?", or a
+    question about a variable the session defined) need the agent's memory,
+    so they are never sent straight to a tool.
+    
+    Args:
+        question: The user's question
+        context_index: The session's MathContextIndex, if any
+        
+    Returns:
+        str: One of ROUTES
+    """
+    if CONTEXT_REFERENCE.search(question) or MULTI_STEP.search(question):
+        return AGENT_ROUTE
+    if refers_to_context(question, context_index):
+        return AGENT_ROUTE
+    if len(question.split()) > ROUTER_MAX_DIRECT_WORDS:
+        return AGENT_ROUTE
+    
+    try:
+        parse_expression(question)
+        return "arithmetic"
+    except ExpressionParseError:
+        pass
+    
+    # Imported on first use: SymPy is slow to import and plain arithmetic never needs it
+    from src.engines.calculus import is_calculus_question
+    
+    if is_calculus_question(question):
+        return "calculus"
+    if is_linear_algebra_question(question):
+        return "linear_algebra"
+    if is_statistics_question(question):
+        return "statistics"
+    if CONCEPTUAL.search(question) and not re.search(r"\d", question):
+        return "conceptual"
+    return AGENT_ROUTE
+
+def route_question(question, tools, callbacks=None, context_index=None):
+    """
+    Answer a question directly with a tool when it does not need the agent.
+    
+    Args:
+        question: The user's question
+        tools: The available tools
+        callbacks: Callback handlers for the tool run
+        context_index: The session's MathContextIndex, if any
+        
+    Returns:
+        tuple: (route, response), where response is None if the agent must run
+    """
+    route = classify_question(question, context_index)
+    tool_name = ROUTE_TOOLS.get(route)
+    tool = next((tool for tool in tools if tool.name == tool_name), None)
+    
+    if tool is not None:
+        try:
+            response = tool.run(question, callbacks=callbacks)
+        except Exception:
+            # Let the agent try instead of failing the request
+            metrics.increment("router.direct_failures")
+        else:
+            metrics.increment(_route_metric(route))
+            return route, response
+    
+    metrics.increment(_route_metric(AGENT_ROUTE))
+    return AGENT_ROUTE, None
+
+def get_route_stats():
+    """
+    Get how many requests took each route.
+    
+    Returns:
+        dict: {route: count}
+    """
+    return {route: metrics.get_count(_route_metric(route)) for route in ROUTES}
@@ -0,0 +1,291 @@
+"""
+Headless batch solving of problem sets.
+
+Problems are streamed from a JSONL or CSV file and solved concurrently
+(with an optional rate limit) by the same router, planner and agent the
+chat app uses, without Streamlit. Each result is appended to a JSONL output
+file as soon as it is ready; the output doubles as the checkpoint, so an
+interrupted run resumes where it stopped. A summary with throughput,
+p50/p95 latency and per-tool call counts is printed at the end.
+
+Usage:
+    python -m src.batch.runner problems.jsonl --output results.jsonl --concurrency 8 --rate 2
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import Counter
+
+from langchain_core.callbacks import BaseCallbackHandler
+from src.agent.math_agent import build_math_tools, create_math_agent
+from src.agent.planner import aanswer_in_parallel
+from src.agent.router import route_question
+from src.cache.tool_cache import tool_cache_scope
+from src.utils.metrics import percentile
+from config.settings import (
+    AGENT_REQUEST_TIMEOUT_SECONDS,
+    BATCH_CONCURRENCY,
+    BATCH_RATE_LIMIT_PER_SECOND,
+    PLAN_EXECUTE_ENABLED,
+    ROUTER_ENABLED,
+)
+
+# Field names accepted for the problem text and its identifier
+QUESTION_FIELDS = ("question", "problem", "input", "prompt")
+ID_FIELDS = ("id", "problem_id", "question_id")
+
+class ToolCallCounter(BaseCallbackHandler):
+    """Count tool calls by tool name."""
+
+    def __init__(self):
+        """Initialize the counts."""
+        self.counts = Counter()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        """Count one call of the tool."""
+        self.counts[(serialized or {}).get("name", "unknown")] += 1
+
+class RateLimiter:
+    """Space out starts so no more than `rate` happen per second."""
+
+    def __init__(self, rate):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Starts per second (0 or None disables limiting)
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        """Wait until the next start is allowed."""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def _first_field(record, names):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+def read_problems(path):
+    """
+    Stream problems from a JSONL or CSV file without loading it whole.
+
+    Args:
+        path: Path to a .jsonl/.json or .csv file
+
+    Yields:
+        dict: {"id": str, "question": str}
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.lower().endswith(".csv"):
+            records = csv.DictReader(handle)
+        else:
+            records = (json.loads(line) for line in handle if line.strip())
+        for number, record in enumerate(records, start=1):
+            question = _first_field(record, QUESTION_FIELDS)
+            if question is None:
+                continue
+            problem_id = _first_field(record, ID_FIELDS)
+            yield {"id": str(problem_id if problem_id is not None else number), "question": str(question)}
+
+def completed_ids(output_path):
+    """
+    Read the ids already answered in an output file (the checkpoint).
+
+    Problems that failed are not counted, so a resumed run retries them.
+
+    Args:
+        output_path: Path of the JSONL results file
+
+    Returns:
+        set: Ids of problems with an answer
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption is solved again
+                continue
+            if "answer" in record:
+                done.add(record["id"])
+    return done
+
+class BatchSolver:
+    """Solve single problems without Streamlit, using the app's router, planner and agent."""
+
+    def __init__(self, llm, timeout=AGENT_REQUEST_TIMEOUT_SECONDS):
+        """
+        Build the shared tools and a memory-less agent.
+
+        Args:
+            llm: The language model
+            timeout: Seconds allowed per problem
+        """
+        self.tools = build_math_tools(llm)
+        self.agent = create_math_agent(llm, None, tools=self.tools)
+        self.timeout = timeout
+
+    async def solve(self, question, callbacks=None):
+        """
+        Solve one problem.
+
+        Args:
+            question: The problem text
+            callbacks: Callback handlers for tool and LLM runs
+
+        Returns:
+            tuple: (route, answer)
+        """
+        with tool_cache_scope():
+            if ROUTER_ENABLED:
+                route, answer = await asyncio.to_thread(route_question, question, self.tools, callbacks)
+                if answer is not None:
+                    return route, answer
+            if PLAN_EXECUTE_ENABLED:
+                answer = await aanswer_in_parallel(question, self.tools, callbacks=callbacks)
+                if answer is not None:
+                    return "parallel", answer
+            result = await asyncio.wait_for(
+                self.agent.ainvoke({"input": question}, config={"callbacks": callbacks or []}),
+                timeout=self.timeout
+            )
+            return "agent", result["output"]
+
+async def arun_batch(solver, input_path, output_path, concurrency=BATCH_CONCURRENCY,
+                     rate=BATCH_RATE_LIMIT_PER_SECOND, progress=None):
+    """
+    Solve every problem in a file concurrently, appending results as they finish.
+
+    Problems already answered in the output file are skipped.
+
+    Args:
+        solver: Object with an async solve(question, callbacks) returning (route, answer)
+        input_path: JSONL or CSV problem file
+        output_path: JSONL results file (appended to)
+        concurrency: Problems solved at the same time
+        rate: Maximum problem starts per second (0 for no limit)
+        progress: Optional callable receiving the number of problems finished so far
+
+    Returns:
+        dict: Run summary (counts, throughput, latency percentiles, tool calls)
+    """
+    done = completed_ids(output_path)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    limiter = RateLimiter(rate)
+    counter = ToolCallCounter()
+    # Bounded so the input file is read only as fast as problems are solved
+    problems = asyncio.Queue(maxsize=2 * concurrency)
+    latencies = []
+    routes = Counter()
+    failures = 0
+    started = time.perf_counter()
+
+    with open(output_path, "a+", encoding="utf-8") as output:
+        # Terminate a line cut short by an interruption before appending
+        if output.tell() > 0:
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+
+        async def produce():
+            for problem in read_problems(input_path):
+                if problem["id"] not in done:
+                    await problems.put(problem)
+            for _ in range(concurrency):
+                await problems.put(None)
+
+        async def work():
+            nonlocal failures
+            while (problem := await problems.get()) is not None:
+                await limiter.wait()
+                problem_started = time.perf_counter()
+                record = {"id": problem["id"], "question": problem["question"]}
+                try:
+                    route, answer = await solver.solve(problem["question"], callbacks=[counter])
+                    record.update(route=route, answer=answer)
+                    routes[route] += 1
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    failures += 1
+                latency = time.perf_counter() - problem_started
+                latencies.append(latency)
+                record["latency_seconds"] = round(latency, 4)
+                # One complete line per result, so the file is a valid checkpoint at all times
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                if progress:
+                    progress(len(latencies))
+
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "solved": len(latencies) - failures,
+        "failed": failures,
+        "skipped": len(done),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_seconds": round(percentile(latencies, 0.5), 4),
+        "latency_p95_seconds": round(percentile(latencies, 0.95), 4),
+        "routes": dict(routes),
+        "tool_calls": dict(counter.counts),
+    }
+
+def run_batch(solver, input_path, output_path, **kwargs):
+    """Synchronous version of arun_batch."""
+    return asyncio.run(arun_batch(solver, input_path, output_path, **kwargs))
+
+def main(argv=None):
+    """Command line entry point for batch solving."""
+    parser = argparse.ArgumentParser(description="Solve a file of math problems without the chat UI.")
+    parser.add_argument("input", help="JSONL or CSV file with a 'question' (or 'problem') field and an optional 'id'")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to; rerun to resume")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Problems solved at the same time")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_LIMIT_PER_SECOND, help="Maximum problems started per second (0 for no limit)")
+    parser.add_argument("--report", help="Also write the summary as JSON to this path")
+    args = parser.parse_args(argv)
+
+    from src.llm.providers import configuration_error
+    from src.llm.model import initialize_llm
+
+    problem = configuration_error()
+    if problem:
+        parser.error(problem)
+
+    report = run_batch(
+        BatchSolver(initialize_llm()),
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        progress=lambda n: print(f"Solved {n} problems...", flush=True) if n % 10 == 0 else None
+    )
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Representative math questions for benchmarks.
+
+The corpus mixes questions the router answers with one tool, multi-part
+questions the planner splits, and word problems and follow-ups that need the
+agent. Agent questions carry the ReAct steps the scripted model takes, so a
+run exercises the same tools and prompts as a real conversation.
+"""
+
+from dataclasses import dataclass, field
+
+@dataclass(frozen=True)
+class BenchQuestion:
+    """One benchmark question."""
+
+    id: str
+    question: str
+    kind: str
+    steps: tuple = field(default_factory=tuple)
+    answer: str = ""
+
+CORPUS = (
+    BenchQuestion("arith-1", "What is 37 * 43 + 1200 / 8?", "arithmetic"),
+    BenchQuestion("arith-2", "Calculate 2^16 - 3^7", "arithmetic"),
+    BenchQuestion("arith-3", "sqrt(144) + 5!", "arithmetic"),
+    BenchQuestion("calc-1", "Find the derivative of x^3 - 4x^2 + 7x - 9", "calculus"),
+    BenchQuestion("calc-2", "Integrate sin(x) * x", "calculus"),
+    BenchQuestion("calc-3", "Find the limit of sin(x)/x as x approaches 0", "calculus"),
+    BenchQuestion("linalg-1", "Calculate the eigenvalues of matrix [[4, 2], [1, 3]]", "linear_algebra"),
+    BenchQuestion("linalg-2", "Find the determinant of [[2, 0, 1], [1, 3, 2], [1, 1, 1]]", "linear_algebra"),
+    BenchQuestion("stats-1", "Find the mean and standard deviation of 4, 8, 15, 16, 23, 42", "statistics"),
+    BenchQuestion("stats-2", "What is the median of 3, 9, 1, 7, 5, 11?", "statistics"),
+    BenchQuestion("multi-1", "(a) What is 12 * 12? (b) Find the derivative of x^4", "multi_part"),
+    BenchQuestion("multi-2", "1. What is 2^10? 2. Integrate x^2 3. What is 99 * 3?", "multi_part"),
+    BenchQuestion(
+        "word-1",
+        "A train travels 180 km in 2.5 hours and then 120 km in 1.5 hours. What is its average speed for the whole trip?",
+        "agent",
+        steps=(("Calculator", "(180 + 120) / (2.5 + 1.5)"),),
+        answer="The average speed is 75 km/h.",
+    ),
+    BenchQuestion(
+        "word-2",
+        "A rectangle has a perimeter of 46 cm and its length is 5 cm more than its width. Find its area.",
+        "agent",
+        steps=(("Calculator", "(46 / 2 - 5) / 2"), ("Calculator", "9 * (9 + 5)")),
+        answer="The width is 9 cm, the length 14 cm, so the area is 126 cm².",
+    ),
+    BenchQuestion(
+        "word-3",
+        "A ball is thrown upward and its height is h(t) = 20t - 5t^2. Find when it reaches its maximum height and how high it gets.",
+        "agent",
+        steps=(("Calculus", "derivative of 20*t - 5*t^2"), ("Calculator", "20 * 2 - 5 * 2^2")),
+        answer="It peaks at t = 2 s at a height of 20 m.",
+    ),
+    BenchQuestion(
+        "follow-1",
+        "Using the result from before, what would the average speed be if the trip took one hour longer?",
+        "agent",
+        steps=(("Calculator", "300 / 5"),),
+        answer="The average speed would be 60 km/h.",
+    ),
+    BenchQuestion(
+        "follow-2",
+        "Now double the area of that rectangle from earlier and take the square root.",
+        "agent",
+        steps=(("Calculator", "sqrt(2 * 126)"),),
+        answer="The square root of 252 is about 15.87.",
+    ),
+)
+
+def scripts_for(questions=CORPUS):
+    """
+    Build the scripted model's ReAct trajectories for the agent questions.
+
+    Args:
+        questions: BenchQuestion objects
+
+    Returns:
+        dict: {question text: {"steps": [...], "answer": str}}
+    """
+    return {
+        question.question: {"steps": list(question.steps), "answer": question.answer}
+        for question in questions
+        if question.steps or question.answer
+    }
@@ -0,0 +1,129 @@
+"""
+Deterministic stand-in for the chat model, for benchmarks and tests.
+
+The model needs no network. It waits a configurable time per call (and per
+generated token), follows a scripted ReAct trajectory for known questions
+(one tool call per step, then a final answer), and answers every other
+prompt with a fixed text. It counts calls, prompt and completion tokens and
+the time spent, so benchmarks can report what the real model would have
+been asked to do.
+"""
+
+import asyncio
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field, PrivateAttr
+from src.utils.tokens import estimate_tokens
+
+# The ReAct prompt ends with "Question: <input>\nThought:<scratchpad>"
+QUESTION_MARKER = "\nQuestion: "
+OBSERVATION_MARKER = "\nObservation:"
+# LLMMathChain asks for the expression in a ```text block
+MATH_CHAIN_MARKER = "```text"
+DEFAULT_ANSWER = "The result follows from the computation above, checked step by step."
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model with scripted ReAct steps and simulated latency."""
+
+    scripts: dict = Field(default_factory=dict)  # Question -> {"steps": [(tool, tool input), ...], "answer": final answer}
+    latency_seconds: float = 0.0  # Time before the first token of every call
+    seconds_per_token: float = 0.0  # Additional time per generated token
+    default_answer: str = DEFAULT_ANSWER  # Reply to prompts that are not a scripted ReAct step
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context):
+        """Start with zeroed statistics."""
+        self.reset_stats()
+
+    @property
+    def _llm_type(self):
+        return "scripted-fake"
+
+    def reset_stats(self):
+        """Zero the call statistics."""
+        with self._lock:
+            self._stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+
+    def stats(self):
+        """
+        Get the call statistics.
+
+        Returns:
+            dict: calls, prompt_tokens, completion_tokens and seconds spent
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def reply(self, prompt):
+        """
+        Choose the reply to a prompt.
+
+        Args:
+            prompt: The full prompt text
+
+        Returns:
+            str: The reply
+        """
+        start = prompt.rfind(QUESTION_MARKER)
+        if start >= 0 and MATH_CHAIN_MARKER in prompt:
+            # Hand the expression back for the chain to evaluate
+            return f"{MATH_CHAIN_MARKER}\n{prompt[start + len(QUESTION_MARKER):].strip()}\n```"
+        if start < 0 or "Action Input:" not in prompt:
+            return self.default_answer
+        # The current question and the steps taken so far
+        tail = prompt[start + len(QUESTION_MARKER):]
+        question = tail.split("\nThought:", 1)[0].strip()
+        script = self.scripts.get(question)
+        if script is None:
+            return f"I can answer this directly.\nFinal Answer: {self.default_answer}"
+        steps_done = tail.count(OBSERVATION_MARKER)
+        steps = script.get("steps", ())
+        if steps_done < len(steps):
+            tool, tool_input = steps[steps_done]
+            return f" I should use the {tool} tool.\nAction: {tool}\nAction Input: {tool_input}"
+        return f" I now know the final answer.\nFinal Answer: {script['answer']}"
+
+    def _respond(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self.reply(prompt)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        delay = self.latency_seconds + self.seconds_per_token * completion_tokens
+        return text, prompt_tokens, completion_tokens, delay
+
+    def _record(self, prompt_tokens, completion_tokens, seconds):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += completion_tokens
+            self._stats["seconds"] += seconds
+
+    def _result(self, text, prompt_tokens, completion_tokens):
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        text, prompt_tokens, completion_tokens, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        self._record(prompt_tokens, completion_tokens, time.perf_counter() - started)
+        return self._result(text, prompt_tokens, completion_tokens)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Waits without blocking the event loop, like a network call
+        started = time.perf_counter()
+        text, prompt_tokens, completion_tokens, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        self._record(prompt_tokens, completion_tokens, time.perf_counter() - started)
+        return self._result(text, prompt_tokens, completion_tokens)
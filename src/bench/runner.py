@@ -0,0 +1,303 @@
+"""
+Reproducible end-to-end benchmarks with a local fake LLM.
+
+Each scenario runs the real solver (router, planner, agent pool, memory,
+storage) against the scripted chat model, so results depend only on the
+code and the configured fake latency, not on the network. Scenarios:
+
+    single_question   every corpus question once, each in a fresh session
+    long_session      one session answering many turns (memory growth)
+    concurrent_users  several sessions asking at the same time
+
+The report is JSON: per-stage timings, per-span (tool, LLM call, agent
+iteration) latency summaries, latency percentiles, LLM calls and prompt
+tokens, routes and peak memory, plus the git commit, so runs on different
+commits can be compared. With --rpm/--tpm the fake model sits behind the
+same rate limiter as a real provider, and the counters show how many calls
+were throttled, shed and coalesced.
+
+Usage:
+    python -m src.bench.runner --scenario all --latency 0.05 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from src.bench.corpus import CORPUS, scripts_for
+from src.bench.fake_llm import ScriptedChatModel
+from src.llm.rate_limit import RateLimitedChatModel
+from src.utils import metrics
+
+SCENARIOS = ("single_question", "long_session", "concurrent_users")
+
+# Environment variables pointing storage at a scratch directory
+DATA_ENVIRONMENT = {
+    "MATHGPT_CHAT_HISTORY": os.path.join("history", "chat.sqlite3"),
+    "MATHGPT_RETRIEVAL_DIR": "memory",
+    "MATHGPT_RESPONSE_CACHE": os.path.join("cache", "responses.sqlite3"),
+    "MATHGPT_UPLOAD_DIR": "uploads",
+    "MATHGPT_TRACE_LOG": os.path.join("traces", "traces.jsonl"),
+}
+
+def _latency_summary(latencies):
+    return {
+        "count": len(latencies),
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50": metrics.percentile(latencies, 0.50),
+        "p95": metrics.percentile(latencies, 0.95),
+        "max": max(latencies, default=0.0),
+    }
+
+class Benchmark:
+    """Run scenarios against the solver with a scripted model."""
+
+    def __init__(self, latency=0.0, seconds_per_token=0.0, response_cache=True, trace_memory=False,
+                 requests_per_minute=0, tokens_per_minute=0):
+        """
+        Configure the fake model.
+
+        Args:
+            latency: Seconds before the first token of every LLM call
+            seconds_per_token: Additional seconds per generated token
+            response_cache: Serve repeated questions from the answer cache
+            trace_memory: Also report the Python heap peak (slows the run down)
+            requests_per_minute: Rate limit on fake LLM calls (0 for none)
+            tokens_per_minute: Rate limit on fake LLM tokens (0 for none)
+        """
+        self.model = ScriptedChatModel(
+            scripts=scripts_for(CORPUS),
+            latency_seconds=latency,
+            seconds_per_token=seconds_per_token,
+        )
+        self.response_cache = response_cache
+        self.trace_memory = trace_memory
+        self.rate_limits = {"requests_per_minute": requests_per_minute, "tokens_per_minute": tokens_per_minute}
+
+    def _reset(self):
+        # Every scenario starts cold: fresh resources, sessions, caches and metrics
+        from src.agent import resources
+        from src.cache.tool_cache import clear_tool_cache
+        from src.core import solver
+        from src.utils.tracing import reset_traces
+
+        solver.clear_sessions()
+        reset_traces()
+        resources.clear_resources()
+        clear_tool_cache()
+        metrics.reset()
+        self.model.reset_stats()
+        solver.RESPONSE_CACHE_ENABLED = self.response_cache
+        if any(self.rate_limits.values()):
+            # A fresh limiter per scenario, so each starts with full quota
+            resources.get_resource("llm", lambda: RateLimitedChatModel(model=self.model, **self.rate_limits))
+        else:
+            resources.get_resource("llm", lambda: self.model)
+        if self.response_cache:
+            resources.get_response_cache().clear()
+
+    def _ask(self, question, session_id):
+        from src.core.solver import solve
+
+        result = solve(question, session_id)
+        return result.route, result.elapsed_seconds
+
+    def run(self, name, **options):
+        """
+        Run one scenario.
+
+        Args:
+            name: One of SCENARIOS
+            **options: Scenario options (turns, users)
+
+        Returns:
+            dict: The scenario's results
+        """
+        from src.agent.resources import get_math_tools
+        from src.core.solver import STAGES, STAGE_SECONDS
+        from src.agent.executor import QUEUE_WAIT, RUN_TIME
+        from src.memory.retrieval import RETRIEVAL_SECONDS
+        from src.utils.tracing import get_span_stats
+
+        self._reset()
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        get_math_tools()
+        startup = time.perf_counter() - started
+
+        started = time.perf_counter()
+        records = getattr(self, f"_run_{name}")(**options)
+        elapsed = time.perf_counter() - started
+
+        stages = {stage: metrics.summarize(STAGE_SECONDS.format(stage)) for stage in STAGES}
+        stages.update({
+            "agent_queue_wait": metrics.summarize(QUEUE_WAIT),
+            "agent_run": metrics.summarize(RUN_TIME),
+            "memory_retrieval": metrics.summarize(RETRIEVAL_SECONDS),
+        })
+        memory = {"rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        if self.trace_memory:
+            memory["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+
+        latencies = [record["seconds"] for record in records]
+        results = {
+            "questions": len(records),
+            "startup_seconds": startup,
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": len(records) / elapsed if elapsed else 0.0,
+            "latency": _latency_summary(latencies),
+            "routes": dict(Counter(record["route"] for record in records)),
+            "stages": {stage: summary for stage, summary in stages.items() if summary["count"]},
+            "spans": get_span_stats(),
+            "llm": self.model.stats(),
+            "memory": memory,
+            "counters": metrics.snapshot()["counters"],
+        }
+        if name == "long_session":
+            results["turns"] = records
+        return results
+
+    def _run_single_question(self):
+        return [
+            dict(zip(("route", "seconds"), self._ask(item.question, uuid.uuid4().hex)), id=item.id)
+            for item in CORPUS
+        ]
+
+    def _run_long_session(self, turns=40):
+        session_id = uuid.uuid4().hex
+        records = []
+        for turn in range(turns):
+            item = CORPUS[turn % len(CORPUS)]
+            before = self.model.stats()
+            route, seconds = self._ask(item.question, session_id)
+            after = self.model.stats()
+            records.append({
+                "turn": turn + 1,
+                "id": item.id,
+                "route": route,
+                "seconds": seconds,
+                "llm_calls": after["calls"] - before["calls"],
+                "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+            })
+        return records
+
+    def _run_concurrent_users(self, users=8, turns=5):
+        def user(index):
+            session_id = uuid.uuid4().hex
+            records = []
+            for turn in range(turns):
+                # Users start at different points of the corpus
+                item = CORPUS[(index * 3 + turn) % len(CORPUS)]
+                route, seconds = self._ask(item.question, session_id)
+                records.append({"id": item.id, "route": route, "seconds": seconds})
+            return records
+
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            return [record for records in executor.map(user, range(users)) for record in records]
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(scenarios=SCENARIOS, latency=0.0, seconds_per_token=0.0, response_cache=True,
+                   trace_memory=False, turns=40, users=8, user_turns=5, requests_per_minute=0, tokens_per_minute=0):
+    """
+    Run benchmark scenarios and collect a report.
+
+    Storage paths come from the settings, so point them at a scratch
+    directory before importing the solver (main does this).
+
+    Args:
+        scenarios: Names of the scenarios to run
+        latency: Fake LLM seconds per call
+        seconds_per_token: Fake LLM seconds per generated token
+        response_cache: Serve repeated questions from the answer cache
+        trace_memory: Also report the Python heap peak
+        turns: Turns of the long session
+        users: Users in the concurrent scenario
+        user_turns: Turns per user in the concurrent scenario
+        requests_per_minute: Rate limit on fake LLM calls (0 for none)
+        tokens_per_minute: Rate limit on fake LLM tokens (0 for none)
+
+    Returns:
+        dict: The report
+    """
+    benchmark = Benchmark(latency, seconds_per_token, response_cache, trace_memory, requests_per_minute, tokens_per_minute)
+    options = {
+        "single_question": {},
+        "long_session": {"turns": turns},
+        "concurrent_users": {"users": users, "turns": user_turns},
+    }
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "llm_latency_seconds": latency,
+            "llm_seconds_per_token": seconds_per_token,
+            "response_cache": response_cache,
+            "turns": turns,
+            "users": users,
+            "user_turns": user_turns,
+            "requests_per_minute": requests_per_minute,
+            "tokens_per_minute": tokens_per_minute,
+        },
+        "scenarios": {name: benchmark.run(name, **options[name]) for name in scenarios},
+    }
+
+def main(argv=None):
+    """Command line entry point for the benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the solver end to end with a local fake LLM.")
+    parser.add_argument("--scenario", choices=(*SCENARIOS, "all"), default="all", help="Scenario to run")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM seconds per call")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0, help="Fake LLM seconds per generated token")
+    parser.add_argument("--turns", type=int, default=40, help="Turns in the long session")
+    parser.add_argument("--users", type=int, default=8, help="Users in the concurrent scenario")
+    parser.add_argument("--user-turns", type=int, default=5, help="Turns per user in the concurrent scenario")
+    parser.add_argument("--rpm", type=int, default=0, help="Rate limit the fake LLM to this many calls per minute")
+    parser.add_argument("--tpm", type=int, default=0, help="Rate limit the fake LLM to this many tokens per minute")
+    parser.add_argument("--no-response-cache", action="store_true", help="Do not answer repeated questions from the cache")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the Python heap peak (slower)")
+    parser.add_argument("--data-dir", help="Directory for the benchmark's history and caches (a temporary one by default)")
+    parser.add_argument("--output", help="Write the JSON report here instead of printing it")
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="mathgpt-bench-")
+    for name, path in DATA_ENVIRONMENT.items():
+        os.environ[name] = os.path.join(data_dir, path)
+
+    report = run_benchmarks(
+        SCENARIOS if args.scenario == "all" else (args.scenario,),
+        latency=args.latency,
+        seconds_per_token=args.seconds_per_token,
+        response_cache=not args.no_response_cache,
+        trace_memory=args.trace_memory,
+        turns=args.turns,
+        users=args.users,
+        user_turns=args.user_turns,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
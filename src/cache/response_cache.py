@@ -0,0 +1,214 @@
+"""
+Persistent answer cache keyed on normalized math questions.
+
+Entries live in a local SQLite database (WAL mode) so every process on the
+host shares them. Entries expire after a TTL and the least recently used
+ones are evicted beyond a maximum size.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from src.engines.datasets import FILE_REFERENCE
+from src.memory.math_context import refers_to_context
+from src.utils import metrics
+from config.settings import (
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+)
+
+CACHE_HITS = "response_cache.hits"
+CACHE_MISSES = "response_cache.misses"
+
+SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻", "0123456789+-")
+
+# Equivalent notation mapped onto one canonical spelling
+NOTATION = [
+    ("**", "^"),
+    ("×", "*"),
+    ("·", "*"),
+    ("⋅", "*"),
+    ("÷", "/"),
+    ("−", "-"),
+    ("–", "-"),
+    ("π", "pi"),
+    ("√", "sqrt"),
+    ("≤", "<="),
+    ("≥", ">="),
+    ("’", "'"),
+]
+
+# Questions that lean on the conversation cannot be answered from a shared cache
+CONTEXT_REFERENCE = re.compile(
+    r"\b(earlier|previous(ly)?|above|you said|we (found|got|discussed|defined|computed|did)|"
+    r"our|last (answer|result|question|problem|one)|same (matrix|equation|function|data)|from before)\b",
+    re.IGNORECASE
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+def normalize_question(question):
+    """
+    Canonicalize a question so equivalent spellings share a cache entry.
+    
+    Args:
+        question: The raw question text
+        
+    Returns:
+        str: The normalized question
+    """
+    text = re.sub(r"[⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻]+", lambda m: "^" + m.group(0).translate(SUPERSCRIPTS), question)
+    text = unicodedata.normalize("NFKC", text)
+    for source, target in NOTATION:
+        text = text.replace(source, target)
+    text = text.lower()
+    text = " ".join(text.split())
+    # Spacing around operators and punctuation carries no meaning
+    text = re.sub(r"\s*([-+*/^=<>(),:;\[\]])\s*", r"\1", text)
+    return text.strip(" ?.!")
+
+def is_cacheable(question, context_index=None):
+    """
+    Check whether a question's answer is independent of the conversation.
+    
+    Questions referring to earlier turns ("integrate it"), using symbols the
+    conversation defined, or naming uploaded files (whose contents can
+    change) are not cached.
+    
+    Args:
+        question: The raw question text
+        context_index: The asking session's MathContextIndex, if any
+        
+    Returns:
+        bool: True if the answer can be shared
+    """
+    if CONTEXT_REFERENCE.search(question) or FILE_REFERENCE.search(question):
+        return False
+    return not refers_to_context(question, context_index)
+
+class ResponseCache:
+    """SQLite-backed answer cache shared across processes."""
+    
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES, model=LLM_MODEL, temperature=LLM_TEMPERATURE):
+        """Initialize the cache, creating the database if needed."""
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.model = model
+        self.temperature = temperature
+        self._local = threading.local()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+    
+    def _connection(self):
+        # SQLite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+    
+    def make_key(self, question):
+        """
+        Build the cache key for a question.
+        
+        Args:
+            question: The raw question text
+            
+        Returns:
+            str: A hash of the normalized question, providers, model and temperature
+        """
+        material = f"{self.model}|{self.temperature}|{normalize_question(question)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def get(self, question, context_index=None):
+        """
+        Look up a cached response.
+        
+        Args:
+            question: The raw question text
+            context_index: The asking session's MathContextIndex, if any
+            
+        Returns:
+            str or None: The cached response, or None on a miss
+        """
+        if not is_cacheable(question, context_index):
+            return None
+        
+        key = self.make_key(question)
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+            (key, now - self.ttl_seconds)
+        ).fetchone()
+        
+        if row is None:
+            metrics.increment(CACHE_MISSES)
+            return None
+        
+        connection.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        metrics.increment(CACHE_HITS)
+        return row[0]
+    
+    def put(self, question, response, context_index=None):
+        """
+        Store a response, evicting expired and least recently used entries.
+        
+        Args:
+            question: The raw question text
+            response: The response to cache
+            context_index: The asking session's MathContextIndex, if any
+        """
+        if not is_cacheable(question, context_index):
+            return
+        
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, question, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(question), question, response, now, now)
+            )
+            connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    def clear(self):
+        """Remove every cached response."""
+        self._connection().execute("DELETE FROM responses")
+    
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
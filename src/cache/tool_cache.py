@@ -0,0 +1,249 @@
+"""
+Memoization for LangChain tools.
+
+Every tool gets a cache policy:
+    none     - never cached
+    request  - cached for the duration of one agent run
+    session  - cached per chat session
+    global   - shared by every session in the process
+
+Session and global entries live in one size-bounded LRU cache with a TTL.
+Request entries live in a dict owned by the active request scope.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from langchain_core.tools import Tool
+from langchain_core.callbacks.manager import dispatch_custom_event, adispatch_custom_event
+from src.utils import metrics
+from src.utils.tracing import TOOL_CACHE_HIT_EVENT
+from config.settings import (
+    TOOL_CACHE_POLICIES,
+    TOOL_CACHE_DEFAULT_POLICY,
+    TOOL_CACHE_MAX_ENTRIES,
+    TOOL_CACHE_TTL_SECONDS,
+)
+
+POLICIES = ("none", "request", "session", "global")
+
+_session_id = contextvars.ContextVar("tool_cache_session_id", default=None)
+_request_cache = contextvars.ContextVar("tool_cache_request", default=None)
+_request_state = contextvars.ContextVar("request_state", default=None)
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+    
+    def __init__(self, max_entries=TOOL_CACHE_MAX_ENTRIES, ttl_seconds=TOOL_CACHE_TTL_SECONDS):
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Get a cached value.
+        
+        Args:
+            key: The cache key
+            
+        Returns:
+            tuple: (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+    
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key: The cache key
+            value: The value to store
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+_shared_cache = TTLCache()
+
+@contextmanager
+def tool_cache_scope(session_id=None):
+    """
+    Scope tool calls to a session and a single request.
+    
+    Wrap each agent run in this so request- and session-level policies
+    know which entries they may reuse.
+    
+    Args:
+        session_id: The chat session id
+        
+    Yields:
+        str: A unique id for this request
+    """
+    session_token = _session_id.set(session_id)
+    request_token = _request_cache.set({})
+    state_token = _request_state.set({})
+    try:
+        yield uuid.uuid4().hex
+    finally:
+        _request_state.reset(state_token)
+        _request_cache.reset(request_token)
+        _session_id.reset(session_token)
+
+def get_request_state():
+    """
+    Get a dict for arbitrary per-request state.
+    
+    Returns:
+        dict or None: The active request's state, or None outside tool_cache_scope
+    """
+    return _request_state.get()
+
+def get_policy(tool_name):
+    """
+    Get the cache policy configured for a tool.
+    
+    Args:
+        tool_name: The tool's name
+        
+    Returns:
+        str: One of POLICIES
+    """
+    policy = TOOL_CACHE_POLICIES.get(tool_name, TOOL_CACHE_DEFAULT_POLICY)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown tool cache policy for {tool_name}: {policy}")
+    return policy
+
+def _lookup_store(tool_name, policy, tool_input):
+    # Returns (store, key) or (None, None) when nothing may be cached
+    normalized = " ".join(str(tool_input).split())
+    if policy == "request":
+        store = _request_cache.get()
+        return (store, (tool_name, normalized)) if store is not None else (None, None)
+    if policy == "session":
+        session_id = _session_id.get()
+        return (_shared_cache, ("session", session_id, tool_name, normalized)) if session_id else (None, None)
+    if policy == "global":
+        return _shared_cache, ("global", tool_name, normalized)
+    return None, None
+
+def _cached_value(store, key):
+    if isinstance(store, TTLCache):
+        return store.get(key)
+    return (key in store, store.get(key))
+
+def memoize_tool(tool, policy=None):
+    """
+    Wrap a tool so repeated calls with the same input are served from cache.
+    
+    Args:
+        tool: The LangChain tool to wrap
+        policy: Cache policy override (defaults to the configured policy)
+        
+    Returns:
+        Tool: The memoizing tool (or the original tool for policy "none")
+    """
+    policy = policy or get_policy(tool.name)
+    if policy == "none":
+        return tool
+    
+    name = tool.name
+    
+    def lookup(tool_input):
+        store, key = _lookup_store(name, policy, tool_input)
+        if store is None:
+            return store, key, False, None
+        found, value = _cached_value(store, key)
+        metrics.increment(f"tool_cache.{name}.{'hits' if found else 'misses'}")
+        return store, key, found, value
+    
+    def func(tool_input):
+        store, key, found, value = lookup(tool_input)
+        if found:
+            # Lets tracing mark the tool call as a cache hit
+            try:
+                dispatch_custom_event(TOOL_CACHE_HIT_EVENT, {"tool": name})
+            except RuntimeError:
+                # Called outside a LangChain run
+                pass
+            return value
+        value = tool.func(tool_input)
+        if store is not None:
+            _store(store, key, value)
+        return value
+    
+    coroutine = None
+    if tool.coroutine is not None:
+        async def coroutine(tool_input):
+            store, key, found, value = lookup(tool_input)
+            if found:
+                try:
+                    await adispatch_custom_event(TOOL_CACHE_HIT_EVENT, {"tool": name})
+                except RuntimeError:
+                    pass
+                return value
+            value = await tool.coroutine(tool_input)
+            if store is not None:
+                _store(store, key, value)
+            return value
+    
+    return Tool(
+        name=tool.name,
+        func=func,
+        coroutine=coroutine,
+        description=tool.description,
+        return_direct=tool.return_direct,
+    )
+
+def _store(store, key, value):
+    if isinstance(store, TTLCache):
+        store.set(key, value)
+    else:
+        store[key] = value
+
+def get_tool_cache_stats(tool_names):
+    """
+    Get hit/miss statistics for memoized tools.
+    
+    Args:
+        tool_names: The tool names to report on
+        
+    Returns:
+        dict: {tool_name: {"hits", "misses", "hit_rate"}}
+    """
+    stats = {}
+    for name in tool_names:
+        hits = metrics.get_count(f"tool_cache.{name}.hits")
+        misses = metrics.get_count(f"tool_cache.{name}.misses")
+        total = hits + misses
+        stats[name] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+    return stats
+
+def clear_tool_cache():
+    """Drop all session and global tool cache entries."""
+    _shared_cache.clear()
@@ -0,0 +1,476 @@
+"""
+JSON-over-HTTP front end for the solver, without Streamlit.
+
+Endpoints:
+    POST /solve   {"question": "...", "session_id": "..."} -> answer, route, session_id, ...
+                  (add "include_trace": true for the request's span trace)
+    GET  /health  -> status and current load
+    GET  /metrics -> span latencies, token counts and counters in the Prometheus text format
+    GET  /traces  -> the most recent request traces (?limit=N)
+
+Questions are solved by a pool of worker processes that build the LLM client
+and tools once, when they start. Each worker answers many requests at once on
+its own threads, which hand agent runs to the worker's agent pool. Each
+session is always sent to the same worker, so its memory stays loaded there
+and its turns are saved in order. A request that times out fails on its own;
+its worker is only restarted when it stops sending heartbeats or every one of
+its threads is still busy with a timed-out request. Requests beyond
+SERVER_MAX_PENDING are rejected with 503 instead of queueing without bound.
+
+Usage:
+    python -m src.core.server --port 8000 --workers 2
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from src.agent.executor import AgentPoolFullError, AgentTimeoutError
+from src.utils import metrics
+from src.utils.tracing import record_trace, get_recent_traces, render_prometheus
+from config.settings import (
+    AGENT_REQUEST_TIMEOUT_SECONDS,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_MAX_PENDING,
+    SERVER_WORKER_THREADS,
+    SERVER_HEARTBEAT_SECONDS,
+    SERVER_HEARTBEAT_TIMEOUT_SECONDS,
+)
+
+# Largest request body accepted (bytes)
+MAX_BODY_BYTES = 64 * 1024
+# Extra time allowed on top of the agent timeout for routing, memory and transport
+RESPONSE_GRACE_SECONDS = 10
+# How often a worker's result reader checks whether its process was replaced
+RESULT_POLL_SECONDS = 0.5
+
+WORKER_RESTARTS = "server.worker_restarts"
+
+class ServerBusyError(RuntimeError):
+    """Raised when too many requests are already pending."""
+
+class WorkerRestartedError(RuntimeError):
+    """Raised for requests that were running on a worker when it was restarted."""
+
+def _start_worker():
+    # Runs once in each worker process, before its first question
+    from src.core.solver import warm_up
+
+    warm_up()
+
+def _solve_in_worker(question, session_id):
+    from src.core.solver import solve
+
+    # The trace travels back with the answer and is recorded by the server process
+    return asdict(solve(question, session_id, record=False))
+
+def _picklable(error):
+    # Exceptions travel back to the server pickled; not every exception survives that
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+def _heartbeat(results):
+    # Tells the server the process is still responsive, whatever its threads are doing
+    while True:
+        results.put((None, True, None))
+        time.sleep(SERVER_HEARTBEAT_SECONDS)
+
+def _worker_main(requests, results, threads, solve_fn, initializer):
+    # Entry point of a worker process: answer requests concurrently on a pool of threads
+    threading.Thread(target=_heartbeat, args=(results,), name="heartbeat", daemon=True).start()
+    if initializer is not None:
+        initializer()
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="solver")
+
+    def handle(request_id, question, session_id):
+        try:
+            results.put((request_id, True, solve_fn(question, session_id)))
+        except Exception as e:
+            results.put((request_id, False, _picklable(e)))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, question, session_id = request
+        if question is None:
+            # A ping: the worker has started
+            results.put((request_id, True, None))
+        else:
+            executor.submit(handle, request_id, question, session_id)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+class _Worker:
+    """One solver process, answering several requests at once."""
+
+    def __init__(self, context, threads, solve_fn, initializer, heartbeat_timeout=SERVER_HEARTBEAT_TIMEOUT_SECONDS):
+        self._context = context
+        self._args = (threads, solve_fn, initializer)
+        self._threads = threads
+        self._heartbeat_timeout = heartbeat_timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._futures = {}
+        # Requests that timed out but are still occupying one of the process's threads
+        self._overdue = set()
+        self._process = None
+        self.restarts = 0
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        # Fresh queues each time: a killed process may leave the old ones locked
+        self._requests = self._context.Queue()
+        results = self._context.Queue()
+        self._process = self._context.Process(
+            target=_worker_main, args=(self._requests, results, *self._args), daemon=True
+        )
+        self._process.start()
+        threading.Thread(
+            target=self._collect, args=(self._process, results), name="solver-results", daemon=True
+        ).start()
+
+    def _collect(self, process, results):
+        # Hand answers to the waiting requests until this process is replaced or stopped
+        last_heard = time.monotonic()
+        while True:
+            try:
+                request_id, ok, value = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                if process is not self._process:
+                    return
+                if not process.is_alive() or time.monotonic() - last_heard > self._heartbeat_timeout:
+                    self._restart(process)
+                    return
+                continue
+            last_heard = time.monotonic()
+            if request_id is None:
+                # A heartbeat
+                continue
+            with self._lock:
+                self._overdue.discard(request_id)
+                future = self._futures.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def submit(self, question, session_id):
+        """Send a request to the process (question None only checks that it started)."""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._futures[request_id] = future
+            self._requests.put((request_id, question, session_id))
+        return future
+
+    def abandon(self, future):
+        """
+        Give up on a request that timed out, leaving the others running.
+
+        The process is restarted only once every one of its threads is busy
+        with a request that timed out, since it could not answer anything else.
+        """
+        with self._lock:
+            request_ids = [request_id for request_id, pending in self._futures.items() if pending is future]
+            for request_id in request_ids:
+                del self._futures[request_id]
+                self._overdue.add(request_id)
+            stuck = len(self._overdue) >= self._threads
+            process = self._process
+        if stuck:
+            self._restart(process)
+
+    def _restart(self, process):
+        with self._lock:
+            if process is not self._process:
+                # Already replaced
+                return
+            futures, self._futures = self._futures, {}
+            self._overdue = set()
+            self._start()
+            self.restarts += 1
+        metrics.increment(WORKER_RESTARTS)
+        process.kill()
+        process.join(timeout=5)
+        for future in futures.values():
+            future.set_exception(WorkerRestartedError("The worker answering this request was restarted; please try again."))
+
+    def stop(self):
+        """Stop the process."""
+        with self._lock:
+            process, self._process = self._process, None
+            futures, self._futures = self._futures, {}
+        self._requests.put(None)
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+        for future in futures.values():
+            future.cancel()
+
+def _preload_modules():
+    # Import the solver, its tools and their engines before forking, so workers
+    # start with them already loaded (and share the memory). Clients and threads
+    # are created in each worker, after the fork
+    from src.tools.registry import preload_tools
+    import src.agent.math_agent  # noqa: F401
+    import src.core.solver  # noqa: F401
+
+    preload_tools()
+
+class SolverPool:
+    """Dispatch questions to worker processes, keeping each session on one worker."""
+
+    def __init__(self, workers=SERVER_WORKERS, max_pending=SERVER_MAX_PENDING,
+                 timeout=AGENT_REQUEST_TIMEOUT_SECONDS + RESPONSE_GRACE_SECONDS, solve_fn=None,
+                 threads=SERVER_WORKER_THREADS, heartbeat_timeout=SERVER_HEARTBEAT_TIMEOUT_SECONDS):
+        """
+        Start the workers.
+
+        Args:
+            workers: Number of worker processes (0 solves on threads of this process)
+            max_pending: Requests accepted at the same time before rejecting more
+            timeout: Seconds to wait for an answer
+            solve_fn: Callable (question, session_id) -> dict (defaults to the
+                solver, whose model and tools each worker builds when it starts)
+            threads: Requests each worker process handles at once
+            heartbeat_timeout: Seconds of silence after which a worker process is restarted
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+        self._solve = solve_fn or _solve_in_worker
+
+        if workers > 0:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            if "fork" in methods:
+                _preload_modules()
+            initializer = _start_worker if solve_fn is None else None
+            # Each session always goes to the same worker
+            self._workers = [
+                _Worker(context, threads, self._solve, initializer, heartbeat_timeout) for _ in range(workers)
+            ]
+            self._executor = None
+        else:
+            self._workers = []
+            self._executor = ThreadPoolExecutor(max_workers=max_pending, thread_name_prefix="solver")
+
+    def warm_up(self):
+        """Start every worker now, so the first requests do not pay for it."""
+        for future in [worker.submit(None, None) for worker in self._workers]:
+            future.result()
+
+    def _worker_for(self, session_id):
+        return self._workers[zlib.crc32(session_id.encode("utf-8")) % len(self._workers)]
+
+    def solve(self, question, session_id=None):
+        """
+        Solve a question on the session's worker and wait for the answer.
+
+        Args:
+            question: The user's question
+            session_id: The session (a new one is started if None)
+
+        Returns:
+            dict: The solve result, with its trace (if any) under "trace"
+        """
+        with self._pending_lock:
+            if self.pending >= self.max_pending:
+                raise ServerBusyError("Too many requests are pending; please try again shortly.")
+            self.pending += 1
+        try:
+            session_id = session_id or uuid.uuid4().hex
+            worker = self._worker_for(session_id) if self._workers else None
+            if worker is not None:
+                future = worker.submit(question, session_id)
+            else:
+                future = self._executor.submit(self._solve, question, session_id)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeoutError as e:
+                # Only this request fails; the worker's other requests keep running
+                if worker is not None:
+                    worker.abandon(future)
+                raise AgentTimeoutError(f"The request timed out after {self.timeout} seconds.") from e
+        finally:
+            with self._pending_lock:
+                self.pending -= 1
+        # Traces from every worker are aggregated here, where /metrics is served
+        if result.get("trace"):
+            record_trace(result["trace"])
+        return result
+
+    def stats(self):
+        """
+        Get the pool's current load.
+
+        Returns:
+            dict: workers, pending, max_pending and worker_restarts
+        """
+        restarts = sum(worker.restarts for worker in self._workers)
+        with self._pending_lock:
+            return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending,
+                    "worker_restarts": restarts}
+
+    def shutdown(self):
+        """Stop the workers."""
+        for worker in self._workers:
+            worker.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+class SolverRequestHandler(BaseHTTPRequestHandler):
+    """Handle the server's endpoints."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Report health, metrics or recent traces."""
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok", **self.server.pool.stats()})
+        elif url.path == "/metrics":
+            gauges = {f"server_{name}": value for name, value in self.server.pool.stats().items()}
+            self._send(200, render_prometheus(gauges=gauges).encode("utf-8"), "text/plain; version=0.0.4")
+        elif url.path == "/traces":
+            try:
+                limit = int(parse_qs(url.query).get("limit", ["20"])[0])
+            except ValueError:
+                self._send_json(400, {"error": "'limit' must be an integer"})
+                return
+            self._send_json(200, {"traces": get_recent_traces(limit)})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        """Solve one question."""
+        if self.path != "/solve":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "Content-Length must be a non-negative integer"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "Request body is too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Request body is not valid JSON"})
+            return
+        question = request.get("question") if isinstance(request, dict) else None
+        session_id = request.get("session_id") if isinstance(request, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            self._send_json(400, {"error": "'question' must be a non-empty string"})
+            return
+        if session_id is not None and not isinstance(session_id, str):
+            self._send_json(400, {"error": "'session_id' must be a string"})
+            return
+
+        try:
+            result = self.server.pool.solve(question, session_id)
+        except (ServerBusyError, AgentPoolFullError, WorkerRestartedError) as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+        except AgentTimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+        except Exception as e:
+            # The request was validated above, so anything else is a server error
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            trace = result.pop("trace", None)
+            if request.get("include_trace"):
+                result["trace"] = trace
+            self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        """Keep request logging quiet unless the server is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class SolverHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server that hands questions to a SolverPool."""
+
+    daemon_threads = True
+
+    def __init__(self, address, pool, verbose=False):
+        """
+        Bind the server.
+
+        Args:
+            address: (host, port) to listen on (port 0 picks a free port)
+            pool: The SolverPool answering questions
+            verbose: Log every request
+        """
+        super().__init__(address, SolverRequestHandler)
+        self.pool = pool
+        self.verbose = verbose
+
+def main(argv=None):
+    """Command line entry point for the HTTP server."""
+    parser = argparse.ArgumentParser(description="Serve the math solver over HTTP/JSON.")
+    parser.add_argument("--host", default=SERVER_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Solver processes (0 solves in this process)")
+    parser.add_argument("--max-pending", type=int, default=SERVER_MAX_PENDING, help="Requests accepted at once before answering 503")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    # Imported here so the server process does not load the model libraries
+    from src.llm.providers import configuration_error
+
+    problem = configuration_error()
+    if problem:
+        parser.error(problem)
+
+    pool = SolverPool(workers=args.workers, max_pending=args.max_pending)
+    pool.warm_up()
+    server = SolverHTTPServer((args.host, args.port), pool, verbose=args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {args.workers} workers", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+if __name__ == "__main__":
+    main()
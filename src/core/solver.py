@@ -0,0 +1,225 @@
+"""
+UI-independent solving of math questions.
+
+solve() answers one question for one session: it checks the shared answer
+cache, sends single-step problems straight to a tool, solves independent
+parts concurrently, and only then runs the session's agent. Nothing here
+depends on Streamlit, so the chat app, the HTTP server and scripts all call
+the same code.
+
+Sessions (memory and agent) are kept in a bounded, process-wide registry.
+A session evicted from it is rebuilt from the persisted history on its next
+request.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from src.agent.resources import (
+    get_llm,
+    get_math_tools,
+    get_session_agent,
+    get_response_cache,
+    get_agent_pool,
+)
+from src.agent.router import route_question, AGENT_ROUTE
+from src.agent.planner import answer_in_parallel
+from src.cache.tool_cache import tool_cache_scope
+from src.engines.datasets import upload_scope
+from src.memory.chat_memory import initialize_memory
+from src.llm.model import SUMMARY_TASK
+from src.tools.registry import preload_tools
+from src.utils import metrics
+from src.utils.tracing import RequestTracer, record_trace
+from config.settings import (
+    RESPONSE_CACHE_ENABLED,
+    ROUTER_ENABLED,
+    PLAN_EXECUTE_ENABLED,
+    SESSION_CACHE_SIZE,
+    TRACING_ENABLED,
+)
+
+CACHE_ROUTE = "cache"
+PARALLEL_ROUTE = "parallel"
+
+# Timing of each stage of solve(), e.g. "solver.stage.router_seconds"
+STAGE_SECONDS = "solver.stage.{}_seconds"
+STAGES = ("cache", "router", "planner", "agent", "memory_save")
+
+@dataclass
+class SolveResult:
+    """The answer to one question."""
+
+    answer: str
+    route: str
+    session_id: str
+    cached: bool = False
+    elapsed_seconds: float = 0.0
+    trace: dict = None
+
+class Session:
+    """One conversation: its memory, message history and agent."""
+
+    def __init__(self, session_id, llm):
+        """
+        Load the session's memory from storage.
+
+        Args:
+            session_id: The session identifier
+            llm: Language model used to summarize older turns
+        """
+        self.session_id = session_id
+        # Per-session objects (memory, agent) are kept here
+        self.state = {}
+        # One question at a time per session, so turns are saved in order
+        self.lock = threading.Lock()
+        self.memory, self.msgs = initialize_memory(llm, session_id, self.state)
+
+    def math_context(self):
+        """
+        Get the session's math context, indexed up to the latest message.
+
+        Returns:
+            MathContextIndex or None: The variables and equations defined so far
+        """
+        self.memory.index_new_messages()
+        return self.memory.context_index
+
+    @property
+    def agent(self):
+        """The session's math agent, built on first use."""
+        return get_session_agent(self.state, self.memory)
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_session(session_id):
+    """
+    Get a session, loading it on first use and evicting the least recently used.
+
+    Args:
+        session_id: The session identifier
+
+    Returns:
+        Session: The session
+    """
+    with _sessions_lock:
+        session = _sessions.get(session_id)
+        if session is not None:
+            _sessions.move_to_end(session_id)
+            return session
+    # Loaded outside the registry lock so other sessions are not held up
+    # Summaries of older turns are a cheap task, routed to a local model when configured
+    session = Session(session_id, get_llm(SUMMARY_TASK))
+    with _sessions_lock:
+        session = _sessions.setdefault(session_id, session)
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > SESSION_CACHE_SIZE:
+            _sessions.popitem(last=False)
+    return session
+
+def clear_sessions():
+    """Drop all loaded sessions so they are reloaded from storage on next use."""
+    with _sessions_lock:
+        _sessions.clear()
+
+@contextmanager
+def _stage(tracer, name):
+    # Times a stage in the metrics and, when tracing, as a span
+    started = time.perf_counter()
+    if tracer is None:
+        yield
+    else:
+        with tracer.span(name):
+            yield
+    metrics.observe(STAGE_SECONDS.format(name), time.perf_counter() - started)
+
+def _answer(session, question, callbacks, tracer):
+    # Returns (route, answer, cached, agent_ran)
+    tool_callbacks = [tracer] if tracer is not None else None
+    response_cache = get_response_cache() if RESPONSE_CACHE_ENABLED else None
+    # Questions about this session's definitions are neither shared nor sent straight to a tool
+    context_index = session.math_context()
+    # ResponseCache defines __len__, so an empty cache is falsy; compare with None
+    if response_cache is not None:
+        with _stage(tracer, "cache"):
+            response = response_cache.get(question, context_index)
+        if response is not None:
+            return CACHE_ROUTE, response, True, False
+
+    # File names in the question refer to this session's uploads
+    with tool_cache_scope(session.session_id), upload_scope(session.session_id):
+        route, response = AGENT_ROUTE, None
+        # Single-step problems go straight to a tool
+        if ROUTER_ENABLED:
+            with _stage(tracer, "router"):
+                route, response = route_question(question, get_math_tools(), callbacks=tool_callbacks, context_index=context_index)
+        # Independent parts of a multi-part question are solved concurrently
+        if response is None and PLAN_EXECUTE_ENABLED:
+            with _stage(tracer, "planner"):
+                response = answer_in_parallel(question, get_math_tools(), callbacks=tool_callbacks, context_index=context_index)
+            route = PARALLEL_ROUTE if response is not None else AGENT_ROUTE
+        agent_ran = response is None
+        if agent_ran:
+            with _stage(tracer, "agent"):
+                # Runs on the shared async pool; UI callbacks are replayed on this thread
+                response = get_agent_pool().run(session.agent, question, callbacks=[*(callbacks or []), *(tool_callbacks or [])])
+    if response_cache is not None:
+        response_cache.put(question, response, context_index)
+    return route, response, False, agent_ran
+
+def solve(question, session_id=None, callbacks=None, record=True):
+    """
+    Answer a question in the context of a session.
+
+    Args:
+        question: The user's question
+        session_id: The session to answer in (a new one is started if None)
+        callbacks: Callback handlers for the agent run (UI handlers are
+            replayed on the calling thread); tools answering directly run without them
+        record: Keep and export the request's trace in this process (a caller
+            that ships the trace elsewhere passes False)
+
+    Returns:
+        SolveResult: The answer, the route that produced it, timing and the trace
+    """
+    if not question or not question.strip():
+        raise ValueError("The question is empty")
+    started = time.perf_counter()
+    session = get_session(session_id or uuid.uuid4().hex)
+    tracer = RequestTracer(question, session.session_id) if TRACING_ENABLED else None
+
+    with session.lock:
+        try:
+            route, response, cached, agent_ran = _answer(session, question, callbacks, tracer)
+        except Exception as e:
+            if tracer is not None and record:
+                record_trace(tracer.finish(error=type(e).__name__))
+            raise
+        # Save the turn to memory (the agent pool already saved it when the agent ran)
+        if not agent_ran:
+            with _stage(tracer, "memory_save"):
+                session.memory.save_context({"input": question}, {"output": response})
+
+    trace = tracer.finish(route=route, cached=cached) if tracer is not None else None
+    if trace is not None and record:
+        record_trace(trace)
+    return SolveResult(
+        answer=response,
+        route=route,
+        session_id=session.session_id,
+        cached=cached,
+        elapsed_seconds=time.perf_counter() - started,
+        trace=trace,
+    )
+
+def warm_up():
+    """Build the shared LLM client and tools, and import their engines, now instead of on the first question."""
+    preload_tools()
+    get_llm()
+    get_llm(SUMMARY_TASK)
+    get_math_tools()
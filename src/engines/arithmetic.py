@@ -0,0 +1,363 @@
+"""
+Deterministic local arithmetic engine.
+
+Parses plain arithmetic (operators, functions, constants and implicit
+multiplication) and evaluates it with a restricted AST walker, so simple
+calculations never need an LLM round trip.
+"""
+
+import ast
+import decimal
+import math
+import operator
+import re
+
+class ExpressionParseError(ValueError):
+    """Raised when the input is not a plain arithmetic expression."""
+
+# Guards against pathological inputs such as 9**9**9, (9^9999)^9999 or 100000!
+MAX_EXPONENT = 10000
+MAX_FACTORIAL = 5000
+# Largest integer result computed, in decimal digits
+MAX_RESULT_DIGITS = 50000
+# Integers longer than this are displayed in scientific notation
+MAX_EXACT_DIGITS = 1000
+
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "cbrt": lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "arcsin": math.asin,
+    "arccos": math.acos,
+    "arctan": math.atan,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "exp": math.exp,
+    "ln": math.log,
+    "log": math.log,  # Natural log like numexpr; log(x, b) for other bases
+    "log10": math.log10,
+    "log2": math.log2,
+    "abs": abs,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "round": round,
+    "factorial": lambda n: _factorial(n),
+    "gcd": math.gcd,
+    "lcm": math.lcm,
+    "comb": lambda n, k: _combinations(math.comb, n, k),
+    "ncr": lambda n, k: _combinations(math.comb, n, k),
+    "perm": lambda n, k=None: _combinations(math.perm, n, k),
+    "npr": lambda n, k=None: _combinations(math.perm, n, k),
+    "degrees": math.degrees,
+    "radians": math.radians,
+    "min": min,
+    "max": max,
+}
+
+# Functions of integers; integral floats such as 6/2 are passed as ints
+INTEGER_FUNCTIONS = {"gcd", "lcm", "comb", "ncr", "perm", "npr"}
+
+CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+    "tau": math.tau,
+}
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: lambda base, exponent: _power(base, exponent),
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+
+# Unicode and textual notation mapped onto Python operators
+REPLACEMENTS = [
+    ("×", "*"),
+    ("·", "*"),
+    ("⋅", "*"),
+    ("÷", "/"),
+    ("−", "-"),
+    ("–", "-"),
+    ("π", "pi"),
+    ("√", "sqrt"),
+    ("^", "**"),
+]
+
+# Leading phrases the agent commonly wraps expressions in
+QUESTION_PREFIX = re.compile(
+    r"^\s*(what\s+is|what's|calculate|compute|evaluate|solve|find)\s*:?\s*",
+    re.IGNORECASE
+)
+
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<op>\*\*|//|[-+*/%(),!]))"
+)
+
+def _factorial(n):
+    if n != int(n) or n < 0:
+        raise ValueError("factorial is only defined for non-negative integers")
+    if n > MAX_FACTORIAL:
+        raise OverflowError("factorial argument too large")
+    return math.factorial(int(n))
+
+def _check_digits(digits):
+    if digits > MAX_RESULT_DIGITS:
+        raise OverflowError("result too large")
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise OverflowError("exponent too large")
+    # Integer powers are exact, so their size is bounded before computing them
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        _check_digits(exponent * math.log10(abs(base)))
+    result = operator.pow(base, exponent)
+    if isinstance(result, complex):
+        raise ValueError("a negative number to a fractional power has no real value (use cbrt for cube roots)")
+    return result
+
+def _combinations(function, n, k):
+    # Both are at most n!, whose size is known without computing it
+    if isinstance(n, int) and n > MAX_FACTORIAL:
+        k = n if k is None else k
+        if isinstance(k, int) and 0 <= k <= n:
+            chosen = math.lgamma(n + 1) - math.lgamma(n - k + 1)
+            if function is math.comb:
+                chosen -= math.lgamma(k + 1)
+            _check_digits(chosen / math.log(10))
+    return function(n, k)
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise ExpressionParseError(f"Unexpected character at position {position}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name":
+            value = value.lower()
+            if value not in FUNCTIONS and value not in CONSTANTS:
+                # Allow run-together constants such as "2pie" or "pie"
+                parts = _split_constants(value)
+                if parts is None:
+                    raise ExpressionParseError(f"Unknown name: {value}")
+                tokens.extend(("name", part) for part in parts)
+                position = match.end()
+                continue
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+def _split_constants(name):
+    parts = []
+    while name:
+        for constant in sorted(CONSTANTS, key=len, reverse=True):
+            if name.startswith(constant):
+                parts.append(constant)
+                name = name[len(constant):]
+                break
+        else:
+            return None
+    return parts
+
+def _is_operand_end(token):
+    kind, value = token
+    return kind == "number" or value == ")" or value == "!" or (kind == "name" and value in CONSTANTS)
+
+def _is_operand_start(token):
+    kind, value = token
+    return kind in ("number", "name") or value == "("
+
+def _insert_implicit_multiplication(tokens):
+    result = []
+    for token in tokens:
+        if result and _is_operand_end(result[-1]) and _is_operand_start(token):
+            result.append(("op", "*"))
+        result.append(token)
+    return result
+
+def _apply_factorials(tokens):
+    # Rewrite postfix "n!" and "(...)!" as factorial(...) calls
+    result = []
+    for token in tokens:
+        if token != ("op", "!"):
+            result.append(token)
+            continue
+        if not result:
+            raise ExpressionParseError("Factorial without an operand")
+        if result[-1] == ("op", ")"):
+            depth = 0
+            for start in range(len(result) - 1, -1, -1):
+                if result[start] == ("op", ")"):
+                    depth += 1
+                elif result[start] == ("op", "("):
+                    depth -= 1
+                    if depth == 0:
+                        break
+            else:
+                raise ExpressionParseError("Unbalanced parentheses")
+            # Keep a preceding function name attached to its call
+            if start > 0 and result[start - 1][0] == "name" and result[start - 1][1] in FUNCTIONS:
+                start -= 1
+        elif result[-1][0] in ("number", "name"):
+            start = len(result) - 1
+        else:
+            raise ExpressionParseError("Factorial without an operand")
+        operand = result[start:]
+        del result[start:]
+        result.extend([("name", "factorial"), ("op", "(")] + operand + [("op", ")")])
+    return result
+
+def normalize_expression(text):
+    """
+    Normalize user notation into a Python arithmetic expression.
+    
+    Args:
+        text: The raw calculator input
+        
+    Returns:
+        str: The normalized expression
+        
+    Raises:
+        ExpressionParseError: If the text is not plain arithmetic
+    """
+    text = QUESTION_PREFIX.sub("", text.strip()).strip().rstrip("?=").strip()
+    if not text:
+        raise ExpressionParseError("Empty expression")
+    
+    for source, target in REPLACEMENTS:
+        text = text.replace(source, target)
+    text = re.sub(r"([⁰¹²³⁴⁵⁶⁷⁸⁹]+)", lambda m: "**" + m.group(1).translate(SUPERSCRIPTS), text)
+    
+    tokens = _tokenize(text)
+    tokens = _apply_factorials(tokens)
+    tokens = _insert_implicit_multiplication(tokens)
+    return "".join(value for _, value in tokens)
+
+def parse_expression(text):
+    """
+    Parse calculator input into a validated AST.
+    
+    Args:
+        text: The raw calculator input
+        
+    Returns:
+        ast.Expression: The parsed expression tree
+        
+    Raises:
+        ExpressionParseError: If the text cannot be parsed as plain arithmetic
+    """
+    expression = normalize_expression(text)
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ExpressionParseError(str(e)) from e
+    _validate(tree.body)
+    return tree
+
+def _validate(node):
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ExpressionParseError("Only numeric literals are allowed")
+    elif isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise ExpressionParseError(f"Unknown constant: {node.id}")
+    elif isinstance(node, ast.BinOp):
+        if type(node.op) not in BINARY_OPERATORS:
+            raise ExpressionParseError("Unsupported operator")
+        _validate(node.left)
+        _validate(node.right)
+    elif isinstance(node, ast.UnaryOp):
+        if type(node.op) not in UNARY_OPERATORS:
+            raise ExpressionParseError("Unsupported operator")
+        _validate(node.operand)
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise ExpressionParseError("Unsupported function call")
+        for arg in node.args:
+            _validate(arg)
+    else:
+        raise ExpressionParseError(f"Unsupported syntax: {type(node).__name__}")
+
+def _evaluate(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return CONSTANTS[node.id]
+    if isinstance(node, ast.BinOp):
+        return BINARY_OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.UnaryOp):
+        return UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    name = node.func.id
+    args = [_evaluate(arg) for arg in node.args]
+    if name in INTEGER_FUNCTIONS:
+        if any(arg != int(arg) for arg in args):
+            raise ValueError(f"{name} is only defined for integers")
+        args = [int(arg) for arg in args]
+    try:
+        return FUNCTIONS[name](*args)
+    except TypeError as e:
+        # Wrong number or kind of arguments, e.g. sqrt(1, 2) or max(1)
+        raise ExpressionParseError(f"Invalid arguments to {name}: {e}") from e
+
+def evaluate_expression(text):
+    """
+    Parse and evaluate a plain arithmetic expression.
+    
+    Args:
+        text: The raw calculator input, e.g. "2(3+4)^2" or "sqrt(16) + 2pi"
+        
+    Returns:
+        The numeric result
+        
+    Raises:
+        ExpressionParseError: If the text cannot be parsed as plain arithmetic,
+            or a function is called with the wrong number of arguments
+        ArithmeticError: If evaluation fails (division by zero, overflow, ...)
+        ValueError: If a function is called outside its domain or the result
+            is not a real number
+    """
+    return _evaluate(parse_expression(text).body)
+
+def format_number(value):
+    """
+    Format a numeric result for display.
+    
+    Args:
+        value: The numeric result
+        
+    Returns:
+        str: Integers exactly (very long ones in scientific notation), floats
+            with 12 significant digits
+    """
+    if isinstance(value, complex):
+        raise ValueError("the result is not a real number")
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.12g}"
+    if isinstance(value, int) and value.bit_length() * math.log10(2) > MAX_EXACT_DIGITS:
+        # str() of an int this long is slow (and refused beyond 4300 digits)
+        context = decimal.Context(prec=12)
+        return f"{context.create_decimal(value).normalize(context):.12g}"
+    return str(value)
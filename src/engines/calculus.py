@@ -0,0 +1,328 @@
+"""
+Symbolic calculus engine backed by SymPy.
+
+Recognizes derivative, integral and limit questions, computes the exact
+result and leaves only the explanation to the language model. Numbers too
+large to compute are rejected while parsing, and every computation runs
+under a deadline.
+"""
+
+import math
+import re
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import sympy
+from sympy.parsing.sympy_parser import (
+    parse_expr,
+    standard_transformations,
+    implicit_multiplication_application,
+    convert_xor,
+)
+from src.utils import metrics
+from config.settings import CAS_CACHE_SIZE, CAS_TIMEOUT_SECONDS, CAS_MAX_WORKERS
+
+CAS_TIMEOUTS = "calculus.cas.timeouts"
+
+# Numbers in questions and results are kept below this many digits
+MAX_NUMBER_DIGITS = 1000
+
+class CalculusParseError(ValueError):
+    """Raised when a question cannot be turned into a symbolic calculus problem."""
+
+TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+
+# Names the parser may resolve; anything else is rejected before SymPy sees it
+ALLOWED_FUNCTIONS = {
+    "sin", "cos", "tan", "cot", "sec", "csc",
+    "asin", "acos", "atan", "sinh", "cosh", "tanh",
+    "exp", "log", "ln", "sqrt", "abs", "pi", "e", "oo", "inf", "infinity",
+}
+
+LOCAL_NAMES = {
+    "e": sympy.E,
+    "ln": sympy.log,
+    "abs": sympy.Abs,
+    "inf": sympy.oo,
+    "infinity": sympy.oo,
+}
+
+SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹", "0123456789")
+
+SAFE_EXPRESSION = re.compile(r"^[0-9A-Za-z+\-*/^().,\s]+$")
+
+DERIVATIVE_PATTERN = re.compile(
+    r"(?P<order>second|third|2nd|3rd)?\s*(?:derivative|differentiate|d/d(?P<dvar>[a-z]))"
+    r"\s*(?:of)?\s*(?P<body>.+?)"
+    r"(?:\s*(?:with respect to|w\.r\.t\.?|wrt)\s+(?P<var>[a-z]))?\s*$",
+    re.IGNORECASE
+)
+
+INTEGRAL_PATTERN = re.compile(
+    r"(?:integral|integrate|antiderivative)\s*(?:of)?\s*(?P<body>.+?)"
+    r"(?:\s*d(?P<dvar>[a-z]))?"
+    r"(?:\s*(?:with respect to|wrt)\s+(?P<var>[a-z]))?"
+    r"(?:\s*from\s+(?P<lower>.+?)\s+to\s+(?P<upper>.+?))?\s*$",
+    re.IGNORECASE
+)
+
+LIMIT_PATTERN = re.compile(
+    r"limit\s*(?:of)?\s*(?P<body>.+?)\s*(?:as|when)\s+(?P<var>[a-z])\s*"
+    r"(?:->|→|approaches|tends to|goes to)\s*(?P<point>.+?)\s*$",
+    re.IGNORECASE
+)
+
+ORDERS = {"second": 2, "2nd": 2, "third": 3, "3rd": 3}
+
+@dataclass(frozen=True)
+class CalculusResult:
+    """An exactly computed calculus result."""
+    operation: str
+    expression: sympy.Expr
+    variable: sympy.Symbol
+    result: Optional[sympy.Expr]
+    detail: str = ""  # Stated instead of the result when there is none, e.g. for a limit that does not exist
+    
+    def describe(self):
+        """
+        Describe the result in one line of plain text.
+        
+        Returns:
+            str: e.g. "d/dx (x**2) = 2*x"
+        """
+        result = sympy.sstr(self.result) if self.result is not None else self.detail
+        return f"{self.operation} of {sympy.sstr(self.expression)} with respect to {self.variable}: {result}"
+    
+    def latex(self):
+        """
+        Get the result as LaTeX.
+        
+        Returns:
+            str: The LaTeX form of the result
+        """
+        if self.result is None:
+            return rf"\text{{{self.detail}}}"
+        return sympy.latex(self.result)
+
+def _clean(text):
+    text = text.strip().rstrip("?.").strip()
+    # Drop a leading "f(x) =" or "y =" definition
+    text = re.sub(r"^(?:[a-z]\s*\(\s*[a-z]\s*\)|y)\s*=\s*", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"([⁰¹²³⁴⁵⁶⁷⁸⁹]+)", lambda m: "^" + m.group(1).translate(SUPERSCRIPTS), text)
+    return text.replace("−", "-").replace("×", "*").replace("·", "*").replace("π", "pi")
+
+def _digits(expression):
+    # Upper bound on the decimal digits of a number written as an unevaluated expression
+    if expression.is_Rational:
+        return math.log10(max(abs(expression.p), abs(expression.q)))
+    if expression.is_Float:
+        return max(0.0, math.log10(abs(float(expression)))) if expression else 0.0
+    if expression.is_Pow:
+        base, exponent = expression.args
+        base_digits = _digits(base)
+        if base_digits == 0:
+            return 0.0
+        try:
+            return 10 ** _digits(exponent) * base_digits
+        except OverflowError:
+            return math.inf
+    if expression.is_Mul:
+        return sum(_digits(arg) for arg in expression.args)
+    if expression.is_Add:
+        return max(_digits(arg) for arg in expression.args) + math.log10(len(expression.args))
+    # Symbols and functions; their arguments are checked on their own
+    return 0.0
+
+def _check_size(expression):
+    for node in sympy.preorder_traversal(expression):
+        if node.is_Pow and _digits(node) > MAX_NUMBER_DIGITS:
+            raise CalculusParseError(f"Number too large to compute: {sympy.sstr(node)}")
+
+@lru_cache(maxsize=CAS_CACHE_SIZE)
+def parse_math_expression(text):
+    """
+    Parse an expression string into a SymPy expression.
+    
+    Results are memoized with LRU eviction.
+    
+    Args:
+        text: The expression, e.g. "x^3 - 4x^2 + 7x - 9"
+        
+    Returns:
+        sympy.Expr: The parsed expression
+        
+    Raises:
+        CalculusParseError: If the text is not a safe, parseable expression
+    """
+    text = _clean(text)
+    if not text or not SAFE_EXPRESSION.match(text):
+        raise CalculusParseError(f"Unsupported characters in expression: {text!r}")
+    for name in re.findall(r"[A-Za-z]{2,}", text):
+        if name.lower() not in ALLOWED_FUNCTIONS:
+            raise CalculusParseError(f"Unknown name in expression: {name}")
+    try:
+        # Sizes are checked before anything is evaluated: 9^9^9^9 would never finish
+        _check_size(parse_expr(text.lower(), local_dict=LOCAL_NAMES, transformations=TRANSFORMATIONS, evaluate=False))
+        return parse_expr(text.lower(), local_dict=LOCAL_NAMES, transformations=TRANSFORMATIONS, evaluate=True)
+    except CalculusParseError:
+        raise
+    except Exception as e:  # SymPy raises a wide range of exceptions on bad input
+        raise CalculusParseError(str(e)) from e
+
+@lru_cache(maxsize=CAS_CACHE_SIZE)
+def simplify_expression(expression):
+    """
+    Simplify a SymPy expression, memoized with LRU eviction.
+    
+    Args:
+        expression: The SymPy expression
+        
+    Returns:
+        sympy.Expr: The simplified expression
+    """
+    return sympy.simplify(expression)
+
+def _variable(expression, name=None):
+    if name:
+        return sympy.Symbol(name.lower())
+    free = sorted(expression.free_symbols, key=lambda s: s.name)
+    if not free:
+        return sympy.Symbol("x")
+    if sympy.Symbol("x") in free:
+        return sympy.Symbol("x")
+    return free[0]
+
+def _strip_question(question):
+    question = " ".join(question.split())
+    # Drop polite leading phrases such as "Find the" or "Compute the"
+    return re.sub(r"^(?:please\s+)?(?:find|compute|calculate|evaluate|what is|what's)?\s*(?:the\s+)?", "", question, flags=re.IGNORECASE)
+
+def is_calculus_question(question):
+    """
+    Cheaply check whether a question looks like a derivative, integral or limit.
+    
+    Only the question's shape is checked; nothing is computed.
+    
+    Args:
+        question: The natural language question
+        
+    Returns:
+        bool: True if solve_calculus is likely to handle it
+    """
+    question = _strip_question(question)
+    for pattern in (LIMIT_PATTERN, DERIVATIVE_PATTERN, INTEGRAL_PATTERN):
+        match = pattern.match(question)
+        if match:
+            try:
+                parse_math_expression(match.group("body"))
+            except CalculusParseError:
+                return False
+            return True
+    return False
+
+def _limit(expression, variable, point):
+    # Returns (limit, detail); the limit is None when the one-sided limits differ
+    if point.is_infinite:
+        return sympy.limit(expression, variable, point), ""
+    left = sympy.limit(expression, variable, point, dir="-")
+    right = sympy.limit(expression, variable, point, dir="+")
+    if left != right:
+        return None, f"does not exist (the limit from the left is {sympy.sstr(left)}, from the right {sympy.sstr(right)})"
+    return right, ""
+
+def _check_result(result):
+    for number in result.atoms(sympy.Rational):
+        if max(abs(number.p), abs(number.q)).bit_length() * math.log10(2) > MAX_NUMBER_DIGITS:
+            raise CalculusParseError("The result is too large to show")
+    return result
+
+# SymPy cannot be interrupted, so a computation past its deadline is abandoned and
+# finishes on its own (daemon) thread; the slots bound how many can pile up
+_slots = threading.BoundedSemaphore(CAS_MAX_WORKERS)
+
+def _with_deadline(function, *args):
+    if not _slots.acquire(timeout=CAS_TIMEOUT_SECONDS):
+        raise CalculusParseError("The symbolic engine is busy")
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            _slots.release()
+    
+    try:
+        threading.Thread(target=run, name="cas", daemon=True).start()
+    except BaseException:
+        _slots.release()
+        raise
+    try:
+        return future.result(timeout=CAS_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        metrics.increment(CAS_TIMEOUTS)
+        raise CalculusParseError(f"No result within {CAS_TIMEOUT_SECONDS} seconds") from None
+
+def solve_calculus(question):
+    """
+    Solve a derivative, integral or limit question exactly.
+    
+    The computation is given CAS_TIMEOUT_SECONDS; after that the question
+    is treated as one the engine cannot handle.
+    
+    Args:
+        question: The natural language question
+        
+    Returns:
+        CalculusResult: The exactly computed result
+        
+    Raises:
+        CalculusParseError: If the question is not a recognizable calculus
+            problem, or no result of a displayable size was found in time
+    """
+    solved = _with_deadline(_solve_calculus, question)
+    if solved.result is not None:
+        _check_result(solved.result)
+    return solved
+
+def _solve_calculus(question):
+    question = _strip_question(question)
+    
+    match = LIMIT_PATTERN.match(question)
+    if match:
+        expression = parse_math_expression(match.group("body"))
+        variable = sympy.Symbol(match.group("var").lower())
+        point = parse_math_expression(match.group("point"))
+        result, detail = _limit(expression, variable, point)
+        return CalculusResult(f"limit as {variable} -> {point}", expression, variable, result, detail)
+    
+    match = DERIVATIVE_PATTERN.match(question)
+    if match:
+        expression = parse_math_expression(match.group("body"))
+        variable = _variable(expression, match.group("var") or match.group("dvar"))
+        order = ORDERS.get((match.group("order") or "").lower(), 1)
+        result = simplify_expression(sympy.diff(expression, variable, order))
+        operation = "derivative" if order == 1 else f"derivative of order {order}"
+        return CalculusResult(operation, expression, variable, result)
+    
+    match = INTEGRAL_PATTERN.match(question)
+    if match:
+        expression = parse_math_expression(match.group("body"))
+        variable = _variable(expression, match.group("var") or match.group("dvar"))
+        if match.group("lower"):
+            lower = parse_math_expression(match.group("lower"))
+            upper = parse_math_expression(match.group("upper"))
+            result = simplify_expression(sympy.integrate(expression, (variable, lower, upper)))
+            operation = f"definite integral from {lower} to {upper}"
+        else:
+            result = simplify_expression(sympy.integrate(expression, variable))
+            operation = "indefinite integral (constant of integration omitted)"
+        if result.has(sympy.Integral):
+            raise CalculusParseError("No closed form found")
+        return CalculusResult(operation, expression, variable, result)
+    
+    raise CalculusParseError("Not a derivative, integral or limit question")
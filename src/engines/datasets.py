@@ -0,0 +1,228 @@
+"""
+Storage for user-uploaded matrices and datasets.
+
+Uploaded files are written to a directory of their session under
+UPLOAD_DIR and referenced from questions by file name, so one session never
+sees another's files. Large arrays are loaded as read-only memory maps so
+they never have to be copied into process memory up front.
+"""
+
+import contextvars
+import csv
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+from config.settings import UPLOAD_DIR
+
+SUPPORTED_EXTENSIONS = (".csv", ".npy")
+
+# Rows parsed per chunk when streaming a CSV file
+CSV_CHUNK_ROWS = 10000
+
+FILE_REFERENCE = re.compile(r"([\w.-]+\.(?:csv|npy))\b", re.IGNORECASE)
+
+# Memory-mapped copies of CSV files are kept in this subdirectory, out of the listing
+CACHE_DIR_NAME = ".cache"
+
+class DatasetError(ValueError):
+    """Raised when an uploaded dataset is missing or malformed."""
+
+_session_id = contextvars.ContextVar("upload_session_id", default=None)
+
+@contextmanager
+def upload_scope(session_id):
+    """
+    Resolve file names in questions against a session's uploads.
+    
+    Args:
+        session_id: The chat session id
+    """
+    token = _session_id.set(session_id)
+    try:
+        yield
+    finally:
+        _session_id.reset(token)
+
+def upload_dir(session_id=None):
+    """
+    Get the directory holding a session's uploads.
+    
+    Args:
+        session_id: The chat session id (defaults to the one of the active
+            upload_scope; without one, UPLOAD_DIR itself is used)
+        
+    Returns:
+        str: The directory path
+    """
+    session_id = session_id or _session_id.get()
+    if session_id is None:
+        return UPLOAD_DIR
+    # Session ids come from the client, so the directory is named by their hash
+    return os.path.join(UPLOAD_DIR, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+def _upload_path(name, session_id=None):
+    # Only keep the base name so uploads cannot escape their directory
+    return os.path.join(upload_dir(session_id), os.path.basename(name))
+
+def save_upload(name, data, session_id=None):
+    """
+    Save an uploaded file.
+    
+    Args:
+        name: The original file name
+        data: The file contents as bytes
+        session_id: The session the file belongs to
+        
+    Returns:
+        str: The path the file was saved to
+    """
+    if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise DatasetError(f"Unsupported file type: {name}")
+    os.makedirs(upload_dir(session_id), exist_ok=True)
+    path = _upload_path(name, session_id)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def list_uploads(session_id=None):
+    """
+    List the names of a session's uploaded files.
+    
+    Args:
+        session_id: The session whose files are listed
+        
+    Returns:
+        list: Sorted file names
+    """
+    directory = upload_dir(session_id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(os.path.join(directory, name))
+    )
+
+def find_file_reference(text):
+    """
+    Find an uploaded file referenced in a question.
+    
+    Args:
+        text: The question text
+        
+    Returns:
+        str or None: The referenced file name if it has been uploaded
+    """
+    for name in FILE_REFERENCE.findall(text):
+        if os.path.exists(_upload_path(name)):
+            return os.path.basename(name)
+    return None
+
+def iter_csv_chunks(name, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Stream a CSV file as numeric NumPy chunks.
+    
+    A non-numeric first row is treated as a header and skipped.
+    
+    Args:
+        name: The uploaded file name
+        chunk_rows: Maximum rows per chunk
+        
+    Yields:
+        numpy.ndarray: 2-D float arrays of at most chunk_rows rows
+    """
+    path = _upload_path(name)
+    if not os.path.exists(path):
+        raise DatasetError(f"No uploaded file named {name}")
+    
+    with open(path, newline="") as f:
+        rows = []
+        columns = None
+        for index, row in enumerate(csv.reader(f)):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            try:
+                values = [float(cell) for cell in row]
+            except ValueError:
+                if index == 0:
+                    continue  # Header row
+                raise DatasetError(f"Non-numeric value in {name} at row {index + 1}")
+            if columns is None:
+                columns = len(values)
+            elif len(values) != columns:
+                raise DatasetError(f"Rows in {name} have different lengths (row {index + 1} has {len(values)} values, not {columns})")
+            rows.append(values)
+            if len(rows) == chunk_rows:
+                yield np.array(rows)
+                rows = []
+        if rows:
+            yield np.array(rows)
+
+def read_csv_header(name):
+    """
+    Get the column names of an uploaded CSV file.
+    
+    Args:
+        name: The uploaded file name
+        
+    Returns:
+        list: Column names, or None if the file has no header row
+    """
+    with open(_upload_path(name), newline="") as f:
+        first = next(csv.reader(f), [])
+    try:
+        [float(cell) for cell in first]
+    except ValueError:
+        return [cell.strip() for cell in first]
+    return None
+
+def _csv_to_npy(name):
+    # Convert once to .npy so later loads can be memory-mapped
+    path = _upload_path(name)
+    cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, os.path.basename(path) + ".npy")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return cache_path
+    
+    rows = 0
+    columns = None
+    for chunk in iter_csv_chunks(name):
+        columns = chunk.shape[1]
+        rows += chunk.shape[0]
+    if columns is None:
+        raise DatasetError(f"{name} contains no numeric rows")
+    
+    array = np.lib.format.open_memmap(cache_path, mode="w+", dtype=np.float64, shape=(rows, columns))
+    offset = 0
+    for chunk in iter_csv_chunks(name):
+        array[offset:offset + chunk.shape[0]] = chunk
+        offset += chunk.shape[0]
+    array.flush()
+    del array
+    return cache_path
+
+def load_array(name):
+    """
+    Load an uploaded CSV or NPY file as a read-only memory-mapped array.
+    
+    Args:
+        name: The uploaded file name
+        
+    Returns:
+        numpy.ndarray: The memory-mapped array
+        
+    Raises:
+        DatasetError: If the file is missing or malformed
+    """
+    path = _upload_path(name)
+    if not os.path.exists(path):
+        raise DatasetError(f"No uploaded file named {name}")
+    if name.lower().endswith(".csv"):
+        path = _csv_to_npy(name)
+    try:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError as e:
+        raise DatasetError(str(e)) from e
@@ -0,0 +1,199 @@
+"""
+Linear algebra engine backed by NumPy/LAPACK.
+
+Extracts matrix literals such as [[4, 2], [1, 3]] (or an uploaded CSV/NPY
+file) from a question and runs the requested operation numerically.
+"""
+
+import ast
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from src.engines.datasets import find_file_reference, load_array
+
+class LinearAlgebraParseError(ValueError):
+    """Raised when a question cannot be turned into a numeric linear algebra operation."""
+
+# Nested bracket literals such as [[4, 2], [1, 3]]
+MATRIX_LITERAL = re.compile(r"\[\s*\[[^\[\]]*\](?:\s*,\s*\[[^\[\]]*\])*\s*\]")
+
+# Checked in order; the first keyword found decides the operation
+OPERATIONS = [
+    ("solve", re.compile(r"\bsolve\b|\bsystem\b|ax\s*=\s*b", re.IGNORECASE)),
+    ("inverse", re.compile(r"\binver(?:se|t)\b", re.IGNORECASE)),
+    ("determinant", re.compile(r"\bdet(?:erminant)?\b", re.IGNORECASE)),
+    ("eigen", re.compile(r"\beigen", re.IGNORECASE)),
+    ("svd", re.compile(r"\bsvd\b|singular value", re.IGNORECASE)),
+    ("rank", re.compile(r"\brank\b", re.IGNORECASE)),
+    ("trace", re.compile(r"\btrace\b", re.IGNORECASE)),
+    ("transpose", re.compile(r"\btranspose\b", re.IGNORECASE)),
+    ("product", re.compile(r"\bmultipl|\bproduct\b|\btimes\b|@|\*", re.IGNORECASE)),
+]
+
+@dataclass
+class LinearAlgebraResult:
+    """A numerically computed linear algebra result."""
+    operation: str
+    operand_shapes: list
+    result: dict
+    
+    def describe(self):
+        """
+        Describe the result as plain text.
+        
+        Returns:
+            str: The operation, operand shapes and formatted values
+        """
+        shapes = ", ".join("x".join(str(d) for d in shape) for shape in self.operand_shapes)
+        lines = [f"{self.operation} (operands: {shapes})"]
+        for label, value in self.result.items():
+            lines.append(f"{label}: {format_array(value)}")
+        return "\n".join(lines)
+
+def format_array(value):
+    """
+    Format a scalar or array compactly, summarizing very large arrays.
+    
+    Args:
+        value: A scalar or NumPy array
+        
+    Returns:
+        str: The formatted value
+    """
+    if isinstance(value, str):
+        return value
+    if np.isscalar(value) or getattr(value, "ndim", 1) == 0:
+        value = complex(value) if np.iscomplexobj(value) else float(value)
+        if isinstance(value, complex) and value.imag == 0:
+            value = value.real
+        if isinstance(value, float):
+            return str(int(round(value))) if abs(value - round(value)) < 1e-9 else f"{value:.6g}"
+        return f"{value:.6g}"
+    array = np.real_if_close(np.asarray(value))
+    return np.array2string(array, precision=6, suppress_small=True, threshold=200, edgeitems=3)
+
+def extract_matrices(question):
+    """
+    Extract matrix and vector operands from a question.
+    
+    Args:
+        question: The question text
+        
+    Returns:
+        list: NumPy arrays in the order they appear
+    """
+    operands = []
+    spans = []
+    for match in MATRIX_LITERAL.finditer(question):
+        operands.append((match.start(), _literal_to_array(match.group(0))))
+        spans.append(match.span())
+    for match in re.finditer(r"\[[^\[\]]+\]", question):
+        if any(start <= match.start() < end for start, end in spans):
+            continue
+        operands.append((match.start(), _literal_to_array(match.group(0))))
+    
+    reference = find_file_reference(question)
+    if reference:
+        operands.append((question.find(reference), load_array(reference)))
+    
+    return [array for _, array in sorted(operands, key=lambda item: item[0])]
+
+def _literal_to_array(literal):
+    try:
+        value = ast.literal_eval(literal)
+        array = np.array(value, dtype=float)
+    except (ValueError, SyntaxError, TypeError) as e:
+        raise LinearAlgebraParseError(f"Invalid matrix literal: {literal}") from e
+    if array.ndim not in (1, 2):
+        raise LinearAlgebraParseError(f"Expected a vector or matrix: {literal}")
+    return array
+
+def _square(matrix, operation):
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise LinearAlgebraParseError(f"The {operation} requires a square matrix")
+    return matrix
+
+def _detect_operation(question):
+    for operation, pattern in OPERATIONS:
+        # Strip the literals so "*" inside numbers or brackets is not mistaken for a product
+        if pattern.search(MATRIX_LITERAL.sub(" ", question)):
+            return operation
+    return None
+
+def is_linear_algebra_question(question):
+    """
+    Cheaply check whether a question is a numeric matrix operation.
+    
+    Args:
+        question: The question text
+        
+    Returns:
+        bool: True if it contains a matrix literal or uploaded file and a supported operation
+    """
+    has_operand = MATRIX_LITERAL.search(question) or (find_file_reference(question) and re.search(r"matri", question, re.IGNORECASE))
+    return bool(has_operand) and _detect_operation(question) is not None
+
+def solve_linear_algebra(question):
+    """
+    Compute a linear algebra operation requested in a question.
+    
+    Supported: determinant, inverse, rank, eigenvalues/eigenvectors, SVD,
+    solving Ax = b, matrix products, trace and transpose.
+    
+    Args:
+        question: The question text containing matrix literals or an uploaded file name
+        
+    Returns:
+        LinearAlgebraResult: The computed result
+        
+    Raises:
+        LinearAlgebraParseError: If no operation or operands can be identified
+    """
+    operands = extract_matrices(question)
+    if not operands:
+        raise LinearAlgebraParseError("No matrix found in the question")
+    operation = _detect_operation(question)
+    if operation is None:
+        raise LinearAlgebraParseError("No supported operation found in the question")
+    
+    matrix = operands[0]
+    shapes = [operand.shape for operand in operands]
+    try:
+        if operation == "determinant":
+            result = {"determinant": np.linalg.det(_square(matrix, operation))}
+        elif operation == "inverse":
+            result = {"inverse": np.linalg.inv(_square(matrix, operation))}
+        elif operation == "rank":
+            result = {"rank": np.linalg.matrix_rank(matrix)}
+        elif operation == "eigen":
+            square = _square(matrix, operation)
+            if np.allclose(square, square.T):
+                values, vectors = np.linalg.eigh(square)
+            else:
+                values, vectors = np.linalg.eig(square)
+            result = {"eigenvalues": values, "eigenvectors (columns)": vectors}
+        elif operation == "svd":
+            result = {"singular values": np.linalg.svd(matrix, compute_uv=False)}
+        elif operation == "trace":
+            result = {"trace": np.trace(_square(matrix, operation))}
+        elif operation == "transpose":
+            result = {"transpose": matrix.T}
+        elif operation == "solve":
+            if len(operands) < 2:
+                raise LinearAlgebraParseError("Solving Ax = b needs both A and b")
+            result = {"x": np.linalg.solve(_square(matrix, operation), operands[1])}
+        else:
+            if len(operands) < 2:
+                raise LinearAlgebraParseError("A product needs two operands")
+            product = operands[0]
+            for operand in operands[1:]:
+                product = product @ operand
+            result = {"product": product}
+    except LinearAlgebraParseError:
+        raise
+    except (np.linalg.LinAlgError, ValueError) as e:
+        # A well-formed question with no numeric answer, e.g. a singular matrix
+        result = {"error": str(e)}
+    
+    return LinearAlgebraResult(operation, shapes, result)
@@ -0,0 +1,325 @@
+"""
+Statistics engine backed by NumPy and SciPy.
+
+Handles descriptive statistics, common distributions, hypothesis tests,
+confidence intervals and linear regression on inline data or an uploaded
+CSV file, computing each result in a single vectorized pass.
+"""
+
+import ast
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from src.engines.datasets import find_file_reference, load_array, read_csv_header
+
+class StatisticsParseError(ValueError):
+    """Raised when a question cannot be turned into a statistics computation."""
+
+NUMBER = r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?"
+BRACKET_LIST = re.compile(r"\[([^\[\]]+)\]")
+# At least three comma or space separated numbers, e.g. "data: 4, 8, 15, 16"
+INLINE_LIST = re.compile(rf"{NUMBER}(?:\s*[,;]\s*{NUMBER}|\s+{NUMBER}){{2,}}")
+
+COIN_FLIPS = re.compile(
+    r"(?P<bound>at least|at most|exactly|more than|fewer than|less than)?\s*(?P<k>\d+)\s+heads?\s+"
+    r"(?:in|out of|from)\s+(?P<n>\d+)\s+(?:coin\s+)?(?:flips|tosses)",
+    re.IGNORECASE
+)
+PROBABILITY_EVENT = re.compile(rf"P\s*\(\s*X\s*(?P<op><=|>=|<|>|=|≤|≥)\s*(?P<value>{NUMBER})\s*\)", re.IGNORECASE)
+PERCENTILE = re.compile(r"(?P<value>\d+(?:\.\d+)?)\s*(?:th|st|nd|rd)?\s*(?:percentile|quantile)", re.IGNORECASE)
+CONFIDENCE = re.compile(r"(?P<value>\d+(?:\.\d+)?)\s*%\s*(?:confidence|ci\b)", re.IGNORECASE)
+
+BOUNDS = {
+    "at least": ">=",
+    "at most": "<=",
+    "exactly": "=",
+    "more than": ">",
+    "fewer than": "<",
+    "less than": "<",
+    "≤": "<=",
+    "≥": ">=",
+}
+
+DESCRIPTIVE_KEYWORDS = re.compile(
+    r"\b(mean|average|median|mode|variance|standard deviation|std|range|quartile|summary|describe|descriptive)\b",
+    re.IGNORECASE
+)
+
+@dataclass
+class StatisticsResult:
+    """A numerically computed statistics result."""
+    operation: str
+    values: dict
+    
+    def describe(self):
+        """
+        Describe the result as plain text.
+        
+        Returns:
+            str: The operation followed by one line per computed value
+        """
+        lines = [self.operation]
+        for label, value in self.values.items():
+            lines.append(f"{label}: {_format(value)}")
+        return "\n".join(lines)
+
+def _format(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return "(" + ", ".join(_format(v) for v in value) + ")"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return f"{float(value):.6g}"
+    return str(value)
+
+def _parameter(question, names):
+    pattern = rf"\b(?:{'|'.join(names)})\s*(?:=|:|of|is)?\s*({NUMBER})"
+    match = re.search(pattern, question, re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+def _to_array(text):
+    try:
+        values = ast.literal_eval("[" + re.sub(r"\s+", ",", text.replace(";", ",").strip(" ,")).replace(",,", ",") + "]")
+        array = np.array(values, dtype=float)
+    except (ValueError, SyntaxError, TypeError) as e:
+        raise StatisticsParseError(f"Invalid data list: {text}") from e
+    return array.ravel()
+
+def extract_datasets(question):
+    """
+    Extract numeric samples from a question.
+    
+    Bracketed lists are used first, then inline runs of three or more
+    numbers, then the columns of an uploaded CSV/NPY file named in the text.
+    A column can be selected by header name ("column height").
+    
+    Args:
+        question: The question text
+        
+    Returns:
+        list: 1-D NumPy arrays, one per sample
+    """
+    samples = [_to_array(body) for body in BRACKET_LIST.findall(question)]
+    if not samples:
+        samples = [_to_array(match.group(0)) for match in INLINE_LIST.finditer(question)]
+    
+    reference = find_file_reference(question)
+    if reference:
+        array = load_array(reference)
+        columns = array.reshape(-1, 1) if array.ndim == 1 else array
+        header = read_csv_header(reference) if reference.lower().endswith(".csv") else None
+        selected = range(columns.shape[1])
+        if header:
+            named = [i for i, name in enumerate(header) if name and re.search(rf"\b{re.escape(name)}\b", question, re.IGNORECASE)]
+            selected = named or selected
+        samples.extend(np.asarray(columns[:, i]) for i in selected)
+    return samples
+
+def _event_probability(distribution, op, value):
+    if op == "=":
+        if hasattr(distribution, "pmf"):
+            return distribution.pmf(value)
+        return 0.0
+    if op == "<=":
+        return distribution.cdf(value)
+    if op == "<":
+        return distribution.cdf(value - 1) if hasattr(distribution, "pmf") else distribution.cdf(value)
+    if op == ">=":
+        return distribution.sf(value - 1) if hasattr(distribution, "pmf") else distribution.sf(value)
+    return distribution.sf(value)
+
+def _same_length(sample, other, test):
+    if sample.size != other.size:
+        raise StatisticsParseError(f"The {test} needs samples of the same length, got {sample.size} and {other.size}")
+
+def _check_finite(result):
+    for label, value in result.values.items():
+        if isinstance(value, str):
+            continue
+        if not np.all(np.isfinite(np.asarray(value, dtype=float))):
+            raise StatisticsParseError(f"The {label} of the {result.operation} is undefined for this data")
+    return result
+
+def _distribution_question(question, name, distribution, parameters):
+    values = dict(parameters)
+    event = PROBABILITY_EVENT.search(question)
+    percentile = PERCENTILE.search(question)
+    if event:
+        op = BOUNDS.get(event.group("op"), event.group("op"))
+        value = float(event.group("value"))
+        values[f"P(X {op} {event.group('value')})"] = _event_probability(distribution, op, value)
+    elif percentile:
+        fraction = float(percentile.group("value")) / 100
+        values[f"{percentile.group('value')}th percentile"] = distribution.ppf(fraction)
+    else:
+        values["mean"] = distribution.mean()
+        values["variance"] = distribution.var()
+    return StatisticsResult(f"{name} distribution", values)
+
+def _descriptive(sample):
+    quartiles = np.percentile(sample, [25, 50, 75])
+    values, counts = np.unique(sample, return_counts=True)
+    return {
+        "n": sample.size,
+        "mean": sample.mean(),
+        "median": quartiles[1],
+        "mode": values[counts.argmax()] if counts.max() > 1 else "no repeated values",
+        "sample standard deviation": sample.std(ddof=1) if sample.size > 1 else 0.0,
+        "sample variance": sample.var(ddof=1) if sample.size > 1 else 0.0,
+        "min": sample.min(),
+        "max": sample.max(),
+        "quartiles (Q1, Q2, Q3)": quartiles,
+    }
+
+STATISTICS_KEYWORDS = re.compile(
+    r"\b(mean|average|median|mode|variance|standard deviation|quartile|describe|descriptive|"
+    r"t[- ]?test|z[- ]?test|chi[- ]?squared?|confidence interval|regression|correlation|"
+    r"binomial|poisson|normal distribution|percentile|probability)\b",
+    re.IGNORECASE
+)
+
+def is_statistics_question(question):
+    """
+    Cheaply check whether a question is a statistics computation on given data.
+    
+    Args:
+        question: The question text
+        
+    Returns:
+        bool: True if it asks for a supported statistic and supplies data or parameters
+    """
+    if COIN_FLIPS.search(question):
+        return True
+    if not STATISTICS_KEYWORDS.search(question):
+        return False
+    lowered = question.lower()
+    if any(name in lowered for name in ("binomial", "poisson", "normal")):
+        return bool(re.search(r"\d", question))
+    return bool(BRACKET_LIST.search(question) or INLINE_LIST.search(question) or find_file_reference(question))
+
+def solve_statistics(question):
+    """
+    Compute the statistics requested in a question.
+    
+    Args:
+        question: The question text with inline data or an uploaded file name
+        
+    Returns:
+        StatisticsResult: The computed values
+        
+    Raises:
+        StatisticsParseError: If the question cannot be computed locally, or
+            the data leaves a result undefined (nan or infinite)
+    """
+    return _check_finite(_solve_statistics(question))
+
+def _solve_statistics(question):
+    # SciPy takes over a second to import; only computing needs it, not classifying
+    from scipy import stats
+    
+    lowered = question.lower()
+    
+    match = COIN_FLIPS.search(question)
+    if match:
+        n, k = int(match.group("n")), int(match.group("k"))
+        op = BOUNDS.get((match.group("bound") or "exactly").lower())
+        probability = _event_probability(stats.binom(n, 0.5), op, k)
+        return StatisticsResult("binomial distribution (fair coin)", {"n": n, "p": 0.5, f"P(X {op} {k})": probability})
+    
+    if "binomial" in lowered:
+        n = _parameter(question, ["n", "trials"])
+        p = _parameter(question, ["p", "probability of success"])
+        if n is None or p is None:
+            raise StatisticsParseError("Binomial questions need n and p")
+        if n < 0 or not 0 <= p <= 1:
+            raise StatisticsParseError("Binomial questions need n >= 0 and p between 0 and 1")
+        return _distribution_question(question, "binomial", stats.binom(int(n), p), {"n": int(n), "p": p})
+    
+    if "poisson" in lowered:
+        rate = _parameter(question, ["lambda", "λ", "rate", "mean"])
+        if rate is None:
+            raise StatisticsParseError("Poisson questions need a rate")
+        if rate < 0:
+            raise StatisticsParseError("The Poisson rate cannot be negative")
+        return _distribution_question(question, "Poisson", stats.poisson(rate), {"lambda": rate})
+    
+    if "normal" in lowered and not extract_datasets(question):
+        mean = _parameter(question, ["mean", "mu", "μ"])
+        sd = _parameter(question, ["standard deviation", "sd", "sigma", "σ"])
+        mean = 0.0 if mean is None else mean
+        sd = 1.0 if sd is None else sd
+        if sd <= 0:
+            raise StatisticsParseError("The standard deviation of a normal distribution must be positive")
+        return _distribution_question(question, "normal", stats.norm(mean, sd), {"mean": mean, "standard deviation": sd})
+    
+    samples = extract_datasets(question)
+    if not samples:
+        raise StatisticsParseError("No data found in the question")
+    sample = samples[0]
+    
+    if re.search(r"chi[- ]?squared?|χ", lowered):
+        expected = samples[1] if len(samples) > 1 else None
+        if expected is not None:
+            _same_length(sample, expected, "chi-square test")
+        if expected is not None and expected.sum() != sample.sum():
+            expected = expected * sample.sum() / expected.sum()
+        statistic, p_value = stats.chisquare(sample, expected)
+        return StatisticsResult("chi-square goodness-of-fit test", {"chi-square": statistic, "degrees of freedom": sample.size - 1, "p-value": p_value})
+    
+    if re.search(r"\bt[- ]?test\b", lowered):
+        if len(samples) > 1 and "paired" in lowered:
+            _same_length(sample, samples[1], "paired t-test")
+            statistic, p_value = stats.ttest_rel(sample, samples[1])
+            name = "paired t-test"
+        elif len(samples) > 1:
+            statistic, p_value = stats.ttest_ind(sample, samples[1], equal_var=False)
+            name = "two-sample t-test (Welch)"
+        else:
+            mu = _parameter(question, ["mu", "μ", "population mean", "hypothesized mean"]) or 0.0
+            statistic, p_value = stats.ttest_1samp(sample, mu)
+            name = f"one-sample t-test (mu = {mu:g})"
+        return StatisticsResult(name, {"t": statistic, "p-value (two-sided)": p_value})
+    
+    if re.search(r"\bz[- ]?test\b", lowered):
+        mu = _parameter(question, ["mu", "μ", "population mean", "hypothesized mean"]) or 0.0
+        sigma = _parameter(question, ["sigma", "σ", "population standard deviation"])
+        if sigma is None and sample.size < 2:
+            raise StatisticsParseError("A z-test without sigma needs at least two values")
+        scale = sigma if sigma is not None else sample.std(ddof=1)
+        if scale <= 0:
+            raise StatisticsParseError("A z-test needs a positive standard deviation, not a constant sample or sigma = 0")
+        z = (sample.mean() - mu) / (scale / np.sqrt(sample.size))
+        return StatisticsResult(f"one-sample z-test (mu = {mu:g})", {"z": z, "p-value (two-sided)": 2 * stats.norm.sf(abs(z))})
+    
+    if "confidence interval" in lowered or CONFIDENCE.search(question):
+        level_match = CONFIDENCE.search(question)
+        level = float(level_match.group("value")) / 100 if level_match else 0.95
+        if not 0 < level < 1:
+            raise StatisticsParseError("The confidence level must be between 0% and 100%")
+        if sample.size < 2:
+            raise StatisticsParseError("A confidence interval needs at least two values")
+        sem = stats.sem(sample)
+        interval = stats.t.interval(level, sample.size - 1, loc=sample.mean(), scale=sem)
+        return StatisticsResult(f"{level:.0%} confidence interval for the mean (t)", {"mean": sample.mean(), "standard error": sem, "interval": interval})
+    
+    if re.search(r"regression|line of best fit|best[- ]fit|correlation", lowered):
+        if len(samples) < 2:
+            raise StatisticsParseError("Regression needs x and y data")
+        _same_length(sample, samples[1], "regression")
+        if sample.size < 2 or np.all(sample == sample[0]):
+            raise StatisticsParseError("Regression needs at least two distinct x values")
+        fit = stats.linregress(sample, samples[1])
+        return StatisticsResult("linear regression (y = slope * x + intercept)", {
+            "slope": fit.slope,
+            "intercept": fit.intercept,
+            "r": fit.rvalue,
+            "r-squared": fit.rvalue ** 2,
+            "p-value": fit.pvalue,
+            "standard error of slope": fit.stderr,
+        })
+    
+    if DESCRIPTIVE_KEYWORDS.search(question) or len(samples) == 1:
+        return StatisticsResult("descriptive statistics", _descriptive(sample))
+    
+    raise StatisticsParseError("No supported statistics operation found in the question")
@@ -2,30 +2,32 @@
 Enhanced language model initialization with better math capabilities.
 """
 
-import os
-import streamlit as st
-from langchain_groq import ChatGroq
-from config.settings import LLM_MODEL, GROQ_API_KEY, LLM_TEMPERATURE
+# Cheap sub-tasks that LLM_TASK_PROVIDERS can route to a local model
+EXPRESSION_TASK = "expression"
+SUMMARY_TASK = "summary"
 
-def initialize_llm():
+class LLMConfigurationError(RuntimeError):
+    """Raised when the language model cannot be configured (e.g. a missing API key)."""
+
+def initialize_llm(task=None, fallback=None, build=None):
     """
     Initialize and return the language model optimized for mathematical reasoning.
-    
+
+    The model fails over between the configured providers (LLM_PROVIDERS, or
+    LLM_TASK_PROVIDERS for a cheap sub-task), skipping ones that are down.
+
+    Args:
+        task: A cheap sub-task (e.g. "expression" or "summary"), or None for the main model
+        fallback: Model to fall back to after the task's own providers
+        build: Callable (provider name) -> chat model, e.g. to share loaded models
+
     Returns:
         The initialized language model object with optimal math settings
+
+    Raises:
+        LLMConfigurationError: If no provider is usable (e.g. GROQ_API_KEY is not set)
     """
-    # Verify API key is available
-    if not GROQ_API_KEY:
-        st.error("Error: GROQ_API_KEY is not set in the .env file. Please contact the administrator.")
-        st.stop()
-    
-    # Initialize the model with settings optimized for mathematical reasoning
-    # Lower temperature for more precise mathematical calculations
-    llm = ChatGroq(
-        model=LLM_MODEL, 
-        groq_api_key=GROQ_API_KEY,
-        temperature=LLM_TEMPERATURE,
-        max_tokens=4096  # Ensure longer responses for complex math explanations
-    )
-    
-    return llm
\ No newline at end of file
+    # Imported here so importing the core does not pay for the model libraries
+    from src.llm.providers import build_failover_llm, provider_names
+
+    return build_failover_llm(provider_names(task), build=build, fallback=fallback)
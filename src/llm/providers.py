@@ -0,0 +1,397 @@
+"""
+Pluggable language model providers with health-checked failover.
+
+Each provider is registered by name with a factory that builds a LangChain
+chat model: Groq over the network, or a quantized GGUF model run on the CPU
+by llama.cpp. A FailoverChatModel tries its providers in order. A provider
+that fails LLM_PROVIDER_FAILURE_THRESHOLD times in a row is skipped for
+LLM_PROVIDER_COOLDOWN_SECONDS, after which the next request probes it again.
+Every call records the provider's latency, failures and failovers.
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from src.llm.model import LLMConfigurationError
+from src.llm.rate_limit import RateLimitedChatModel, RateLimitExceededError
+from src.utils import metrics
+from config.settings import (
+    GROQ_API_KEY,
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    LLM_STREAMING,
+    MAX_TOKENS,
+    OFFLINE_MODE,
+    LLM_PROVIDERS,
+    LLM_TASK_PROVIDERS,
+    LLM_PROVIDER_TIMEOUT_SECONDS,
+    LLM_PROVIDER_FAILURE_THRESHOLD,
+    LLM_PROVIDER_COOLDOWN_SECONDS,
+    LOCAL_MODEL_PATH,
+    LOCAL_MODEL_CONTEXT,
+    LOCAL_MODEL_MAX_TOKENS,
+    LOCAL_MODEL_THREADS,
+    LLM_RATE_LIMITS,
+)
+
+PROVIDER_SECONDS = "llm.provider.{}_seconds"
+PROVIDER_FAILURES = "llm.provider.{}.failures"
+FAILOVERS = "llm.failovers"
+
+class LLMProviderError(RuntimeError):
+    """Raised when every provider of a model failed."""
+
+@dataclass
+class Provider:
+    """A named way of building a chat model."""
+
+    name: str
+    factory: Callable[[], Any]
+    check: Callable[[], Optional[str]] = lambda: None  # Returns why the provider cannot be used, or None; must not build the model
+    local: bool = False  # Runs on this host, so it works offline; calls to it are serialized
+    model: str = ""  # The model it serves, so answers of different models are cached apart
+
+def _groq_problem():
+    if not GROQ_API_KEY:
+        return "GROQ_API_KEY is not set in the .env file. Please contact the administrator."
+    return None
+
+def create_groq_llm():
+    """
+    Build the Groq chat model optimized for mathematical reasoning.
+
+    Returns:
+        ChatGroq: The model
+    """
+    problem = _groq_problem()
+    if problem:
+        raise LLMConfigurationError(problem)
+
+    # Imported here so importing the core does not pay for the client library
+    from langchain_groq import ChatGroq
+
+    # Lower temperature for more precise mathematical calculations
+    return ChatGroq(
+        model=LLM_MODEL,
+        groq_api_key=GROQ_API_KEY,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=MAX_TOKENS,  # Ensure longer responses for complex math explanations
+        streaming=LLM_STREAMING,  # Emit tokens to callbacks as they arrive
+        timeout=LLM_PROVIDER_TIMEOUT_SECONDS,  # Fail over instead of stalling on a slow provider
+        max_retries=0,  # Retried by the rate limiter, which follows the provider's reset headers
+    )
+
+def _llamacpp_problem():
+    if not LOCAL_MODEL_PATH:
+        return "No local model is configured (set MATHGPT_LOCAL_MODEL to a GGUF file)."
+    if not os.path.isfile(LOCAL_MODEL_PATH):
+        return f"The local model file {LOCAL_MODEL_PATH} does not exist."
+    if importlib.util.find_spec("llama_cpp") is None:
+        return "The local model needs llama-cpp-python (pip install llama-cpp-python)."
+    return None
+
+def create_llamacpp_llm():
+    """
+    Load the local quantized GGUF model with llama.cpp.
+
+    Returns:
+        ChatLlamaCpp: The model
+    """
+    problem = _llamacpp_problem()
+    if problem:
+        raise LLMConfigurationError(problem)
+
+    from langchain_community.chat_models import ChatLlamaCpp
+
+    return ChatLlamaCpp(
+        model_path=LOCAL_MODEL_PATH,
+        n_ctx=LOCAL_MODEL_CONTEXT,
+        n_threads=LOCAL_MODEL_THREADS,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LOCAL_MODEL_MAX_TOKENS,
+        streaming=LLM_STREAMING,
+        verbose=False,
+    )
+
+PROVIDERS = {
+    "groq": Provider("groq", create_groq_llm, _groq_problem, model=LLM_MODEL),
+    "llamacpp": Provider("llamacpp", create_llamacpp_llm, _llamacpp_problem, local=True, model=os.path.basename(LOCAL_MODEL_PATH)),
+}
+
+def register_provider(name, factory, check=None, local=False, model=""):
+    """
+    Register a language model provider.
+
+    Args:
+        name: Name used in LLM_PROVIDERS and LLM_TASK_PROVIDERS
+        factory: Zero-argument callable returning a LangChain chat model
+        check: Zero-argument callable returning why the provider cannot be used, or None
+        local: Whether the model runs on this host (usable offline, calls serialized)
+        model: Name of the model it serves
+    """
+    PROVIDERS[name] = Provider(name, factory, check or (lambda: None), local, model)
+
+def build_provider(name):
+    """
+    Build a provider's chat model, behind a rate limiter when it has quotas.
+
+    Args:
+        name: The provider name
+
+    Returns:
+        The chat model
+    """
+    model = PROVIDERS[name].factory()
+    limits = LLM_RATE_LIMITS.get(name)
+    if limits:
+        model = RateLimitedChatModel(model=model, **limits)
+    return model
+
+def provider_names(task=None):
+    """
+    Get the providers to try for a task, in order.
+
+    Args:
+        task: A cheap sub-task listed in LLM_TASK_PROVIDERS, or None for the main model
+
+    Returns:
+        list: Provider names (only local ones in offline mode)
+    """
+    names = LLM_TASK_PROVIDERS.get(task, []) if task else LLM_PROVIDERS
+    if OFFLINE_MODE:
+        names = [name for name in names if name in PROVIDERS and PROVIDERS[name].local]
+    return list(names)
+
+def provider_fingerprint(task=None):
+    """
+    Identify the providers and models answering a task, e.g. for cache keys.
+
+    Args:
+        task: The task (None for the main model)
+
+    Returns:
+        str: The usable providers in order, with their models
+    """
+    names = provider_names(task)
+    problems = provider_problems(names)
+    return ",".join(f"{name}:{PROVIDERS[name].model}" for name in names if name not in problems)
+
+def provider_problems(names):
+    """
+    Find out which providers cannot be used, without building them.
+
+    Args:
+        names: Provider names
+
+    Returns:
+        dict: Name -> reason, for the unusable ones
+    """
+    problems = {}
+    for name in names:
+        provider = PROVIDERS.get(name)
+        problem = provider.check() if provider else f"Unknown language model provider: {name}"
+        if problem:
+            problems[name] = problem
+    return problems
+
+def _unusable_message(names, problems):
+    if not names:
+        return "No language model provider is configured" + (" for offline mode." if OFFLINE_MODE else ".")
+    return " ".join(problems.values())
+
+def configuration_error(task=None):
+    """
+    Check that at least one provider of a task can be used.
+
+    Args:
+        task: The task (None for the main model)
+
+    Returns:
+        str: Why no provider can be used, or None
+    """
+    names = provider_names(task)
+    problems = provider_problems(names)
+    if any(name not in problems for name in names):
+        return None
+    return _unusable_message(names, problems)
+
+class _ProviderHealth:
+    def __init__(self):
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_error = None
+
+# Shared by every model using a provider, so one that is down is skipped everywhere
+_health = {}
+_health_lock = threading.Lock()
+# Local models are not safe to call from several threads at once
+_call_locks = {}
+
+def _health_of(name):
+    with _health_lock:
+        return _health.setdefault(name, _ProviderHealth())
+
+def _call_lock(name):
+    with _health_lock:
+        return _call_locks.setdefault(name, threading.Lock())
+
+def get_provider_status():
+    """
+    Get the health and latency of every provider used so far.
+
+    Returns:
+        dict: Name -> healthy, failures, last_error and latency summary
+    """
+    now = time.monotonic()
+    with _health_lock:
+        health = dict(_health)
+    return {
+        name: {
+            "healthy": state.down_until <= now,
+            "failures": state.failures,
+            "last_error": state.last_error,
+            "latency": metrics.summarize(PROVIDER_SECONDS.format(name)),
+        }
+        for name, state in health.items()
+    }
+
+def reset_provider_health():
+    """Forget past failures, so every provider is tried again."""
+    with _health_lock:
+        _health.clear()
+
+def _record_success(name, seconds):
+    metrics.observe(PROVIDER_SECONDS.format(name), seconds)
+    state = _health_of(name)
+    with _health_lock:
+        state.failures = 0
+        state.down_until = 0.0
+
+def _record_failure(name, error):
+    metrics.increment(PROVIDER_FAILURES.format(name))
+    state = _health_of(name)
+    with _health_lock:
+        state.failures += 1
+        state.last_error = f"{type(error).__name__}: {error}"
+        if state.failures >= LLM_PROVIDER_FAILURE_THRESHOLD:
+            state.down_until = time.monotonic() + LLM_PROVIDER_COOLDOWN_SECONDS
+
+class FailoverChatModel(BaseChatModel):
+    """Chat model that answers with the first healthy provider that succeeds."""
+
+    providers: List[Tuple[str, Any]]  # (name, chat model) pairs, in order of preference
+    serialized: List[str] = []  # Providers whose calls must not overlap (local models)
+
+    @property
+    def _llm_type(self):
+        return "failover"
+
+    @property
+    def _identifying_params(self):
+        return {"providers": self.provider_names}
+
+    @property
+    def provider_names(self):
+        """Names of the providers, in order of preference."""
+        return [name for name, _ in self.providers]
+
+    def _candidates(self):
+        # Healthy providers in order, then the ones cooling down as a last resort
+        now = time.monotonic()
+        healthy = [pair for pair in self.providers if _health_of(pair[0]).down_until <= now]
+        return healthy + [pair for pair in self.providers if pair not in healthy]
+
+    def _succeeded(self, name, result, started):
+        _record_success(name, time.perf_counter() - started)
+        # Keep the innermost provider when failover models are nested
+        result.llm_output = {"provider": name, **(result.llm_output or {})}
+        return result
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        errors = []
+        for attempt, (name, model) in enumerate(self._candidates()):
+            if attempt:
+                metrics.increment(FAILOVERS)
+            started = time.perf_counter()
+            try:
+                if name in self.serialized:
+                    with _call_lock(name):
+                        result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                else:
+                    result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RateLimitExceededError as e:
+                # Out of quota is not unhealthy; just let the next provider answer
+                errors.append(f"{name}: {e}")
+                continue
+            except Exception as e:
+                _record_failure(name, e)
+                errors.append(f"{name}: {e}")
+                continue
+            return self._succeeded(name, result, started)
+        raise LLMProviderError("Every language model provider failed (" + "; ".join(errors) + ")")
+
+    def _generate_serialized(self, name, model, messages, stop, run_manager, kwargs):
+        with _call_lock(name):
+            return model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        errors = []
+        for attempt, (name, model) in enumerate(self._candidates()):
+            if attempt:
+                metrics.increment(FAILOVERS)
+            started = time.perf_counter()
+            try:
+                if name in self.serialized:
+                    # Wait for the local model on a thread, not on the event loop
+                    result = await asyncio.to_thread(
+                        self._generate_serialized, name, model, messages, stop,
+                        run_manager.get_sync() if run_manager else None, kwargs
+                    )
+                else:
+                    result = await model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RateLimitExceededError as e:
+                # Out of quota is not unhealthy; just let the next provider answer
+                errors.append(f"{name}: {e}")
+                continue
+            except Exception as e:
+                _record_failure(name, e)
+                errors.append(f"{name}: {e}")
+                continue
+            return self._succeeded(name, result, started)
+        raise LLMProviderError("Every language model provider failed (" + "; ".join(errors) + ")")
+
+def build_failover_llm(names, build=None, fallback=None):
+    """
+    Build a failover model over the usable providers among names.
+
+    Args:
+        names: Provider names, in order of preference
+        build: Callable (name) -> chat model (defaults to build_provider)
+        fallback: Model tried after these providers (e.g. the main model for a cheap task)
+
+    Returns:
+        The failover model, or the fallback alone when none of the providers can be used
+
+    Raises:
+        LLMConfigurationError: If no provider can be used and there is no fallback
+    """
+    problems = provider_problems(names)
+    # Do not try a provider twice when the fallback already includes it
+    skip = set(getattr(fallback, "provider_names", ()))
+    usable = [name for name in names if name not in problems and name not in skip]
+    if not usable:
+        if fallback is not None:
+            return fallback
+        raise LLMConfigurationError(_unusable_message(names, problems))
+
+    build = build or build_provider
+    providers = [(name, build(name)) for name in usable]
+    if fallback is not None:
+        providers.append(("main", fallback))
+    return FailoverChatModel(providers=providers, serialized=[name for name in usable if PROVIDERS[name].local])
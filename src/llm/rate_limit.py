@@ -0,0 +1,395 @@
+"""
+Rate-limit-aware wrapper around a provider's chat model.
+
+Calls first take quota from two token buckets sized to the provider's
+requests-per-minute and tokens-per-minute limits, so bursts queue up in
+this process instead of being rejected upstream. A call that would wait
+longer than LLM_RATE_LIMIT_MAX_WAIT_SECONDS, or that finds too many calls
+already waiting, is shed with RateLimitExceededError (and fails over to the
+next provider). Identical prompts in flight at the same time share one
+upstream call. Rate-limited (429) and server (5xx) errors are retried with
+jittered backoff that follows the provider's Retry-After and
+x-ratelimit-reset-* headers, and the whole bucket waits out that pause so
+other callers do not stampede the provider.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic import PrivateAttr
+from src.utils import metrics
+from src.utils.tokens import estimate_tokens
+from config.settings import (
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS,
+    LLM_RATE_LIMIT_MAX_QUEUED,
+    LLM_EXPECTED_OUTPUT_TOKENS,
+    LLM_RETRY_ATTEMPTS,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_REQUEST_COALESCING,
+)
+
+QUEUE_DEPTH = "llm.rate_limit.queue_depth"
+WAIT_SECONDS = "llm.rate_limit.wait_seconds"
+THROTTLED = "llm.rate_limit.throttled"
+SHED = "llm.rate_limit.shed"
+RETRIES = "llm.rate_limit.retries"
+COALESCED = "llm.coalesced"
+
+# Longest pause taken from a provider's reset header
+MAX_RETRY_DELAY_SECONDS = 60
+# Groq reports resets as e.g. "2m59.56s", "7.66s" or "120ms"
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+class RateLimitExceededError(RuntimeError):
+    """Raised when a call is shed because the provider's quota is exhausted."""
+
+class TokenBucket:
+    """Requests-per-minute and tokens-per-minute quota with reservations."""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        """
+        Start with full buckets.
+
+        Args:
+            requests_per_minute: Calls allowed per minute (0 for no limit)
+            tokens_per_minute: Prompt plus completion tokens allowed per minute (0 for no limit)
+        """
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.paused_until = 0.0
+        self.waiting = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+
+    def reserve(self, tokens, max_wait=LLM_RATE_LIMIT_MAX_WAIT_SECONDS, max_queued=LLM_RATE_LIMIT_MAX_QUEUED):
+        """
+        Take quota for one call, possibly ahead of time.
+
+        Buckets may go negative; the caller then waits until its reservation
+        would have been covered, which keeps waiting calls in arrival order.
+
+        Args:
+            tokens: Tokens the call is expected to use
+            max_wait: Longest acceptable wait, in seconds
+            max_queued: Calls allowed to wait at once
+
+        Returns:
+            float: Seconds to wait before calling (the caller must then call release_wait)
+
+        Raises:
+            RateLimitExceededError: If the call would wait too long or too many are waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.paused_until - now)
+            if self.request_rate and self.requests < 1:
+                wait = max(wait, (1 - self.requests) / self.request_rate)
+            if self.token_rate and self.tokens < tokens:
+                wait = max(wait, (tokens - self.tokens) / self.token_rate)
+            if wait > 0 and (wait > max_wait or self.waiting >= max_queued):
+                metrics.increment(SHED)
+                raise RateLimitExceededError(
+                    f"Rate limit reached: {self.waiting} calls waiting, next slot in {wait:.1f} seconds."
+                )
+            if self.request_rate:
+                self.requests -= 1
+            if self.token_rate:
+                self.tokens -= tokens
+            if wait > 0:
+                self.waiting += 1
+            metrics.observe(QUEUE_DEPTH, self.waiting)
+            return wait
+
+    def release_wait(self):
+        """Leave the queue after waiting out a reservation."""
+        with self._lock:
+            self.waiting -= 1
+
+    def adjust(self, tokens):
+        """
+        Correct the token bucket once a call's real usage is known.
+
+        Args:
+            tokens: Actual minus reserved tokens (negative gives quota back)
+        """
+        if self.token_rate:
+            with self._lock:
+                self.tokens = min(self.token_capacity, self.tokens - tokens)
+
+    def pause(self, seconds):
+        """
+        Hold every call back for a while, e.g. after the provider answered 429.
+
+        Args:
+            seconds: How long to pause
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        """
+        Get the current quota and queue.
+
+        Returns:
+            dict: requests and tokens available, waiting calls and seconds paused
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "waiting": self.waiting,
+                "paused_seconds": max(0.0, self.paused_until - now),
+            }
+
+def get_rate_limit_stats():
+    """
+    Get rate limiting statistics for this process.
+
+    Returns:
+        dict: queue_depth summary, and counts of throttled, shed, retried and coalesced calls
+    """
+    return {
+        "queue_depth": metrics.summarize(QUEUE_DEPTH),
+        "throttled": metrics.get_count(THROTTLED),
+        "shed": metrics.get_count(SHED),
+        "retries": metrics.get_count(RETRIES),
+        "coalesced": metrics.get_count(COALESCED),
+    }
+
+def parse_duration(value):
+    """
+    Parse a rate-limit header duration.
+
+    Args:
+        value: Seconds ("7", "0.5") or a Groq-style duration ("2m59.56s", "120ms")
+
+    Returns:
+        float: Seconds, or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def retry_delay(error, attempt, base=None):
+    """
+    Decide whether and how long to wait before retrying a failed call.
+
+    Args:
+        error: The exception raised by the provider
+        attempt: Retries already made
+        base: Backoff base in seconds (defaults to LLM_RETRY_BASE_SECONDS)
+
+    Returns:
+        float: Seconds to wait, or None if the error should not be retried
+    """
+    base = LLM_RETRY_BASE_SECONDS if base is None else base
+    status = _status_code(error)
+    if status != 429 and not (isinstance(status, int) and status >= 500):
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    # Retry-After says when to come back; the reset headers say when a quota is full
+    # again, so the sooner of them is the earliest a retry can succeed
+    delay = parse_duration(headers.get("retry-after"))
+    if delay is None:
+        resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+        resets = [seconds for seconds in resets if seconds is not None]
+        delay = min(resets) if resets else None
+    if delay is not None:
+        # Jitter spreads out the callers that were all told the same time
+        delay = min(delay, MAX_RETRY_DELAY_SECONDS)
+        return delay + random.uniform(0, max(base, 0.1 * delay))
+    # Full jitter exponential backoff
+    return random.uniform(0, base * 2 ** attempt)
+
+def _usage_tokens(result):
+    for generation in result.generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            return usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    token_usage = (result.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+class RateLimitedChatModel(BaseChatModel):
+    """Chat model that respects a provider's quotas, coalesces and retries calls."""
+
+    model: Any  # The provider's chat model
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    coalesce: bool = LLM_REQUEST_COALESCING  # Share one upstream call between identical prompts in flight at the same time
+    max_retries: int = LLM_RETRY_ATTEMPTS
+
+    _bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _in_flight: dict = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context):
+        """Create the quota buckets."""
+        self._bucket = TokenBucket(self.requests_per_minute, self.tokens_per_minute)
+
+    @property
+    def _llm_type(self):
+        return f"rate-limited-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self):
+        return self.model._identifying_params
+
+    def stats(self):
+        """
+        Get the quota and queue of this model.
+
+        Returns:
+            dict: requests and tokens available, waiting calls, paused seconds and in-flight calls
+        """
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {**self._bucket.stats(), "in_flight": in_flight}
+
+    def _key(self, messages, stop, kwargs):
+        payload = json.dumps(
+            [[message.type, message.content] for message in messages] + [stop, kwargs],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _join(self, key):
+        # Returns (future, is_leader); the leader makes the call for everyone
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                metrics.increment(COALESCED)
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _reserve(self, messages):
+        estimate = sum(estimate_tokens(str(message.content)) for message in messages) + LLM_EXPECTED_OUTPUT_TOKENS
+        wait = self._bucket.reserve(estimate)
+        if wait > 0:
+            metrics.increment(THROTTLED)
+            metrics.observe(WAIT_SECONDS, wait)
+        return estimate, wait
+
+    def _settle(self, result, estimate):
+        used = _usage_tokens(result)
+        if used:
+            self._bucket.adjust(used - estimate)
+        return result
+
+    def _backoff(self, error, attempt):
+        delay = retry_delay(error, attempt) if attempt < self.max_retries else None
+        if delay is not None:
+            metrics.increment(RETRIES)
+            if _status_code(error) == 429:
+                # Everyone waits out the provider's pause, not just this call
+                self._bucket.pause(delay)
+        return delay
+
+    def _call(self, messages, stop, run_manager, kwargs):
+        for attempt in range(self.max_retries + 1):
+            estimate, wait = self._reserve(messages)
+            if wait > 0:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._bucket.release_wait()
+            try:
+                return self._settle(self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs), estimate)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def _acall(self, messages, stop, run_manager, kwargs):
+        for attempt in range(self.max_retries + 1):
+            estimate, wait = self._reserve(messages)
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._bucket.release_wait()
+            try:
+                result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                return self._settle(result, estimate)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self.coalesce:
+            return self._call(messages, stop, run_manager, kwargs)
+        key = self._key(messages, stop, kwargs)
+        future, leader = self._join(key)
+        if not leader:
+            # Callers may annotate their result, so each gets its own copy
+            return future.result().model_copy()
+        try:
+            result = self._call(messages, stop, run_manager, kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self.coalesce:
+            return await self._acall(messages, stop, run_manager, kwargs)
+        key = self._key(messages, stop, kwargs)
+        future, leader = self._join(key)
+        if not leader:
+            # The leader may be on another thread or event loop
+            return (await asyncio.wrap_future(future)).model_copy()
+        try:
+            result = await self._acall(messages, stop, run_manager, kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
@@ -2,44 +2,74 @@
 Enhanced memory management for mathematical context retention.
 """
 
-import streamlit as st
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.memory.chat_message_histories import StreamlitChatMessageHistory
-from config.settings import MEMORY_KEY, WELCOME_MESSAGE, MEMORY_WINDOW_SIZE
+from src.memory.history_store import create_message_history
+from src.memory.tiered_memory import TieredMathMemory
+from src.memory.math_context import MathContextIndex
+from src.memory.retrieval import TurnRetriever
+from config.settings import MEMORY_KEY, WELCOME_MESSAGE, MEMORY_WINDOW_SIZE, RETRIEVAL_ENABLED
 
 class MathContextMemory:
     """Extended memory class that manages mathematical context appropriately."""
     
-    def __init__(self, memory_key=MEMORY_KEY):
-        """Initialize the math context memory system."""
-        self.msgs = StreamlitChatMessageHistory(key=memory_key)
+    def __init__(self, memory_key=MEMORY_KEY, llm=None, session_id=None):
+        """
+        Initialize the math context memory system.
         
-        # Use window memory to keep relevant context but prevent token overflow
-        self.memory = ConversationBufferWindowMemory(
+        Args:
+            memory_key: Session state key holding the messages (Streamlit backend only)
+            llm: Language model used to summarize older turns (extractive summary if None)
+            session_id: Session whose history and retrieval index are persisted
+                (kept in memory only if None)
+        """
+        # Messages live in the configured backend (shared SQLite by default)
+        self.msgs = create_message_history(session_id, memory_key)
+        
+        # Variables, equations and theorems, parsed once per new message
+        self.context_index = MathContextIndex()
+        
+        # Embedded past turns, retrieved by similarity once they leave the window
+        self.retriever = TurnRetriever(session_id) if RETRIEVAL_ENABLED else None
+        
+        # Recent turns verbatim, older turns in a running summary, under a token cap
+        self.memory = TieredMathMemory(
+            llm=llm,
             memory_key="chat_history",
             chat_memory=self.msgs,
-            return_messages=True,
             output_key="output",
-            k=MEMORY_WINDOW_SIZE  # Keep last N interactions
+            input_key="input",
+            k=MEMORY_WINDOW_SIZE,  # Keep last N interactions verbatim
+            context_index=self.context_index,
+            retriever=self.retriever
         )
         
-        # Track important mathematical concepts mentioned
-        self.math_concepts = set()
-        self.variables = {}
-        self.equations = []
+        # Track important mathematical concepts mentioned (live views of the index)
+        self.math_concepts = self.context_index.concepts
+        self.variables = self.context_index.variables
+        self.equations = self.context_index.equations
     
     def extract_math_context(self, message):
-        """Extract important mathematical context from messages."""
-        # This could be enhanced with regex patterns to identify equations,
-        # variables, and math concepts for persistent storage beyond window size
-        # For now, this is a placeholder for the concept
-        pass
+        """
+        Index the messages that arrived since the last call.
+        
+        Only new messages are parsed; the whole history is never rescanned.
+        
+        Args:
+            message: The message that was just added (it is part of the history)
+        """
+        self.context_index.sync(self.msgs.messages)
     
-    def prune_irrelevant_context(self):
-        """Remove irrelevant context to keep focus on current math problem."""
-        # This would implement heuristics to determine relevant vs. irrelevant math context
-        # For now, this is a placeholder for the concept
-        pass
+    def prune_irrelevant_context(self, question):
+        """
+        Select the math context that matters for the current question.
+        
+        Args:
+            question: The current question
+            
+        Returns:
+            list: Relevant variables, equations and concepts, oldest first
+        """
+        self.extract_math_context(question)
+        return self.context_index.relevant(question)
     
     def get_memory(self):
         """Get the memory object for the agent."""
@@ -49,24 +79,30 @@ class MathContextMemory:
         """Get the message history object."""
         return self.msgs
 
-def initialize_memory():
+def initialize_memory(llm=None, session_id=None, store=None):
     """
     Initialize and return enhanced memory components for math problem solving.
     
+    Args:
+        llm: Language model used to summarize older turns
+        session_id: Session whose history and retrieval index are persisted
+        store: Per-session mapping the memory is kept in across requests
+            (a fresh memory is created on every call if None)
+        
     Returns:
         tuple: (memory, message_history)
     """
-    # Create the enhanced math context memory
-    math_memory = MathContextMemory()
+    # Create the enhanced math context memory once per session so the
+    # session's agent stays bound to the same memory object across requests
+    store = {} if store is None else store
+    if "math_memory" not in store:
+        store["math_memory"] = MathContextMemory(llm=llm, session_id=session_id)
+    math_memory = store["math_memory"]
     memory = math_memory.get_memory()
     msgs = math_memory.get_message_history()
     
-    # Set up UI for messages
-    if "ui_messages" not in st.session_state:
-        st.session_state.ui_messages = []
-        # Add a welcome message if it's the first time
-        if not msgs.messages:
-            st.session_state.ui_messages.append({"role": "assistant", "content": WELCOME_MESSAGE})
-            msgs.add_ai_message(WELCOME_MESSAGE)
+    # Add a welcome message if it's a new session
+    if len(msgs.messages) == 0:
+        msgs.add_ai_message(WELCOME_MESSAGE)
     
-    return memory, msgs
\ No newline at end of file
+    return memory, msgs
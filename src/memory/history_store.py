@@ -0,0 +1,329 @@
+"""
+Pluggable chat history backends.
+
+The default backend keeps every session's messages in a SQLite database
+(WAL mode), so history survives restarts and any process that can reach the
+database can serve any session. Each turn is appended in one transaction,
+and messages are read lazily, a page at a time, instead of being held in
+the server's memory. The running summary of older turns is stored next to
+the messages, so a reloaded session carries on folding where it stopped.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import message_to_dict, messages_from_dict
+from config.settings import CHAT_HISTORY_BACKEND, CHAT_HISTORY_PATH
+
+# Messages fetched per query when iterating over a whole history
+ITERATION_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    summarized_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class MessageSequence(Sequence):
+    """Read-only, lazily loaded view of a session's messages."""
+
+    def __init__(self, history):
+        """
+        Snapshot the number of messages; contents are fetched on access.
+
+        Args:
+            history: The SQLiteChatMessageHistory to read from
+        """
+        self._history = history
+        self._length = history.count()
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(self._length))
+            if not positions:
+                return []
+            if positions.step == 1:
+                return self._history.get_range(positions.start, positions.stop)
+            # Fetch the covering block once, then pick the requested positions
+            low = min(positions)
+            block = self._history.get_range(low, max(positions) + 1)
+            return [block[position - low] for position in positions]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message index out of range")
+        return self._history.get_range(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self._length, ITERATION_PAGE_SIZE):
+            yield from self._history.get_range(start, min(start + ITERATION_PAGE_SIZE, self._length))
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """Chat history of one session stored in a shared SQLite database."""
+
+    _init_lock = threading.Lock()
+    _initialized_paths = set()
+    _local = threading.local()
+
+    def __init__(self, session_id, path=CHAT_HISTORY_PATH):
+        """
+        Open the history of a session, creating the database if needed.
+
+        Args:
+            session_id: The session whose messages are read and written
+            path: Path of the SQLite database
+        """
+        self.session_id = session_id
+        self.path = path
+        with self._init_lock:
+            if path not in self._initialized_paths:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._connection().executescript(SCHEMA)
+                self._initialized_paths.add(path)
+
+    def _connection(self):
+        # SQLite connections must not be shared between threads; one per thread and database
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        connection = connections.get(self.path)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connections[self.path] = connection
+        return connection
+
+    @property
+    def messages(self):
+        """A lazy view of the session's messages (loaded page by page on access)."""
+        return MessageSequence(self)
+
+    def count(self):
+        """
+        Count the session's messages.
+
+        Returns:
+            int: Number of stored messages
+        """
+        row = self._connection().execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return row[0]
+
+    def get_range(self, start, stop):
+        """
+        Load the messages at positions start (inclusive) to stop (exclusive).
+
+        Args:
+            start: First position
+            stop: Position after the last one
+
+        Returns:
+            list: The messages, oldest first
+        """
+        rows = self._connection().execute(
+            "SELECT message FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (self.session_id, start, stop)
+        ).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def get_recent(self, limit, before=None):
+        """
+        Load one page of messages ending just before a position.
+
+        Args:
+            limit: Maximum number of messages
+            before: Position to end before (defaults to the end of the history)
+
+        Returns:
+            tuple: (start position of the page, list of messages oldest first)
+        """
+        stop = self.count() if before is None else before
+        start = max(0, stop - limit)
+        return start, self.get_range(start, stop)
+
+    def add_messages(self, messages):
+        """
+        Append messages in a single transaction (one write per turn).
+
+        Args:
+            messages: The messages to append
+        """
+        if not messages:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            next_seq = connection.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (self.session_id,)
+            ).fetchone()[0]
+            connection.executemany(
+                "INSERT INTO messages (session_id, seq, type, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.session_id, next_seq + offset, message.type, json.dumps(message_to_dict(message)), now)
+                    for offset, message in enumerate(messages)
+                ]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def add_message(self, message):
+        """Append one message."""
+        self.add_messages([message])
+
+    def load_summary(self):
+        """
+        Load the session's running summary.
+
+        Returns:
+            tuple: (summary, number of messages it covers), ("", 0) if there is none
+        """
+        row = self._connection().execute(
+            "SELECT summary, summarized_count FROM summaries WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    def save_summary(self, summary, summarized_count):
+        """
+        Store the session's running summary.
+
+        Args:
+            summary: The summary text
+            summarized_count: Number of leading messages it covers
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO summaries (session_id, summary, summarized_count, updated_at) VALUES (?, ?, ?, ?)",
+            (self.session_id, summary, summarized_count, time.time())
+        )
+
+    def clear(self):
+        """Delete the session's messages and summary."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            connection.execute("DELETE FROM summaries WHERE session_id = ?", (self.session_id,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+def get_recent_messages(history, limit, before=None):
+    """
+    Load one page of messages from any history backend.
+
+    Args:
+        history: The chat message history
+        limit: Maximum number of messages
+        before: Position to end before (defaults to the end of the history)
+
+    Returns:
+        tuple: (start position of the page, list of messages oldest first)
+    """
+    if hasattr(history, "get_recent"):
+        return history.get_recent(limit, before)
+    messages = history.messages
+    stop = len(messages) if before is None else before
+    start = max(0, stop - limit)
+    return start, list(messages[start:stop])
+
+def load_summary(history):
+    """
+    Load the stored running summary of any history backend.
+
+    Args:
+        history: The chat message history
+
+    Returns:
+        tuple: (summary, number of messages it covers); ("", 0) for backends
+            that do not store one
+    """
+    if hasattr(history, "load_summary"):
+        return history.load_summary()
+    return "", 0
+
+def save_summary(history, summary, summarized_count):
+    """
+    Store the running summary, for backends that persist one.
+
+    Args:
+        history: The chat message history
+        summary: The summary text
+        summarized_count: Number of leading messages it covers
+    """
+    if hasattr(history, "save_summary"):
+        history.save_summary(summary, summarized_count)
+
+def _streamlit_history(session_id, memory_key):
+    from langchain_community.chat_message_histories import StreamlitChatMessageHistory
+
+    return StreamlitChatMessageHistory(key=memory_key)
+
+def _in_memory_history(session_id, memory_key):
+    from langchain_core.chat_history import InMemoryChatMessageHistory
+
+    return InMemoryChatMessageHistory()
+
+def _sqlite_history(session_id, memory_key):
+    return SQLiteChatMessageHistory(session_id)
+
+# Backend name -> factory(session_id, memory_key)
+HISTORY_BACKENDS = {
+    "sqlite": _sqlite_history,
+    "streamlit": _streamlit_history,
+    "memory": _in_memory_history,
+}
+
+def register_history_backend(name, factory):
+    """
+    Register a chat history backend.
+
+    Args:
+        name: Name used in CHAT_HISTORY_BACKEND
+        factory: Callable taking (session_id, memory_key) and returning a BaseChatMessageHistory
+    """
+    HISTORY_BACKENDS[name] = factory
+
+def create_message_history(session_id, memory_key, backend=CHAT_HISTORY_BACKEND):
+    """
+    Create the message history of a session with the configured backend.
+
+    Args:
+        session_id: The session identifier
+        memory_key: Session state key (used by the in-process Streamlit backend)
+        backend: Backend name
+
+    Returns:
+        BaseChatMessageHistory: The history
+    """
+    if backend not in HISTORY_BACKENDS:
+        raise ValueError(f"Unknown chat history backend: {backend}")
+    if session_id is None:
+        # Without a session identifier there is nothing to key shared storage on
+        backend = "memory"
+    return HISTORY_BACKENDS[backend](session_id, memory_key)
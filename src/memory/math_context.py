@@ -0,0 +1,293 @@
+"""
+Incremental index of the mathematical context built up in a conversation.
+
+Each message is parsed once, when it is added to the history, for variable
+assignments ("let a = 3"), equations ("2x + 3 = 7", "f(x) = x^2") and named
+theorems or rules. When a new question comes in, only the entries that share
+symbols or names with it are rendered into the prompt, so definitions made
+many turns ago survive without re-sending the transcript.
+"""
+
+import re
+from dataclasses import dataclass, field
+from config.settings import MATH_CONTEXT_MAX_ENTRIES, MATH_CONTEXT_MAX_TOKENS
+from src.utils.tokens import estimate_tokens
+
+# Function names that are not variables
+KNOWN_FUNCTIONS = ("sin", "cos", "tan", "log", "ln", "exp", "sqrt", "abs")
+
+# A single-letter symbol (optionally with digits, e.g. x1), a known function,
+# a number or an operator; words of two or more letters end a math span
+_FUNCTION = r"(?:" + "|".join(KNOWN_FUNCTIONS) + r")(?![A-Za-z])"
+_SYMBOL = r"(?<![A-Za-z])[A-Za-z](?:_?\d+)?(?![A-Za-z])"
+_TOKEN = rf"(?:{_FUNCTION}|{_SYMBOL}|\d+(?:\.\d+)?|[ \t+\-*/^()])"
+EQUATION_PATTERN = re.compile(rf"((?:{_TOKEN})+)(?<![<>!=])=(?!=)((?:{_TOKEN})+)")
+SYMBOL_PATTERN = re.compile(_SYMBOL)
+
+# "let a be 3", "suppose n equals 10" (the "=" form is caught as an equation)
+WORDY_ASSIGNMENT_PATTERN = re.compile(
+    r"\b(?:let|set|define|suppose|assume)\s+([A-Za-z](?:_?\d+)?)\s+(?:be|equals?|equal to|is)\s+(-?\d+(?:\.\d+)?)\b",
+    re.IGNORECASE,
+)
+
+# Capitalized names followed by a concept keyword ("Pythagorean theorem", "Bayes' rule")
+CONCEPT_KEYWORDS = r"theorem|lemma|law|rule|formula|identity|inequality|principle|conjecture"
+NAMED_CONCEPT_PATTERN = re.compile(
+    rf"\b((?:[A-Z][\w'’ô\-]*\s+){{1,3}})({CONCEPT_KEYWORDS})\b"
+)
+# Common concepts that are usually written in lower case
+COMMON_CONCEPTS = (
+    "chain rule", "product rule", "quotient rule", "power rule",
+    "quadratic formula", "binomial theorem", "mean value theorem",
+    "fundamental theorem of calculus", "central limit theorem",
+    "law of large numbers", "triangle inequality", "integration by parts",
+    "l'hopital's rule", "l'hôpital's rule",
+)
+# Words that lean on something said earlier ("integrate it", "why does that work?"). A
+# pronoun only counts when it stands for a thing: at the end of a clause, before a
+# preposition, after an auxiliary, or before a math noun ("its derivative"), not in
+# "is it true that ..." or "prove that x > 0"
+_PRONOUN = r"(?:it|that|this|these|those|them)"
+_MATH_NOUNS = (
+    r"(?:results?|answers?|equations?|expressions?|functions?|matri(?:x|ces)|values?|integrals?|"
+    r"derivatives?|limits?|solutions?|series|sums?|graphs?|curves?|points?|roots?|data|sets?|"
+    r"vectors?|steps?|problems?|numbers?)"
+)
+BACK_REFERENCE = re.compile(
+    r"\b(?:the result|the answer|previous(?:ly)?|part \(?[a-z1-9]\)?|the same)\b"
+    r"|\babove\b(?!\s*-?\d)"
+    rf"|\b{_PRONOUN}\b(?=\s*(?:[?.!,;]|$|(?:again|too|also|instead|twice|with|by|for|from|to|at|over|into|using|if|when)\b))"
+    rf"|\b(?:does|do|did|can|could|will|would|should)\s+(?:{_PRONOUN}|they)\b"
+    rf"|\b(?:its|this|that|these|those)\s+{_MATH_NOUNS}\b",
+    re.IGNORECASE
+)
+# The name of a defined function, e.g. "f" in "f(x) = x^2"
+FUNCTION_DEFINITION = re.compile(r"^([A-Za-z](?:_?\d+)?)\s*\(")
+
+# Capitalized words that start sentences rather than names
+LEADING_STOPWORDS = {"the", "a", "an", "by", "use", "using", "apply", "applying", "from", "with", "via", "recall"}
+
+@dataclass
+class MathContextEntry:
+    """One indexed piece of context."""
+
+    kind: str  # "variable", "equation" or "concept"
+    text: str
+    turn: int
+    symbols: frozenset = field(default_factory=frozenset)
+    position: int = 0  # Offset in the message, to keep same-turn entries in order
+
+# Characters next to which a single letter is a mathematical symbol
+_MATH_NEIGHBOURS = set("+-*/^=<>()[]")
+_CLAUSE_ENDS = set("?.!;")
+
+def _symbols(text):
+    return frozenset(match.group(0) for match in SYMBOL_PATTERN.finditer(text))
+
+def _math_symbols(text):
+    # Single letters used as symbols: next to an operator, "=" or a bracket, right
+    # after a digit ("2a") or ending a clause ("what is a?"); not the article in
+    # "a prime", "I" or the "s" of "what's"
+    symbols = set()
+    for match in SYMBOL_PATTERN.finditer(text):
+        start, end = match.span()
+        if text[start - 1:start] in ("'", "’") or text[end:end + 1] in ("'", "’"):
+            continue
+        before = text[:start].rstrip()[-1:]
+        after = text[end:].lstrip()[:1]
+        if (before in _MATH_NEIGHBOURS or after in _MATH_NEIGHBOURS or text[start - 1:start].isdigit()
+                or after in _CLAUSE_ENDS or not after):
+            symbols.add(match.group(0))
+    return symbols
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+class MathContextIndex:
+    """Variables, equations and concepts mentioned so far, parsed once per message."""
+
+    def __init__(self, max_entries=MATH_CONTEXT_MAX_ENTRIES, max_tokens=MATH_CONTEXT_MAX_TOKENS):
+        """
+        Initialize an empty index.
+
+        Args:
+            max_entries: Entries kept per kind; the oldest are evicted first
+            max_tokens: Budget for the rendered context block
+        """
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.variables = {}
+        self.equations = {}
+        self.concepts = {}
+        self.indexed_count = 0
+
+    def clear(self):
+        """Forget everything (the stores are emptied in place)."""
+        self.variables.clear()
+        self.equations.clear()
+        self.concepts.clear()
+        self.indexed_count = 0
+
+    def sync(self, messages):
+        """
+        Index the messages added since the last call.
+
+        Args:
+            messages: The full message history
+        """
+        if len(messages) < self.indexed_count:
+            # The history was cleared or replaced underneath us
+            self.clear()
+        new_messages = messages[self.indexed_count:]
+        for offset, message in enumerate(new_messages):
+            self.add(str(message.content), self.indexed_count + offset)
+        self.indexed_count += len(new_messages)
+
+    def add(self, text, turn=None):
+        """
+        Parse one message into the index.
+
+        Args:
+            text: The message text
+            turn: Position of the message in the history (defaults to the next one)
+        """
+        if turn is None:
+            turn = self.indexed_count
+            self.indexed_count += 1
+
+        for match in WORDY_ASSIGNMENT_PATTERN.finditer(text):
+            name, value = match.group(1), match.group(2)
+            self._store(self.variables, name, MathContextEntry("variable", f"{name} = {value}", turn, frozenset({name}), match.start()))
+
+        for match in EQUATION_PATTERN.finditer(text):
+            lhs, rhs = _normalize(match.group(1)), _normalize(match.group(2))
+            if not lhs or not rhs:
+                continue
+            equation = f"{lhs} = {rhs}"
+            symbols = _symbols(equation)
+            if not symbols:
+                # Plain arithmetic such as "2 + 2 = 4" carries no context
+                continue
+            if SYMBOL_PATTERN.fullmatch(lhs):
+                self._store(self.variables, lhs, MathContextEntry("variable", equation, turn, symbols, match.start()))
+            else:
+                self._store(self.equations, equation, MathContextEntry("equation", equation, turn, symbols, match.start()))
+
+        for name in self._concepts_in(text):
+            self._store(self.concepts, name.lower(), MathContextEntry("concept", name, turn))
+
+    def _concepts_in(self, text):
+        for match in NAMED_CONCEPT_PATTERN.finditer(text):
+            words = match.group(1).split()
+            while words and words[0].lower() in LEADING_STOPWORDS:
+                words.pop(0)
+            if words:
+                yield " ".join(words + [match.group(2)])
+        lowered = text.lower()
+        for concept in COMMON_CONCEPTS:
+            if concept in lowered:
+                yield concept
+
+    def _store(self, store, key, entry):
+        # Re-inserting moves the key to the end, so iteration order is recency
+        store.pop(key, None)
+        store[key] = entry
+        while len(store) > self.max_entries:
+            store.pop(next(iter(store)))
+
+    def defined_symbols(self):
+        """
+        Get the variables and function names the conversation has defined.
+
+        Returns:
+            set: Symbols such as "a" for "let a = 3" and "f" for "f(x) = x^2"
+        """
+        symbols = set(self.variables)
+        for key in self.equations:
+            match = FUNCTION_DEFINITION.match(key)
+            if match:
+                symbols.add(match.group(1))
+        return symbols
+
+    def relevant(self, question):
+        """
+        Select the entries that relate to a question.
+
+        Variables and equations are relevant when they share a symbol with
+        the question; variables used by a relevant entry are pulled in too.
+        Concepts are relevant when their distinctive words appear in it.
+
+        Args:
+            question: The current question
+
+        Returns:
+            list: Relevant entries, oldest first
+        """
+        wanted = set(_symbols(question))
+        selected = {}
+        for store in (self.variables, self.equations):
+            for key, entry in store.items():
+                if entry.symbols & wanted:
+                    selected[(entry.kind, key)] = entry
+        # Follow variable definitions a few levels (c = a + b pulls in a and b)
+        for _ in range(3):
+            used = set().union(*(entry.symbols for entry in selected.values()))
+            added = [
+                (key, entry) for key, entry in self.variables.items()
+                if ("variable", key) not in selected and key in used
+            ]
+            if not added:
+                break
+            for key, entry in added:
+                selected[("variable", key)] = entry
+
+        question_words = set(re.findall(r"[a-z']+", question.lower()))
+        for key, entry in self.concepts.items():
+            distinctive = {word for word in re.findall(r"[a-z']+", key) if len(word) > 3} - set(CONCEPT_KEYWORDS.split("|"))
+            if distinctive & question_words:
+                selected[("concept", key)] = entry
+
+        return sorted(selected.values(), key=lambda entry: (entry.turn, entry.position))
+
+    def render(self, question):
+        """
+        Render the relevant entries as a prompt block within the token budget.
+
+        Args:
+            question: The current question
+
+        Returns:
+            str: The context block, or "" when nothing is relevant
+        """
+        lines = []
+        budget = self.max_tokens - estimate_tokens("Known math context:")
+        # Most recent entries win when the budget is tight
+        for entry in reversed(self.relevant(question)):
+            line = f"- {entry.text}"
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                break
+            lines.append(line)
+            budget -= cost
+        if not lines:
+            return ""
+        return "Known math context:\n" + "\n".join(reversed(lines))
+
+def refers_to_context(question, context_index=None):
+    """
+    Check whether a question depends on the conversation it is asked in.
+
+    Args:
+        question: The question
+        context_index: The session's MathContextIndex, if any
+
+    Returns:
+        bool: True if the question refers back ("integrate it") or uses a
+            symbol the conversation defined in a mathematical way ("what is
+            a?", "a + 1", but not "what is a prime number?")
+    """
+    if BACK_REFERENCE.search(question):
+        return True
+    if context_index is None:
+        return False
+    return bool(_math_symbols(question) & context_index.defined_symbols())
@@ -0,0 +1,319 @@
+"""
+Retrieval memory over past conversation turns with a local vector index.
+
+Each completed turn (question and answer) is embedded once, when it is added,
+and appended to a per-session store on disk. A new question is matched
+against all stored turns with a single matrix-vector product, so retrieval
+stays in the low milliseconds even for thousands of turns.
+
+Embeddings come from a sentence-transformers model when one is configured
+and installed; otherwise from hashed TF-IDF vectors, which need no model.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from config.settings import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    RETRIEVAL_DIR,
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_MIN_SCORE,
+)
+from src.utils import metrics
+
+# Timing of a single retrieval (seconds)
+RETRIEVAL_SECONDS = "memory.retrieval_seconds"
+
+VECTORS_FILE = "vectors.f32"
+TURNS_FILE = "turns.jsonl"
+META_FILE = "meta.json"
+
+# Words that say nothing about which turn is meant
+STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are",
+    "was", "be", "it", "this", "that", "what", "how", "me", "my", "you", "your",
+    "can", "please", "use", "from", "with", "earlier", "before", "previous", "again",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+class HashingEmbedder:
+    """Sparse TF vectors hashed into a fixed number of dimensions; IDF is applied at query time."""
+
+    name = "hashing"
+    sparse = True
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        """
+        Initialize the embedder.
+
+        Args:
+            dim: Number of hash buckets
+        """
+        self.dim = dim
+
+    def features(self, text):
+        """Return the words and word bigrams of a text, without stopwords."""
+        words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    def embed(self, texts):
+        """
+        Embed texts as L2-normalized hashed term-frequency vectors.
+
+        Args:
+            texts: The texts
+
+        Returns:
+            numpy.ndarray: float32 array of shape (len(texts), dim)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in Counter(self.features(text)).items():
+                # crc32 is stable across processes, unlike hash()
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceTransformerEmbedder:
+    """Dense embeddings from a small local sentence-transformers model."""
+
+    sparse = False
+
+    def __init__(self, model_name):
+        """
+        Load the model.
+
+        Args:
+            model_name: sentence-transformers model name or path
+        """
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        """
+        Embed texts as L2-normalized dense vectors.
+
+        Args:
+            texts: The texts
+
+        Returns:
+            numpy.ndarray: float32 array of shape (len(texts), dim)
+        """
+        vectors = self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """
+    Get the process-wide embedder, loading it on first use.
+
+    Falls back to hashed TF-IDF when no model is configured or
+    sentence-transformers is not installed.
+
+    Returns:
+        The embedder
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = HashingEmbedder()
+            if EMBEDDING_MODEL:
+                try:
+                    _embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+                except ImportError:
+                    pass
+        return _embedder
+
+def _session_dirname(session_id):
+    # Session ids come from the client, so the directory is named by their hash
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+
+class TurnRetriever:
+    """Append-only vector index of one session's completed turns."""
+
+    def __init__(self, session_id=None, embedder=None, directory=RETRIEVAL_DIR):
+        """
+        Open (or create) the session's index.
+
+        Args:
+            session_id: Session to persist under; None keeps the index in memory
+            embedder: Embedder to use (defaults to the process-wide one)
+            directory: Root directory of the per-session stores
+        """
+        self.embedder = embedder or get_embedder()
+        self.path = os.path.join(directory, _session_dirname(session_id)) if session_id else None
+        self._lock = threading.Lock()
+        self._reset_state()
+        if self.path:
+            self._load()
+
+    def _reset_state(self):
+        self.turns = []
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._df = np.zeros(self.embedder.dim, dtype=np.float32)
+        self.indexed_messages = 0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, META_FILE)) as handle:
+                meta = json.load(handle)
+            with open(os.path.join(self.path, TURNS_FILE)) as handle:
+                turns = [json.loads(line) for line in handle if line.strip()]
+            vectors = np.fromfile(os.path.join(self.path, VECTORS_FILE), dtype=np.float32)
+        except (OSError, ValueError):
+            self._delete_files()
+            return
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim:
+            # Vectors from another embedder cannot be compared with ours
+            self._delete_files()
+            return
+
+        # A write may have been interrupted; keep the rows both files agree on
+        count = min(len(turns), len(vectors) // self.embedder.dim)
+        self.turns = turns[:count]
+        vectors = vectors[:count * self.embedder.dim].reshape(count, self.embedder.dim)
+        self._append_arrays(vectors)
+        if count != len(turns) or vectors.size != os.path.getsize(os.path.join(self.path, VECTORS_FILE)) // 4:
+            self._rewrite_files(vectors)
+        if self.turns:
+            self.indexed_messages = self.turns[-1]["start"] + 2
+
+    def _delete_files(self):
+        for name in (VECTORS_FILE, TURNS_FILE, META_FILE):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def _rewrite_files(self, vectors):
+        vectors.astype(np.float32).tofile(os.path.join(self.path, VECTORS_FILE))
+        with open(os.path.join(self.path, TURNS_FILE), "w") as handle:
+            for turn in self.turns:
+                handle.write(json.dumps(turn) + "\n")
+    
+    def _append_arrays(self, vectors):
+        starts = np.array([turn["start"] for turn in self.turns[len(self._starts):]], dtype=np.int64)
+        # Grow by doubling so appends stay amortized O(1) per turn
+        needed = len(self._starts) + len(vectors)
+        if needed > self._vectors.shape[0]:
+            grown = np.zeros((max(needed, 2 * self._vectors.shape[0], 64), self.embedder.dim), dtype=np.float32)
+            grown[:len(self._starts)] = self._vectors[:len(self._starts)]
+            self._vectors = grown
+        self._vectors[len(self._starts):needed] = vectors
+        self._starts = np.concatenate([self._starts, starts])
+        if self.embedder.sparse:
+            self._df += (vectors != 0).sum(axis=0)
+
+    def clear(self):
+        """Forget all turns and delete the persisted store."""
+        with self._lock:
+            self._reset_state()
+            if self.path:
+                self._delete_files()
+
+    def sync(self, messages):
+        """
+        Embed the turns completed since the last call.
+
+        A turn is a human message followed by an AI message; other messages
+        (such as the welcome message) are skipped.
+
+        Args:
+            messages: The full message history
+        """
+        if len(messages) < self.indexed_messages:
+            # The history was cleared or replaced underneath us
+            self.clear()
+
+        new_turns = []
+        first = self.indexed_messages
+        new_messages = messages[first:]
+        position = 0
+        while position < len(new_messages):
+            message = new_messages[position]
+            if message.type == "human":
+                if position + 1 >= len(new_messages):
+                    # The answer has not arrived yet
+                    break
+                reply = new_messages[position + 1]
+                if reply.type == "ai":
+                    new_turns.append({"start": first + position, "human": str(message.content), "ai": str(reply.content)})
+                    position += 2
+                    continue
+            position += 1
+
+        with self._lock:
+            self.indexed_messages = first + position
+            if new_turns:
+                self._add_turns(new_turns)
+
+    def _add_turns(self, new_turns):
+        vectors = self.embedder.embed([f"{turn['human']}\n{turn['ai']}" for turn in new_turns])
+        self.turns.extend(new_turns)
+        self._append_arrays(vectors)
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            meta_path = os.path.join(self.path, META_FILE)
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w") as handle:
+                    json.dump({"embedder": self.embedder.name, "dim": self.embedder.dim}, handle)
+            with open(os.path.join(self.path, VECTORS_FILE), "ab") as handle:
+                vectors.astype(np.float32).tofile(handle)
+            with open(os.path.join(self.path, TURNS_FILE), "a") as handle:
+                for turn in new_turns:
+                    handle.write(json.dumps(turn) + "\n")
+
+    def search(self, question, k=RETRIEVAL_TOP_K, before=None, min_score=RETRIEVAL_MIN_SCORE):
+        """
+        Find the past turns most similar to a question.
+
+        Args:
+            question: The current question
+            k: Maximum number of turns returned
+            before: Only consider turns starting before this message position
+            min_score: Minimum cosine similarity
+
+        Returns:
+            list: (score, turn) pairs in conversation order
+        """
+        started = time.perf_counter()
+        with self._lock:
+            count = len(self._starts)
+            if count == 0 or k <= 0:
+                return []
+            query = self.embedder.embed([question])[0]
+            if self.embedder.sparse:
+                # Weight query buckets by inverse document frequency
+                query = query * (np.log((1.0 + count) / (1.0 + self._df)) + 1.0)
+                norm = np.linalg.norm(query)
+                if norm == 0:
+                    return []
+                query = query / norm
+            scores = self._vectors[:count] @ query
+            if before is not None:
+                scores[self._starts >= before] = -np.inf
+            top = np.argpartition(-scores, min(k, count) - 1)[:k]
+            results = [(float(scores[row]), self.turns[row]) for row in top if scores[row] >= min_score]
+        metrics.observe(RETRIEVAL_SECONDS, time.perf_counter() - started)
+        return sorted(results, key=lambda result: result[1]["start"])
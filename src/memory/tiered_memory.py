@@ -0,0 +1,232 @@
+"""
+Tiered conversation memory with an incrementally updated summary.
+
+The most recent turns are kept verbatim. Turns that fall out of that window
+are folded into a running summary once, as they leave the window, instead
+of re-summarizing the whole transcript. The summary is stored with the
+history, so a reloaded session continues from it. When a math context index is
+attached, the variables, equations and theorems relevant to the current
+question are injected ahead of the history; with a retriever attached, so
+are the past turns most similar to it. Everything the memory injects into
+the prompt is held under a hard token cap.
+"""
+
+from typing import Any, Optional
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.messages import get_buffer_string
+from src.memory.history_store import load_summary, save_summary, ITERATION_PAGE_SIZE
+from src.utils.tokens import estimate_tokens, truncate_to_tokens, CHARS_PER_TOKEN
+from config.settings import (
+    MEMORY_WINDOW_SIZE,
+    MEMORY_MAX_TOKENS,
+    MEMORY_SUMMARY_MAX_TOKENS,
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_MAX_TOKENS,
+)
+
+# Each message is cut to this size before it is summarized
+SUMMARY_INPUT_MESSAGE_TOKENS = 500
+# Characters kept per message by the extractive summary used without an LLM
+EXTRACTIVE_LINE_CHARS = 200
+# Most message tokens folded into the summary in one call
+SUMMARY_INPUT_MAX_TOKENS = 4000
+
+class TieredMathMemory(BaseChatMemory):
+    """Recent turns verbatim plus a running summary of older turns, under a token cap."""
+    
+    llm: Optional[Any] = None
+    memory_key: str = "chat_history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    k: int = MEMORY_WINDOW_SIZE
+    max_token_limit: int = MEMORY_MAX_TOKENS
+    summary_max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS
+    summary: str = ""
+    summarized_count: int = 0
+    summary_loaded: bool = False
+    context_index: Optional[Any] = None
+    retriever: Optional[Any] = None
+    retrieval_k: int = RETRIEVAL_TOP_K
+    retrieval_max_tokens: int = RETRIEVAL_MAX_TOKENS
+    
+    @property
+    def memory_variables(self):
+        """The variables this memory provides to the prompt."""
+        return [self.memory_key]
+    
+    def load_memory_variables(self, inputs):
+        """
+        Render the relevant math context, summary and recent turns within the token cap.
+        
+        Args:
+            inputs: The chain inputs; the question selects the math context
+            
+        Returns:
+            dict: {memory_key: rendered history text}
+        """
+        question = inputs.get(self.input_key or "input", "") if inputs else ""
+        return {self.memory_key: self.render(str(question))}
+    
+    def save_context(self, inputs, outputs):
+        """Append the turn, then fold turns that left the window into the summary."""
+        super().save_context(inputs, outputs)
+        self.fold_old_messages()
+        self.index_new_messages()
+    
+    async def asave_context(self, inputs, outputs):
+        """Append the turn, then fold turns that left the window into the summary."""
+        await super().asave_context(inputs, outputs)
+        self.fold_old_messages()
+        self.index_new_messages()
+    
+    def clear(self):
+        """Clear the history and the summary."""
+        super().clear()
+        self.summary = ""
+        self.summarized_count = 0
+        self.summary_loaded = True
+        if self.context_index is not None:
+            self.context_index.clear()
+        if self.retriever is not None:
+            self.retriever.clear()
+    
+    def index_new_messages(self):
+        """Parse and embed the messages added since the last call."""
+        messages = self.chat_memory.messages
+        if self.context_index is not None:
+            self.context_index.sync(messages)
+        if self.retriever is not None:
+            self.retriever.sync(messages)
+    
+    def fold_old_messages(self):
+        """
+        Summarize only the messages that have left the verbatim window since last time.
+        
+        The summary continues from the one stored with the history. A long
+        backlog (e.g. a history written before summaries were stored) is
+        folded in chunks of at most SUMMARY_INPUT_MAX_TOKENS, each stored
+        as soon as it is done.
+        """
+        if not self.summary_loaded:
+            self.summary, self.summarized_count = load_summary(self.chat_memory)
+            self.summary_loaded = True
+        messages = self.chat_memory.messages
+        if len(messages) < self.summarized_count:
+            # The history was cleared or replaced underneath us
+            self.summary = ""
+            self.summarized_count = 0
+        
+        boundary = max(0, len(messages) - 2 * self.k)
+        while self.summarized_count < boundary:
+            chunk = self._next_chunk(messages, boundary)
+            self.summary = self._summarize(chunk)
+            self.summarized_count += len(chunk)
+            save_summary(self.chat_memory, self.summary, self.summarized_count)
+    
+    def _next_chunk(self, messages, boundary):
+        # The unsummarized messages before the boundary that fit in one summarization call
+        chunk = []
+        budget = SUMMARY_INPUT_MAX_TOKENS
+        for start in range(self.summarized_count, boundary, ITERATION_PAGE_SIZE):
+            for message in messages[start:min(start + ITERATION_PAGE_SIZE, boundary)]:
+                cost = min(estimate_tokens(str(message.content)), SUMMARY_INPUT_MESSAGE_TOKENS)
+                if chunk and cost > budget:
+                    return chunk
+                chunk.append(message)
+                budget -= cost
+        return chunk
+    
+    def _summarize(self, new_messages):
+        trimmed = [
+            message.model_copy(update={"content": truncate_to_tokens(str(message.content), SUMMARY_INPUT_MESSAGE_TOKENS)})
+            for message in new_messages
+        ]
+        if self.llm is not None:
+            from langchain.chains import LLMChain
+            
+            new_lines = get_buffer_string(trimmed, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+            summary = LLMChain(llm=self.llm, prompt=SUMMARY_PROMPT).predict(summary=self.summary, new_lines=new_lines)
+        else:
+            # Extractive fallback: keep the first line of each message
+            lines = [self.summary] if self.summary else []
+            for message in trimmed:
+                prefix = self.human_prefix if message.type == "human" else self.ai_prefix
+                first_line = str(message.content).strip().split("\n", 1)[0][:EXTRACTIVE_LINE_CHARS]
+                lines.append(f"{prefix}: {first_line}")
+            summary = "\n".join(lines)
+            # Keep the most recent part of the extractive summary
+            max_chars = self.summary_max_tokens * CHARS_PER_TOKEN
+            summary = summary[-max_chars:]
+        return truncate_to_tokens(summary.strip(), self.summary_max_tokens)
+    
+    def render(self, question=""):
+        """
+        Build the text the memory injects into the prompt.
+        
+        The math context relevant to the question comes first, then the
+        earlier turns retrieved for it and the summary, followed by as many
+        of the most recent messages as fit in the remaining budget; an
+        oversized message is shortened rather than dropped.
+        
+        Args:
+            question: The current question
+        
+        Returns:
+            str: The rendered history
+        """
+        self.fold_old_messages()
+        self.index_new_messages()
+        budget = self.max_token_limit
+        parts = []
+        if self.context_index is not None and question:
+            context = truncate_to_tokens(self.context_index.render(question), budget // 2)
+            if context:
+                parts.append(context)
+                budget -= estimate_tokens(context)
+        if self.retriever is not None and question:
+            retrieved = self.render_retrieved(question, min(self.retrieval_max_tokens, budget // 2))
+            if retrieved:
+                parts.append(retrieved)
+                budget -= estimate_tokens(retrieved)
+        if self.summary:
+            summary = f"Summary of earlier conversation:\n{truncate_to_tokens(self.summary, self.summary_max_tokens)}"
+            parts.append(summary)
+            budget -= estimate_tokens(summary)
+        
+        recent = []
+        for message in reversed(self.chat_memory.messages[self.summarized_count:]):
+            if budget <= 0:
+                break
+            prefix = self.human_prefix if message.type == "human" else self.ai_prefix
+            line = truncate_to_tokens(f"{prefix}: {message.content}", budget)
+            recent.append(line)
+            budget -= estimate_tokens(line) + 1
+        
+        parts.extend(reversed(recent))
+        return "\n".join(parts)
+    
+    def render_retrieved(self, question, max_tokens):
+        """
+        Render the earlier turns most relevant to the question.
+        
+        Only turns that have left the verbatim window are considered, so
+        nothing is injected twice.
+        
+        Args:
+            question: The current question
+            max_tokens: Budget for the block
+            
+        Returns:
+            str: The block, or "" when nothing relevant was found
+        """
+        results = self.retriever.search(question, k=self.retrieval_k, before=self.summarized_count)
+        if not results or max_tokens <= 0:
+            return ""
+        header = "Relevant earlier turns:"
+        per_turn = max(1, (max_tokens - estimate_tokens(header)) // len(results))
+        lines = [header]
+        for _, turn in results:
+            lines.append(truncate_to_tokens(f"{self.human_prefix}: {turn['human']}\n{self.ai_prefix}: {turn['ai']}", per_turn))
+        return "\n".join(lines)
@@ -2,7 +2,7 @@
 Enhanced prompt templates for advanced math problem solving.
 """
 
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 
 def get_reasoning_prompt_template():
     """
@@ -2,16 +2,65 @@
 Advanced mathematical tools for complex problem solving.
 """
 
-from langchain.agents import Tool
+import asyncio
+from langchain_core.tools import Tool
 from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
+from src.engines.calculus import solve_calculus, CalculusParseError
+from src.engines.linear_algebra import solve_linear_algebra, LinearAlgebraParseError
+from src.engines.statistics import solve_statistics, StatisticsParseError
+from src.engines.datasets import DatasetError
+from src.utils import metrics
 
-def create_calculus_tool(llm):
+def _engine_backed_functions(solve_locally, parse_errors, chain, explanation_chain, metric_name, format_result):
+    """
+    Build sync and async tool functions that try a local engine first.
+    
+    Args:
+        solve_locally: Engine function mapping a question to a result with describe()
+        parse_errors: Exception types meaning the engine cannot handle the question
+        chain: The full prompt chain used as a fallback
+        explanation_chain: Chain that explains an already computed result
+        metric_name: Prefix for the engine hit/miss counters
+        format_result: Callable combining the described result and the explanation
+        
+    Returns:
+        tuple: (func, coroutine) for a LangChain Tool
+    """
+    def solve(question):
+        try:
+            result = solve_locally(question)
+        except parse_errors:
+            metrics.increment(f"{metric_name}.misses")
+            return chain.run(question)
+        
+        metrics.increment(f"{metric_name}.hits")
+        computed = result.describe()
+        explanation = explanation_chain.run(question=question, result=computed)
+        return format_result(computed, explanation)
+    
+    async def asolve(question):
+        try:
+            # Engines are CPU bound, so keep them off the event loop
+            result = await asyncio.to_thread(solve_locally, question)
+        except parse_errors:
+            metrics.increment(f"{metric_name}.misses")
+            return await chain.arun(question)
+        
+        metrics.increment(f"{metric_name}.hits")
+        computed = result.describe()
+        explanation = await explanation_chain.arun(question=question, result=computed)
+        return format_result(computed, explanation)
+    
+    return solve, asolve
+
+def create_calculus_tool(llm, description):
     """
     Create a specialized tool for calculus problems.
     
     Args:
         llm: The language model to use
+        description: What the tool does, as shown to the agent
         
     Returns:
         Tool: The calculus tool
@@ -33,18 +82,49 @@ def create_calculus_tool(llm):
     
     chain = LLMChain(llm=llm, prompt=prompt)
     
+    # When SymPy has already computed the answer, the LLM only explains it
+    explanation_prompt = PromptTemplate(
+        input_variables=["question", "result"],
+        template="""
+        You are a calculus expert. The following result has been computed exactly and verified:
+        
+        Problem: {question}
+        Verified result: {result}
+        
+        Explain how to arrive at this result step by step:
+        1. Identify what type of calculus problem this is (differentiation, integration, etc.)
+        2. List the formulas or rules that apply
+        3. Show each step leading to the verified result
+        
+        Do not change the verified result.
+        """
+    )
+    
+    explanation_chain = LLMChain(llm=llm, prompt=explanation_prompt)
+    
+    solve, asolve = _engine_backed_functions(
+        solve_calculus,
+        CalculusParseError,
+        chain,
+        explanation_chain,
+        "calculus.cas",
+        lambda verified, explanation: f"Verified result: {verified}\n\n{explanation}"
+    )
+    
     return Tool(
         name="Calculus",
-        func=chain.run,
-        description="Solves calculus problems including derivatives, integrals, limits, series, and differential equations."
+        func=solve,
+        coroutine=asolve,
+        description=description
     )
 
-def create_linear_algebra_tool(llm):
+def create_linear_algebra_tool(llm, description):
     """
     Create a specialized tool for linear algebra problems.
     
     Args:
         llm: The language model to use
+        description: What the tool does, as shown to the agent
         
     Returns:
         Tool: The linear algebra tool
@@ -66,18 +146,50 @@ def create_linear_algebra_tool(llm):
     
     chain = LLMChain(llm=llm, prompt=prompt)
     
+    # When NumPy has already computed the answer, the LLM only narrates it
+    explanation_prompt = PromptTemplate(
+        input_variables=["question", "result"],
+        template="""
+        You are a linear algebra expert. The following result has been computed numerically:
+        
+        Problem: {question}
+        Computed result:
+        {result}
+        
+        Explain the result step by step:
+        1. Identify what type of linear algebra problem this is (matrix operations, eigenvalues, etc.)
+        2. List the formulas or theorems that apply
+        3. Show how they lead to the computed result (for large matrices, describe the method instead)
+        
+        Do not change the computed result.
+        """
+    )
+    
+    explanation_chain = LLMChain(llm=llm, prompt=explanation_prompt)
+    
+    solve, asolve = _engine_backed_functions(
+        solve_linear_algebra,
+        (LinearAlgebraParseError, DatasetError),
+        chain,
+        explanation_chain,
+        "linear_algebra.numeric",
+        lambda computed, explanation: f"Computed result:\n{computed}\n\n{explanation}"
+    )
+    
     return Tool(
         name="LinearAlgebra",
-        func=chain.run,
-        description="Solves linear algebra problems including matrices, determinants, eigenvalues, vector spaces, and transformations."
+        func=solve,
+        coroutine=asolve,
+        description=description
     )
 
-def create_statistics_tool(llm):
+def create_statistics_tool(llm, description):
     """
     Create a specialized tool for statistics problems.
     
     Args:
         llm: The language model to use
+        description: What the tool does, as shown to the agent
         
     Returns:
         Tool: The statistics tool
@@ -99,18 +211,55 @@ def create_statistics_tool(llm):
     
     chain = LLMChain(llm=llm, prompt=prompt)
     
+    # When NumPy/SciPy has already computed the answer, the LLM only explains it
+    explanation_prompt = PromptTemplate(
+        input_variables=["question", "result"],
+        template="""
+        You are a statistics expert. The following result has been computed numerically:
+        
+        Problem: {question}
+        Computed result:
+        {result}
+        
+        Explain the result step by step:
+        1. Identify what type of statistics problem this is (probability, hypothesis testing, etc.)
+        2. List the formulas or theorems that apply
+        3. Show how they lead to the computed result and interpret it
+        
+        Do not change the computed result.
+        """
+    )
+    
+    explanation_chain = LLMChain(llm=llm, prompt=explanation_prompt)
+    
+    solve, asolve = _engine_backed_functions(
+        solve_statistics,
+        (StatisticsParseError, DatasetError),
+        chain,
+        explanation_chain,
+        "statistics.numeric",
+        lambda computed, explanation: f"Computed result:\n{computed}\n\n{explanation}"
+    )
+    
     return Tool(
         name="Statistics",
-        func=chain.run,
-        description="Solves statistics problems including probability, distributions, hypothesis testing, confidence intervals, and regression analysis."
+        func=solve,
+        coroutine=asolve,
+        description=description
     )
 
-def create_chain_of_thought_tool(llm):
+def create_chain_of_thought_tool(llm, description, tools=None):
     """
     Create a tool that breaks down complex math problems using chain-of-thought reasoning.
     
+    With tools given, the problem is planned as a DAG of sub-problems that
+    run concurrently on those tools, and the single chain-of-thought call is
+    only the fallback.
+    
     Args:
         llm: The language model to use
+        description: What the tool does, as shown to the agent
+        tools: Tools the sub-problems may be solved with (plan-and-execute if given)
         
     Returns:
         Tool: The chain-of-thought tool
@@ -135,8 +284,16 @@ def create_chain_of_thought_tool(llm):
     
     chain = LLMChain(llm=llm, prompt=prompt)
     
+    func, coroutine = chain.run, chain.arun
+    if tools:
+        from src.agent.planner import PlanAndExecuteSolver
+        
+        solver = PlanAndExecuteSolver(llm, tools, chain)
+        func, coroutine = solver.run, solver.arun
+    
     return Tool(
         name="ComplexProblemSolver",
-        func=chain.run,
-        description="Breaks down any complex mathematical problem into manageable steps and solves it methodically."
+        func=func,
+        coroutine=coroutine,
+        description=description
     )
\ No newline at end of file
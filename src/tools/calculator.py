@@ -3,22 +3,67 @@ Calculator tool for math operations.
 """
 
 from langchain.chains import LLMMathChain
-from langchain.agents import Tool
+from langchain_core.tools import Tool
+from src.engines.arithmetic import evaluate_expression, format_number, ExpressionParseError
+from src.utils import metrics
 
-def create_calculator_tool(llm):
+FAST_PATH_HITS = "calculator.fast_path.hits"
+FAST_PATH_MISSES = "calculator.fast_path.misses"
+
+def get_fast_path_stats():
+    """
+    Get hit/miss statistics for the calculator's local fast path.
+    
+    Returns:
+        dict: hits, misses and hit_rate
+    """
+    hits = metrics.get_count(FAST_PATH_HITS)
+    misses = metrics.get_count(FAST_PATH_MISSES)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+def create_calculator_tool(llm, description):
     """
     Create and return a calculator tool.
     
+    Plain arithmetic is evaluated locally; the LLM math chain is only used
+    when the input cannot be parsed as an arithmetic expression.
+    
     Args:
         llm: The language model to use for the calculator
+        description: What the tool does, as shown to the agent
         
     Returns:
         Tool: The calculator tool
     """
     math_chain = LLMMathChain.from_llm(llm=llm)
     
+    def calculate_locally(question):
+        # Returns the answer, or None when the input needs the LLM chain
+        try:
+            answer = format_number(evaluate_expression(question))
+        except ExpressionParseError:
+            metrics.increment(FAST_PATH_MISSES)
+            return None
+        except (ArithmeticError, ValueError) as e:
+            # Parsed fine but has no numeric value; the LLM would not do better
+            metrics.increment(FAST_PATH_HITS)
+            return f"Error: {e}"
+        
+        metrics.increment(FAST_PATH_HITS)
+        return f"Answer: {answer}"
+    
+    def calculate(question):
+        answer = calculate_locally(question)
+        return answer if answer is not None else math_chain.run(question)
+    
+    async def acalculate(question):
+        answer = calculate_locally(question)
+        return answer if answer is not None else await math_chain.arun(question)
+    
     return Tool(
         name="Calculator",
-        func=math_chain.run,
-        description="A tool for answering math related questions. Only input mathematical expression need to be provided"
-    )
\ No newline at end of file
+        func=calculate,
+        coroutine=acalculate,
+        description=description
+    )
@@ -3,15 +3,16 @@ Reasoning tool for mathematical problem-solving.
 """
 
 from langchain.chains import LLMChain
-from langchain.agents import Tool
+from langchain_core.tools import Tool
 from src.prompts.templates import get_reasoning_prompt_template
 
-def create_reasoning_tool(llm):
+def create_reasoning_tool(llm, description):
     """
     Create and return a reasoning tool.
     
     Args:
         llm: The language model to use for reasoning
+        description: What the tool does, as shown to the agent
         
     Returns:
         Tool: The reasoning tool
@@ -22,5 +23,6 @@ def create_reasoning_tool(llm):
     return Tool(
         name="Reasoning tool",
         func=chain.run,
-        description="A tool for answering logic-based and reasoning questions."
+        coroutine=chain.arun,
+        description=description
     )
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Declarative registry of the agent's tools, built on first use.
+
+Each tool is declared by its name, its description and the dotted path of
+the factory that builds it; the description lives only here and is passed
+to the factory. The agent and the router only need names and
+descriptions up front, so every tool starts as a lazy stand-in that imports
+the tool's module (with its chains, clients and engines such as SymPy and
+SciPy) and builds the real tool the first time it is called.
+"""
+
+import asyncio
+import importlib
+import threading
+import time
+from dataclasses import dataclass
+
+from langchain_core.tools import Tool
+from src.utils import metrics
+
+TOOLS_BUILT = "tools.built"
+TOOL_BUILD_SECONDS = "tools.{}.build_seconds"
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """How to describe and build one tool."""
+
+    name: str
+    description: str
+    factory: str  # "module:function" that builds the tool
+    model: str = "main"  # Language model the factory takes: "main", "expression" (cheap sub-task) or None
+    step: bool = False  # Sub-problems of a plan may run on this tool
+    planner: bool = False  # The factory takes the step tools, to solve problems as a plan
+
+TOOL_SPECS = (
+    ToolSpec(
+        "Calculator",
+        "A tool for answering math related questions. Only input mathematical expression need to be provided",
+        "src.tools.calculator:create_calculator_tool",
+        model="expression",
+        step=True,
+    ),
+    ToolSpec(
+        "Wikipedia",
+        "A tool for looking up encyclopedic information on the topics mentioned, from the offline "
+        "Wikipedia index when one has been built",
+        "src.tools.wikipedia:create_wikipedia_tool",
+        model=None,
+    ),
+    ToolSpec(
+        "Reasoning tool",
+        "A tool for answering logic-based and reasoning questions.",
+        "src.tools.reasoning:create_reasoning_tool",
+        step=True,
+    ),
+    ToolSpec(
+        "Calculus",
+        "Solves calculus problems including derivatives, integrals, limits, series, and differential equations.",
+        "src.tools.advanced_math:create_calculus_tool",
+        step=True,
+    ),
+    ToolSpec(
+        "LinearAlgebra",
+        "Solves linear algebra problems including matrices, determinants, eigenvalues, vector spaces, and "
+        "transformations. Matrices can be given as literals like [[4, 2], [1, 3]] or by the name of an "
+        "uploaded CSV/NPY file.",
+        "src.tools.advanced_math:create_linear_algebra_tool",
+        step=True,
+    ),
+    ToolSpec(
+        "Statistics",
+        "Solves statistics problems including probability, distributions, hypothesis testing, confidence "
+        "intervals, and regression analysis. Data can be given inline (e.g. [2, 4, 4, 5]) or by the name of "
+        "an uploaded CSV file.",
+        "src.tools.advanced_math:create_statistics_tool",
+        step=True,
+    ),
+    ToolSpec(
+        "ComplexProblemSolver",
+        "Breaks down any complex mathematical problem into manageable steps and solves it methodically.",
+        "src.tools.advanced_math:create_chain_of_thought_tool",
+        planner=True,
+    ),
+)
+
+TOOL_NAMES = tuple(spec.name for spec in TOOL_SPECS)
+
+# Slow imports the tools need when they are first called
+HEAVY_MODULES = ("src.engines.calculus", "src.engines.linear_algebra", "src.engines.statistics", "scipy.stats")
+
+def _load_factory(path):
+    module, name = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+def lazy_tool(spec, build):
+    """
+    Create a tool that builds the real one on its first call.
+
+    Args:
+        spec: The tool's ToolSpec
+        build: Zero-argument callable returning the real tool
+
+    Returns:
+        Tool: A tool with the spec's name and description
+    """
+    lock = threading.Lock()
+    built = []
+
+    def real_tool():
+        if not built:
+            with lock:
+                if not built:
+                    started = time.perf_counter()
+                    built.append(build())
+                    metrics.increment(TOOLS_BUILT)
+                    metrics.observe(TOOL_BUILD_SECONDS.format(spec.name), time.perf_counter() - started)
+        return built[0]
+
+    def func(tool_input):
+        return real_tool().func(tool_input)
+
+    async def coroutine(tool_input):
+        # Imports are blocking, so the first build happens on a worker thread
+        tool = built[0] if built else await asyncio.to_thread(real_tool)
+        if tool.coroutine is None:
+            return await asyncio.to_thread(tool.func, tool_input)
+        return await tool.coroutine(tool_input)
+
+    return Tool(name=spec.name, description=spec.description, func=func, coroutine=coroutine)
+
+def create_lazy_tools(models, step_tools=None, specs=TOOL_SPECS):
+    """
+    Create a lazy stand-in for every declared tool.
+
+    Args:
+        models: Mapping of "main" and "expression" to the language models the factories take
+        step_tools: Tools a planning tool runs sub-problems on (read when it is built)
+        specs: The tools to create
+
+    Returns:
+        list: The lazy tools, in declaration order
+    """
+    def builder(spec):
+        def build():
+            args = (models[spec.model],) if spec.model else ()
+            kwargs = {"description": spec.description}
+            if spec.planner:
+                kwargs["tools"] = step_tools
+            return _load_factory(spec.factory)(*args, **kwargs)
+        return build
+
+    return [lazy_tool(spec, builder(spec)) for spec in specs]
+
+def preload_tools(specs=TOOL_SPECS):
+    """Import every tool's module and engine now, e.g. before forking workers or at warm-up."""
+    for spec in specs:
+        importlib.import_module(spec.factory.split(":")[0])
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
@@ -0,0 +1,317 @@
+"""
+Offline Wikipedia index for the Wikipedia tool.
+
+Builds a SQLite FTS5 full-text index over the math-related articles of a
+MediaWiki XML dump and answers searches from it in milliseconds. The
+database is opened read-only and memory-mapped.
+
+Build an index with:
+    python -m src.tools.wiki_index build enwiki-latest-pages-articles.xml.bz2
+"""
+
+import argparse
+import bz2
+import gzip
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from config.settings import WIKIPEDIA_INDEX_PATH, WIKIPEDIA_TOP_K, WIKIPEDIA_MAX_CHARS
+
+# Articles with a category containing any of these are part of the math subset
+MATH_CATEGORY_KEYWORDS = (
+    "mathemat", "algebra", "calculus", "geometr", "trigonometr", "statistic",
+    "probability", "number theory", "combinatoric", "topology", "theorem",
+    "equation", "matri", "function", "integer", "polynomial", "graph theory",
+    "optimization", "set theory", "logic", "analysis", "numerical",
+)
+
+# Characters of article body kept in the index
+MAX_BODY_CHARS = 20000
+INSERT_BATCH_SIZE = 1000
+# Bytes of the database file SQLite may memory-map
+MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    summary TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    title, summary, body, content='pages', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+CATEGORY = re.compile(r"\[\[Category:([^\]|]+)", re.IGNORECASE)
+TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+TABLE = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+MATH_TAG = re.compile(r"<math[^>]*>(.*?)</math>", re.DOTALL | re.IGNORECASE)
+TAG = re.compile(r"<[^>]+>")
+COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+FILE_LINK = re.compile(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.IGNORECASE)
+LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]+)\]\]")
+EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+\s*([^\]]*)\]")
+HEADING = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.MULTILINE)
+EMPHASIS = re.compile(r"'{2,}")
+
+def clean_wikitext(text):
+    """
+    Convert wikitext into plain text.
+    
+    Args:
+        text: Raw article wikitext
+        
+    Returns:
+        str: Plain text with markup, templates and references removed
+    """
+    text = COMMENT.sub("", text)
+    text = REF.sub("", text)
+    text = MATH_TAG.sub(r" \1 ", text)
+    # Templates nest, so strip innermost ones until none are left
+    previous = None
+    while previous != text:
+        previous = text
+        text = TEMPLATE.sub("", text)
+    text = TABLE.sub("", text)
+    text = FILE_LINK.sub("", text)
+    text = LINK.sub(r"\1", text)
+    text = EXTERNAL_LINK.sub(r"\1", text)
+    text = HEADING.sub(r"\1", text)
+    text = EMPHASIS.sub("", text)
+    text = TAG.sub("", text)
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        # Drop leftover table rows; keep list items without their markers
+        if not line or line.startswith(("|", "!")):
+            continue
+        lines.append(line.lstrip("*#:; "))
+    return "\n".join(line for line in lines if line)
+
+def summarize(body, max_chars=1200):
+    """
+    Take the leading paragraphs of an article as its summary.
+    
+    Args:
+        body: The plain text article
+        max_chars: Maximum summary length
+        
+    Returns:
+        str: The summary
+    """
+    summary = ""
+    for paragraph in body.split("\n"):
+        if len(summary) + len(paragraph) > max_chars and summary:
+            break
+        summary = f"{summary}\n{paragraph}" if summary else paragraph
+    return summary[:max_chars]
+
+def is_math_article(wikitext):
+    """
+    Check whether an article belongs to the curated math subset.
+    
+    Args:
+        wikitext: Raw article wikitext
+        
+    Returns:
+        bool: True if any category matches MATH_CATEGORY_KEYWORDS
+    """
+    for category in CATEGORY.findall(wikitext):
+        category = category.lower()
+        if any(keyword in category for keyword in MATH_CATEGORY_KEYWORDS):
+            return True
+    return False
+
+def _open_dump(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def iter_dump_pages(path):
+    """
+    Stream (title, wikitext) pairs of main-namespace articles from a dump.
+    
+    Args:
+        path: Path to a MediaWiki XML dump (optionally .bz2 or .gz compressed)
+        
+    Yields:
+        tuple: (title, wikitext), skipping redirects
+    """
+    with _open_dump(path) as f:
+        root = None
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                # The first event opens <mediawiki>, which every page is attached to
+                root = element
+            if event != "end" or element.tag.rsplit("}", 1)[-1] != "page":
+                continue
+            fields = {child.tag.rsplit("}", 1)[-1]: child for child in element}
+            namespace = fields.get("ns")
+            is_redirect = "redirect" in fields
+            revision = fields.get("revision")
+            text = None
+            if revision is not None:
+                for child in revision:
+                    if child.tag.rsplit("}", 1)[-1] == "text":
+                        text = child.text
+            if (namespace is None or namespace.text == "0") and not is_redirect and text:
+                yield fields["title"].text, text
+            # Free the parsed page and detach it from the root, so memory stays
+            # flat on multi-gigabyte dumps
+            element.clear()
+            root.clear()
+
+def build_index(dump_path, output_path=WIKIPEDIA_INDEX_PATH, math_only=True, progress=None):
+    """
+    Build the offline index from a MediaWiki XML dump.
+    
+    Args:
+        dump_path: Path to the dump file
+        output_path: Where to write the SQLite index
+        math_only: Only keep articles in math-related categories
+        progress: Optional callable receiving the number of pages indexed so far
+        
+    Returns:
+        int: Number of pages indexed
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = output_path + ".building"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    
+    connection = sqlite3.connect(temporary_path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.executescript(SCHEMA)
+    
+    count = 0
+    batch = []
+    
+    def flush():
+        connection.executemany("INSERT OR IGNORE INTO pages (title, summary, body) VALUES (?, ?, ?)", batch)
+        connection.commit()
+        batch.clear()
+    
+    for title, wikitext in iter_dump_pages(dump_path):
+        if math_only and not is_math_article(wikitext):
+            continue
+        body = clean_wikitext(wikitext)[:MAX_BODY_CHARS]
+        if not body:
+            continue
+        batch.append((title, summarize(body), body))
+        count += 1
+        if len(batch) >= INSERT_BATCH_SIZE:
+            flush()
+            if progress:
+                progress(count)
+    if batch:
+        flush()
+    
+    # Populate the full-text index in one pass and compact the file
+    connection.execute("INSERT INTO pages_fts (pages_fts) VALUES ('rebuild')")
+    connection.execute("INSERT INTO pages_fts (pages_fts) VALUES ('optimize')")
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+    os.replace(temporary_path, output_path)
+    return count
+
+def _match_query(query, operator):
+    # Quote each word so user input can never be read as FTS5 syntax
+    words = re.findall(r"\w+", query.lower())
+    return f" {operator} ".join(f'"{word}"' for word in words)
+
+class WikipediaIndex:
+    """Read-only, memory-mapped search over an offline Wikipedia index."""
+    
+    def __init__(self, path=WIKIPEDIA_INDEX_PATH, top_k=WIKIPEDIA_TOP_K, max_chars=WIKIPEDIA_MAX_CHARS):
+        """Initialize the index reader."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No Wikipedia index at {path}")
+        self.path = path
+        self.top_k = top_k
+        self.max_chars = max_chars
+        self._local = threading.local()
+    
+    def _connection(self):
+        # SQLite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            connection.execute("PRAGMA query_only=ON")
+            self._local.connection = connection
+        return connection
+    
+    def search(self, query):
+        """
+        Find the best matching articles.
+        
+        All query words are required first; if nothing matches, any word may match.
+        
+        Args:
+            query: The search text
+            
+        Returns:
+            list: (title, summary) tuples ranked by BM25
+        """
+        connection = self._connection()
+        for operator in ("AND", "OR"):
+            match = _match_query(query, operator)
+            if not match:
+                return []
+            rows = connection.execute(
+                "SELECT pages.title, pages.summary FROM pages_fts "
+                "JOIN pages ON pages.id = pages_fts.rowid "
+                "WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 10.0, 2.0, 1.0) LIMIT ?",
+                (match, self.top_k)
+            ).fetchall()
+            if rows:
+                return rows
+        return []
+    
+    def run(self, query):
+        """
+        Search and format results like WikipediaAPIWrapper.run.
+        
+        Args:
+            query: The search text
+            
+        Returns:
+            str: "Page: ...\\nSummary: ..." blocks, or an empty string if nothing matched
+        """
+        results = self.search(query)
+        text = "\n\n".join(f"Page: {title}\nSummary: {summary}" for title, summary in results)
+        return text[:self.max_chars]
+
+def main(argv=None):
+    """Command line entry point for building the index."""
+    parser = argparse.ArgumentParser(description="Build the offline Wikipedia index used by the Wikipedia tool.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build an index from a MediaWiki XML dump")
+    build.add_argument("dump", help="Path to a pages-articles XML dump (.xml, .xml.bz2 or .xml.gz)")
+    build.add_argument("--output", default=WIKIPEDIA_INDEX_PATH, help="Where to write the index")
+    build.add_argument("--all-articles", action="store_true", help="Index every article, not only math ones")
+    args = parser.parse_args(argv)
+    
+    started = time.perf_counter()
+    count = build_index(
+        args.dump,
+        args.output,
+        math_only=not args.all_articles,
+        progress=lambda n: print(f"Indexed {n} pages...", flush=True)
+    )
+    print(f"Indexed {count} pages into {args.output} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,63 @@
 Wikipedia search tool.
 """
 
-from langchain_community.utilities import WikipediaAPIWrapper
-from langchain.agents import Tool
+import asyncio
+import os
+from langchain_core.tools import Tool
+from src.tools.wiki_index import WikipediaIndex
+from src.utils import metrics
+from config.settings import (
+    WIKIPEDIA_INDEX_PATH,
+    WIKIPEDIA_LIVE_FALLBACK,
+    WIKIPEDIA_TOP_K,
+    WIKIPEDIA_MAX_CHARS,
+)
 
-def create_wikipedia_tool():
+NO_RESULTS_MESSAGE = "No good Wikipedia Search Result was found"
+
+def create_wikipedia_tool(description):
     """
     Create and return a Wikipedia search tool.
     
+    Searches the offline index when one has been built and only calls the
+    live Wikipedia API if WIKIPEDIA_LIVE_FALLBACK is enabled.
+    
+    Args:
+        description: What the tool does, as shown to the agent
+        
     Returns:
         Tool: The Wikipedia search tool
     """
-    wikipedia_wrapper = WikipediaAPIWrapper()
+    index = WikipediaIndex(WIKIPEDIA_INDEX_PATH) if os.path.exists(WIKIPEDIA_INDEX_PATH) else None
+    live_wrapper = None
+    
+    def search_live(query):
+        nonlocal live_wrapper
+        if live_wrapper is None:
+            # Imported lazily so air-gapped deployments never need the client
+            from langchain_community.utilities import WikipediaAPIWrapper
+            live_wrapper = WikipediaAPIWrapper(top_k_results=WIKIPEDIA_TOP_K, doc_content_chars_max=WIKIPEDIA_MAX_CHARS)
+        metrics.increment("wikipedia.live_queries")
+        return live_wrapper.run(query)
+    
+    def search(query):
+        if index is not None:
+            result = index.run(query)
+            if result:
+                metrics.increment("wikipedia.index_hits")
+                return result
+            metrics.increment("wikipedia.index_misses")
+        if WIKIPEDIA_LIVE_FALLBACK:
+            return search_live(query)
+        return NO_RESULTS_MESSAGE
+    
+    async def asearch(query):
+        # Both backends block, so run them on a worker thread
+        return await asyncio.to_thread(search, query)
     
     return Tool(
         name="Wikipedia",
-        func=wikipedia_wrapper.run,
-        description="A tool for searching the Internet to find various information on the topics mentioned"
-    )
\ No newline at end of file
+        func=search,
+        coroutine=asearch,
+        description=description
+    )
@@ -3,7 +3,18 @@ Enhanced UI components for the Streamlit application.
 """
 
 import streamlit as st
-from config.settings import APP_TITLE, APP_ICON, CLEAR_HISTORY_MESSAGE, FOOTER_TEXT, SUPPORTED_MATH_DOMAINS
+from src.engines.datasets import save_upload, list_uploads, DatasetError
+from src.memory.history_store import get_recent_messages
+from src.ui.rendering import prepare_markdown
+from config.settings import (
+    APP_TITLE,
+    APP_ICON,
+    CLEAR_HISTORY_MESSAGE,
+    FOOTER_TEXT,
+    SUPPORTED_MATH_DOMAINS,
+    EXAMPLE_PROBLEMS,
+    CHAT_HISTORY_PAGE_SIZE,
+)
 
 def setup_page_config():
     """Set up the page configuration for Streamlit."""
@@ -14,13 +25,24 @@ def display_chat_history(msgs):
     """
     Display chat message history in the UI.
     
+    Only the most recent pages of messages are loaded and rendered, so a
+    rerun costs the same however long the session is; a button loads an
+    earlier page on demand.
+    
     Args:
         msgs: The message history object
     """
+    pages = st.session_state.setdefault("history_pages", 1)
+    start, messages = get_recent_messages(msgs, pages * CHAT_HISTORY_PAGE_SIZE)
+    if start > 0:
+        if st.button(f"Load earlier messages ({start} more)", key="load_earlier_messages"):
+            st.session_state.history_pages = pages + 1
+            st.rerun()
+    
     # Display chat messages from history on app rerun
-    for message in st.session_state.ui_messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    for message in messages:
+        with st.chat_message("user" if message.type == "human" else "assistant"):
+            st.markdown(prepare_markdown(message.content))
 
 def create_sidebar_options():
     """Create enhanced sidebar options for the app."""
@@ -35,10 +57,8 @@ def create_sidebar_options():
     # Example problems
     with st.sidebar.expander("Example Problems"):
         st.write("Try asking about:")
-        st.write("- Solve the quadratic equation: 2x² + 5x - 3 = 0")
-        st.write("- Find the derivative of f(x) = x³ - 4x² + 7x - 9")
-        st.write("- Calculate the eigenvalues of matrix [[4, 2], [1, 3]]")
-        st.write("- What's the probability of getting at least 2 heads in 5 coin flips?")
+        for example in EXAMPLE_PROBLEMS:
+            st.write(f"- {example}")
     
     # Math cheat sheet
     with st.sidebar.expander("Math Formula Cheat Sheet"):
@@ -51,6 +71,29 @@ def create_sidebar_options():
         st.write("**Integration Rules**")
         st.latex(r"\int x^n dx = \frac{x^{n+1}}{n+1} + C, n \neq -1")
 
+def handle_dataset_upload(session_id):
+    """
+    Let the user upload matrices or datasets that tools can reference by file name.
+    
+    Args:
+        session_id: The session the files belong to (other sessions cannot see them)
+    """
+    with st.sidebar.expander("Upload Matrix / Dataset"):
+        uploaded = st.file_uploader("CSV or NPY file", type=["csv", "npy"], key="dataset_upload")
+        saved = st.session_state.setdefault("saved_uploads", set())
+        if uploaded is not None and (uploaded.name, uploaded.size) not in saved:
+            try:
+                save_upload(uploaded.name, uploaded.getvalue(), session_id)
+                saved.add((uploaded.name, uploaded.size))
+            except DatasetError as e:
+                st.error(str(e))
+        
+        uploads = list_uploads(session_id)
+        if uploads:
+            st.write("Refer to a file by name in your question:")
+            for name in uploads:
+                st.write(f"- `{name}`")
+
 def handle_clear_history(msgs):
     """
     Handle clearing the chat history.
@@ -60,30 +103,36 @@ def handle_clear_history(msgs):
     """
     if st.sidebar.button("Clear Chat History"):
         msgs.clear()
-        st.session_state.ui_messages = []
-        welcome_msg = CLEAR_HISTORY_MESSAGE
-        st.session_state.ui_messages.append({"role": "assistant", "content": welcome_msg})
-        msgs.add_ai_message(welcome_msg)
+        msgs.add_ai_message(CLEAR_HISTORY_MESSAGE)
+        st.session_state.history_pages = 1
         st.rerun()
 
 def display_memory_debug(memory):
     """
     Display enhanced memory debugging information in the sidebar.
     
+    Only the most recent page of messages is loaded, like the chat history.
+    
     Args:
         memory: The memory object to debug
     """
     if st.sidebar.checkbox("Show Conversation Memory"):
         st.sidebar.subheader("Current Conversation Memory")
         memory_container = st.sidebar.container()
-        memory_messages = memory.chat_memory.messages
+        start, memory_messages = get_recent_messages(memory.chat_memory, CHAT_HISTORY_PAGE_SIZE)
+        total = start + len(memory_messages)
         
         # Create tabs for different memory views
         tab1, tab2 = st.sidebar.tabs(["Message History", "Math Context"])
         
         with tab1:
-            for i, msg in enumerate(memory_messages):
-                is_important = "✓" if i >= len(memory_messages) - 4 else ""  # Mark recent messages
+            summary = getattr(memory, "summary", "")
+            if summary:
+                memory_container.text(f"Summary: {summary[:200]}...")
+            if start > 0:
+                memory_container.text(f"({start} earlier messages not shown)")
+            for i, msg in enumerate(memory_messages, start):
+                is_important = "✓" if i >= total - 4 else ""  # Mark recent messages
                 memory_container.text(
                     f"{is_important} {msg.type}: {msg.content[:40]}..." 
                     if len(msg.content) > 40 
@@ -91,10 +140,159 @@ def display_memory_debug(memory):
                 )
         
         with tab2:
-            # This would display mathematical context extracted from the conversation
-            # Such as tracked variables, equations, and concepts
-            st.write("Math context tracking would appear here")
-            st.write("(Variables, equations, theorems referenced, etc.)")
+            # Variables, equations and concepts extracted from the conversation
+            context_index = getattr(memory, "context_index", None)
+            if context_index is None:
+                st.write("Math context tracking is not enabled")
+                return
+            # Only the messages added since the last call are parsed
+            memory.index_new_messages()
+            if context_index.variables:
+                st.write("**Variables**")
+                for entry in context_index.variables.values():
+                    st.text(entry.text)
+            if context_index.equations:
+                st.write("**Equations**")
+                for entry in context_index.equations.values():
+                    st.text(entry.text)
+            if context_index.concepts:
+                st.write("**Theorems and rules**")
+                st.text(", ".join(entry.text for entry in context_index.concepts.values()))
+            if not (context_index.variables or context_index.equations or context_index.concepts):
+                st.write("No variables, equations or theorems referenced yet")
+
+# Bar colour per span kind in the trace waterfall
+SPAN_COLORS = {
+    "request": "#9e9e9e",
+    "stage": "#5c6bc0",
+    "queue": "#e57373",
+    "agent": "#7e57c2",
+    "iteration": "#4db6ac",
+    "llm": "#ffb74d",
+    "tool": "#81c784",
+}
+
+def display_trace_waterfall(trace, container=None):
+    """
+    Display a request's spans as a latency waterfall.
+    
+    Args:
+        trace: A trace from the request tracer (None shows a hint)
+        container: Where to draw (defaults to the sidebar)
+    """
+    container = container or st.sidebar
+    with container.expander("Request Trace"):
+        if not trace:
+            st.write("Ask a question to see where its time goes")
+            return
+        total = max(trace["duration"], 1e-9)
+        depths = {}
+        rows = []
+        for span in trace["spans"]:
+            depth = depths[span["id"]] = depths.get(span["parent"], -1) + 1
+            end = span["end"] if span["end"] is not None else span["start"]
+            left = 100 * span["start"] / total
+            width = max(100 * (end - span["start"]) / total, 0.5)
+            attributes = span["attributes"]
+            details = []
+            if attributes.get("cache_hit"):
+                details.append("cache hit")
+            if "input_tokens" in attributes and span["kind"] == "llm":
+                details.append(f"{attributes['input_tokens']}→{attributes.get('output_tokens', 0)} tok")
+            if attributes.get("error"):
+                details.append(attributes["error"])
+            label = f"{'&nbsp;' * 2 * depth}{span['name']} {1000 * (end - span['start']):.0f} ms {' · '.join(details)}"
+            rows.append(
+                f"<div style='font-size: 0.75em; white-space: nowrap; overflow: hidden;'>{label}</div>"
+                f"<div style='background: #eee; height: 6px; margin-bottom: 4px;'>"
+                f"<div style='margin-left: {left:.1f}%; width: {width:.1f}%; height: 6px; "
+                f"background: {SPAN_COLORS.get(span['kind'], '#90a4ae')};'></div></div>"
+            )
+        route = trace["spans"][0]["attributes"].get("route", "")
+        st.caption(f"Total {1000 * trace['duration']:.0f} ms · route: {route}")
+        st.markdown("".join(rows), unsafe_allow_html=True)
+
+def display_rerun_stats(objects_built):
+    """
+    Display how much work this rerun did.
+    
+    Args:
+        objects_built: Number of LLM clients, tool sets and agents built
+    """
+    st.sidebar.caption(f"Objects built this rerun: {objects_built}")
+
+def display_tool_cache_stats(tool_stats):
+    """
+    Display per-tool cache hit rates in the sidebar.
+    
+    Args:
+        tool_stats: Mapping of tool name to hits, misses and hit_rate
+    """
+    with st.sidebar.expander("Tool Cache"):
+        for name, stats in tool_stats.items():
+            st.write(f"**{name}**: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%})")
+
+def display_latency_stats(timings):
+    """
+    Display latency summaries in the sidebar.
+    
+    Args:
+        timings: Mapping of label to a summary with count, mean, p50 and p95 (seconds)
+    """
+    with st.sidebar.expander("Latency"):
+        for label, summary in timings.items():
+            if summary["count"]:
+                st.write(f"**{label}**: p50 {summary['p50']:.2f}s, p95 {summary['p95']:.2f}s ({summary['count']} samples)")
+            else:
+                st.write(f"**{label}**: no samples yet")
+
+def display_route_stats(route_stats):
+    """
+    Display how many requests took each route in the sidebar.
+    
+    Args:
+        route_stats: Mapping of route name to request count
+    """
+    with st.sidebar.expander("Query Routes"):
+        for route, count in route_stats.items():
+            st.write(f"**{route}**: {count}")
+
+def display_prompt_budget_stats(prompt_tokens, compaction_stats):
+    """
+    Display prompt size per request and compaction savings in the sidebar.
+    
+    Args:
+        prompt_tokens: Summary of prompt tokens per agent request (count, mean, p50, p95)
+        compaction_stats: Original and saved observation tokens
+    """
+    with st.sidebar.expander("Prompt Budget"):
+        if prompt_tokens["count"]:
+            st.write(f"**Prompt tokens per request**: p50 {prompt_tokens['p50']:.0f}, p95 {prompt_tokens['p95']:.0f}")
+        st.write(
+            f"**Observation tokens saved**: {compaction_stats['saved_tokens']} of "
+            f"{compaction_stats['original_tokens']} ({compaction_stats['saved_fraction']:.0%})"
+        )
+
+def display_llm_provider_stats(provider_status, rate_limits):
+    """
+    Display provider health, latency and rate limiting in the sidebar.
+    
+    Args:
+        provider_status: Mapping of provider name to healthy, failures, last_error and latency
+        rate_limits: Queue depth summary and throttled, shed, retried and coalesced call counts
+    """
+    with st.sidebar.expander("LLM Providers"):
+        for name, status in provider_status.items():
+            latency = status["latency"]
+            state = "up" if status["healthy"] else f"down ({status['failures']} failures)"
+            timing = f", p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s" if latency["count"] else ""
+            st.write(f"**{name}**: {state}{timing}")
+        queue = rate_limits["queue_depth"]
+        st.write(f"**Waiting for quota**: p95 {queue['p95']:.0f} calls" if queue["count"] else "**Waiting for quota**: none yet")
+        st.write(
+            f"**Throttled** {rate_limits['throttled']} · **shed** {rate_limits['shed']} · "
+            f"**retried** {rate_limits['retries']} · **coalesced** {rate_limits['coalesced']}"
+        )
 
 def display_footer():
     """Display the enhanced footer for the application."""
@@ -0,0 +1,34 @@
+"""
+Preparation of chat messages for display.
+
+Model answers often write LaTeX with \\( \\) and \\[ \\] delimiters, which
+Streamlit's markdown does not render. Messages are rewritten to the $ and $$
+delimiters it understands before they are shown. The markdown and LaTeX
+themselves are rendered in the browser; what keeps reruns cheap is that only
+the latest page of history is shown.
+"""
+
+import re
+
+# Fenced or inline code is left untouched
+CODE_PATTERN = re.compile(r"(```.*?```|`[^`\n]*`)", re.DOTALL)
+DISPLAY_MATH_PATTERN = re.compile(r"\\\[(.+?)\\\]", re.DOTALL)
+INLINE_MATH_PATTERN = re.compile(r"\\\((.+?)\\\)", re.DOTALL)
+
+def _convert_math(text):
+    text = DISPLAY_MATH_PATTERN.sub(lambda match: f"$${match.group(1).strip()}$$", text)
+    return INLINE_MATH_PATTERN.sub(lambda match: f"${match.group(1).strip()}$", text)
+
+def prepare_markdown(content):
+    """
+    Convert a message to the markdown Streamlit renders, LaTeX included.
+
+    Args:
+        content: The message text
+
+    Returns:
+        str: Markdown with $ / $$ math delimiters
+    """
+    parts = CODE_PATTERN.split(content)
+    # Odd indices are the code spans captured by the split
+    return "".join(part if index % 2 else _convert_math(part) for index, part in enumerate(parts))
@@ -0,0 +1,77 @@
+"""
+Streaming of the agent's final answer into the chat UI.
+"""
+
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from src.utils import metrics
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+# Time from an LLM call starting to its first token
+LLM_TTFT = "llm.time_to_first_token_seconds"
+# Time from the request starting to the first token of the final answer
+ANSWER_TTFT = "agent.time_to_first_answer_token_seconds"
+
+# Minimum seconds between placeholder redraws
+REDRAW_INTERVAL = 0.05
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Stream the text after "Final Answer:" into a placeholder as tokens arrive."""
+    
+    def __init__(self, placeholder, cursor="▌"):
+        """
+        Initialize the handler.
+        
+        Args:
+            placeholder: A Streamlit placeholder (anything with a markdown method)
+            cursor: Text appended while the answer is still streaming
+        """
+        self.placeholder = placeholder
+        self.cursor = cursor
+        self.request_started = time.perf_counter()
+        self.answer_ttft = None
+        self.answer = ""
+        self._buffer = ""
+        self._call_started = None
+        self._first_token_seen = False
+        self._streaming_answer = False
+        self._last_redraw = 0.0
+    
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        """Reset the per-call buffer when a new LLM call begins."""
+        self._start_call()
+    
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        """Reset the per-call buffer when a new chat model call begins."""
+        self._start_call()
+    
+    def _start_call(self):
+        self._buffer = ""
+        self._call_started = time.perf_counter()
+        self._first_token_seen = False
+        self._streaming_answer = False
+    
+    def on_llm_new_token(self, token, **kwargs):
+        """Render answer tokens as they arrive."""
+        now = time.perf_counter()
+        if not self._first_token_seen and self._call_started is not None:
+            self._first_token_seen = True
+            metrics.observe(LLM_TTFT, now - self._call_started)
+        
+        self._buffer += token
+        if not self._streaming_answer:
+            index = self._buffer.find(FINAL_ANSWER_PREFIX)
+            if index < 0:
+                return
+            self._streaming_answer = True
+            self._buffer = self._buffer[index + len(FINAL_ANSWER_PREFIX):]
+        
+        self.answer = self._buffer.lstrip()
+        if self.answer and self.answer_ttft is None:
+            self.answer_ttft = now - self.request_started
+            metrics.observe(ANSWER_TTFT, self.answer_ttft)
+        
+        if now - self._last_redraw >= REDRAW_INTERVAL:
+            self._last_redraw = now
+            self.placeholder.markdown(self.answer + self.cursor)
@@ -0,0 +1,106 @@
+"""
+Lightweight in-process counters and timings shared across the application.
+"""
+
+import math
+import threading
+from collections import defaultdict, deque
+
+# Keep a bounded window of samples per timing so memory stays flat
+MAX_TIMING_SAMPLES = 1000
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = defaultdict(lambda: deque(maxlen=MAX_TIMING_SAMPLES))
+
+def increment(name, amount=1):
+    """
+    Increment a named counter.
+    
+    Args:
+        name: The counter name
+        amount: How much to add to the counter
+    """
+    with _lock:
+        _counters[name] += amount
+
+def get_count(name):
+    """
+    Get the current value of a named counter.
+    
+    Args:
+        name: The counter name
+        
+    Returns:
+        int: The counter value (0 if never incremented)
+    """
+    with _lock:
+        return _counters.get(name, 0)
+
+def observe(name, value):
+    """
+    Record a timing or size sample.
+    
+    Args:
+        name: The timing name
+        value: The observed value
+    """
+    with _lock:
+        _timings[name].append(value)
+
+def percentile(values, fraction):
+    """
+    Return the given percentile of a list of values using nearest rank.
+    
+    Args:
+        values: The samples
+        fraction: The percentile as a fraction between 0 and 1
+        
+    Returns:
+        float: The percentile value, or 0.0 if there are no samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(name):
+    """
+    Summarize the samples recorded for a timing.
+    
+    Args:
+        name: The timing name
+        
+    Returns:
+        dict: count, mean, p50 and p95 of the samples
+    """
+    with _lock:
+        values = list(_timings.get(name, ()))
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+    }
+
+def snapshot():
+    """
+    Return a copy of all counters and timing summaries.
+    
+    Returns:
+        dict: {"counters": {...}, "timings": {...}}
+    """
+    with _lock:
+        counters = dict(_counters)
+        timing_names = list(_timings)
+    return {
+        "counters": counters,
+        "timings": {name: summarize(name) for name in timing_names},
+    }
+
+def reset():
+    """Clear all counters and timings."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
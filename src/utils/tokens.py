@@ -0,0 +1,37 @@
+"""
+Token estimation shared by prompt accounting and memory budgets.
+"""
+
+import math
+
+# Rough size of a token in characters for English and math text
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text.
+    
+    Args:
+        text: The text
+        
+    Returns:
+        int: Approximate token count
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text, max_tokens, marker=" …"):
+    """
+    Cut a text down to roughly max_tokens, keeping its beginning.
+    
+    Args:
+        text: The text
+        max_tokens: The token budget
+        marker: Appended when the text was cut
+        
+    Returns:
+        str: The (possibly) shortened text
+    """
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - len(marker))].rstrip() + marker
@@ -0,0 +1,399 @@
+"""
+Per-request traces of the solving hot path.
+
+A RequestTracer is a LangChain callback handler that turns one request into
+a tree of timed spans: the solver's stages (cache, router, planner, agent),
+the wait for an agent slot, every ReAct iteration, every tool call and every
+LLM call, with token counts and tool cache hits. Finished traces are kept in
+memory, appended to a JSONL log and aggregated per span into latency
+summaries that can be rendered in the Prometheus text format.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+from src.utils import metrics
+from src.utils.tokens import estimate_tokens
+from config.settings import TRACE_LOG_PATH, TRACE_LOG_MAX_BYTES, TRACE_HISTORY_SIZE
+
+# Custom callback event a memoized tool dispatches when it answers from cache
+TOOL_CACHE_HIT_EVENT = "tool_cache_hit"
+
+AGENT_CHAIN_NAME = "AgentExecutor"
+
+@dataclass
+class Span:
+    """One timed operation of a request; times are seconds since the request started."""
+
+    id: str
+    parent: str
+    name: str
+    kind: str
+    start: float
+    end: float = None
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def duration(self):
+        """Seconds the span took (up to now if it is still open)."""
+        return (self.end if self.end is not None else self.start) - self.start
+
+class RequestTracer(BaseCallbackHandler):
+    """Record the spans of one request from the solver and LangChain callbacks."""
+
+    # Timestamps must be taken when events happen, not when they are replayed
+    thread_safe = True
+    run_inline = True
+
+    def __init__(self, question="", session_id=None):
+        """
+        Start the trace and its root span.
+
+        Args:
+            question: The question being answered
+            session_id: The session it belongs to
+        """
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+        self._by_run = {}
+        self._stages = []
+        self._agent_span = None
+        self._iteration = None
+        self._iterations = 0
+        self.root = self._open("request", "request", None, question=question[:200], session_id=session_id)
+
+    def _now(self):
+        return time.perf_counter() - self._origin
+
+    def _open(self, name, kind, parent, **attributes):
+        span = Span(id=uuid.uuid4().hex[:16], parent=parent.id if parent else None,
+                    name=name, kind=kind, start=self._now(), attributes=attributes)
+        self.spans.append(span)
+        return span
+
+    def _close(self, span, **attributes):
+        if span is not None and span.end is None:
+            span.end = self._now()
+            span.attributes.update(attributes)
+
+    def _current_stage(self):
+        return self._stages[-1] if self._stages else self.root
+
+    def _parent_for(self, parent_run_id):
+        # Runs that are not spans themselves (most chains) stand for their nearest span
+        if parent_run_id is not None and parent_run_id in self._by_run:
+            return self._by_run[parent_run_id]
+        return self._current_stage()
+
+    @contextmanager
+    def span(self, name, kind="stage", **attributes):
+        """
+        Time a block of the solver as a span; LangChain runs started inside nest under it.
+
+        Args:
+            name: Span name
+            kind: Span kind
+            **attributes: Attributes recorded on the span
+
+        Yields:
+            Span: The open span (attributes may be added to it)
+        """
+        with self._lock:
+            span = self._open(name, kind, self._current_stage(), **attributes)
+            self._stages.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            with self._lock:
+                self._stages.remove(span)
+                self._close(span)
+
+    def on_queue_wait(self, seconds):
+        """Record the time an agent run waited for a free slot (called by the agent pool)."""
+        with self._lock:
+            span = self._open("queue", "queue", self._current_stage())
+            span.start = max(0.0, span.start - seconds)
+            self._close(span)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        """Open the agent span; other chains are folded into their parent span."""
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        with self._lock:
+            parent = self._parent_for(parent_run_id)
+            if name == AGENT_CHAIN_NAME and self._agent_span is None:
+                self._agent_span = self._open("agent", "agent", parent)
+                self._by_run[run_id] = self._agent_span
+            else:
+                self._by_run[run_id] = parent
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        """Close the agent span."""
+        with self._lock:
+            span = self._by_run.get(run_id)
+            if span is self._agent_span:
+                self._close(self._iteration)
+                self._close(span, iterations=self._iterations)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        """Close the agent span with the error."""
+        with self._lock:
+            span = self._by_run.get(run_id)
+            if span is self._agent_span:
+                self._close(self._iteration)
+                self._close(span, iterations=self._iterations, error=type(error).__name__)
+
+    def _start_llm(self, run_id, parent_run_id, prompt_tokens, kwargs):
+        with self._lock:
+            parent = self._parent_for(parent_run_id)
+            if parent is self._agent_span and parent is not None:
+                # Each ReAct iteration starts with the agent asking the LLM for its next step
+                if self._iteration is None or self._iteration.end is not None:
+                    self._iterations += 1
+                    self._iteration = self._open(f"iteration {self._iterations}", "iteration", parent)
+                parent = self._iteration
+            name = (kwargs.get("invocation_params") or {}).get("model") or kwargs.get("name") or "llm"
+            self._by_run[run_id] = self._open(str(name), "llm", parent, input_tokens=prompt_tokens)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        """Open an LLM span."""
+        self._start_llm(run_id, parent_run_id, sum(estimate_tokens(prompt) for prompt in prompts), kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        """Open a chat model span."""
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for batch in messages for message in batch)
+        self._start_llm(run_id, parent_run_id, prompt_tokens, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        """Close an LLM span with its token counts (reported ones when available, else estimated)."""
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    usage = {"input_tokens": metadata.get("input_tokens", 0), "output_tokens": metadata.get("output_tokens", 0)}
+        if not usage:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            if token_usage:
+                usage = {"input_tokens": token_usage.get("prompt_tokens", 0), "output_tokens": token_usage.get("completion_tokens", 0)}
+        if not usage:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            usage = {"output_tokens": estimate_tokens(text), "tokens_estimated": True}
+        # A failover model reports which provider answered; latencies are summarized per provider
+        provider = (response.llm_output or {}).get("provider")
+        with self._lock:
+            span = self._by_run.get(run_id)
+            if span is not None and provider:
+                span.name = provider
+            self._close(span, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        """Close an LLM span with the error."""
+        with self._lock:
+            self._close(self._by_run.get(run_id), error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        """Open a tool span."""
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        with self._lock:
+            parent = self._parent_for(parent_run_id)
+            if parent is self._agent_span and self._iteration is not None:
+                parent = self._iteration
+            self._by_run[run_id] = self._open(name, "tool", parent, input_tokens=estimate_tokens(str(input_str)), cache_hit=False)
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, **kwargs):
+        """Close a tool span; a tool called by the agent also ends the iteration."""
+        with self._lock:
+            span = self._by_run.get(run_id)
+            self._close(span, output_tokens=estimate_tokens(str(output)))
+            if span is not None and self._iteration is not None and span.parent == self._iteration.id:
+                self._close(self._iteration)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        """Close a tool span with the error."""
+        with self._lock:
+            span = self._by_run.get(run_id)
+            self._close(span, error=type(error).__name__)
+            if span is not None and self._iteration is not None and span.parent == self._iteration.id:
+                self._close(self._iteration)
+
+    def on_agent_finish(self, finish, *, run_id, **kwargs):
+        """Close the last iteration when the agent gives its final answer."""
+        with self._lock:
+            self._close(self._iteration)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        """Mark tool spans answered from the tool cache."""
+        if name == TOOL_CACHE_HIT_EVENT:
+            with self._lock:
+                span = self._by_run.get(run_id)
+                if span is not None and span.kind == "tool":
+                    span.attributes["cache_hit"] = True
+
+    def finish(self, **attributes):
+        """
+        Close the trace.
+
+        Args:
+            **attributes: Attributes recorded on the root span (e.g. route)
+
+        Returns:
+            dict: The trace (id, start time, duration and spans)
+        """
+        with self._lock:
+            for span in self.spans:
+                self._close(span)
+            self.root.attributes.update(attributes)
+            return {
+                "trace_id": self.trace_id,
+                "started_at": self.started_at,
+                "duration": self.root.duration,
+                "spans": [asdict(span) for span in self.spans],
+            }
+
+_recent = deque(maxlen=TRACE_HISTORY_SIZE)
+_span_seconds = defaultdict(lambda: deque(maxlen=metrics.MAX_TIMING_SAMPLES))
+_span_counts = defaultdict(int)
+_token_counts = defaultdict(int)
+_cache_hits = defaultdict(int)
+_export_lock = threading.Lock()
+
+def record_trace(trace, path=None):
+    """
+    Keep a finished trace, aggregate its spans and append it to the JSONL log.
+
+    Args:
+        trace: A trace returned by RequestTracer.finish
+        path: JSONL log to append to (defaults to TRACE_LOG_PATH; empty skips the file)
+    """
+    path = TRACE_LOG_PATH if path is None else path
+    with _export_lock:
+        _recent.append(trace)
+        for span in trace["spans"]:
+            key = (span["kind"], span["name"])
+            _span_counts[key] += 1
+            if span["end"] is not None:
+                _span_seconds[key].append(span["end"] - span["start"])
+            attributes = span["attributes"]
+            if span["kind"] == "llm":
+                _token_counts["input"] += attributes.get("input_tokens", 0)
+                _token_counts["output"] += attributes.get("output_tokens", 0)
+            if attributes.get("cache_hit"):
+                _cache_hits[span["name"]] += 1
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > TRACE_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(trace) + "\n")
+
+def get_recent_traces(limit=TRACE_HISTORY_SIZE, session_id=None):
+    """
+    Get the most recent traces, newest first.
+
+    Args:
+        limit: Maximum number of traces
+        session_id: Only traces of this session
+
+    Returns:
+        list: Trace dicts
+    """
+    with _export_lock:
+        traces = list(_recent)
+    if session_id is not None:
+        traces = [trace for trace in traces if trace["spans"][0]["attributes"].get("session_id") == session_id]
+    return traces[::-1][:limit]
+
+def get_span_stats():
+    """
+    Summarize span durations by kind and name.
+
+    Returns:
+        dict: {"kind/name": {"count", "mean", "p50", "p95"}}
+    """
+    with _export_lock:
+        samples = {key: list(values) for key, values in _span_seconds.items()}
+    return {
+        f"{kind}/{name}": {
+            "count": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "p50": metrics.percentile(values, 0.50),
+            "p95": metrics.percentile(values, 0.95),
+        }
+        for (kind, name), values in sorted(samples.items())
+    }
+
+def reset_traces():
+    """Forget recent traces and span statistics."""
+    with _export_lock:
+        for store in (_recent, _span_seconds, _span_counts, _token_counts, _cache_hits):
+            store.clear()
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name).strip("_")
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def render_prometheus(prefix="mathgpt", gauges=None):
+    """
+    Render span statistics and application metrics in the Prometheus text format.
+
+    Args:
+        prefix: Prefix of every metric name
+        gauges: Extra {name: value} gauges (e.g. server load)
+
+    Returns:
+        str: The exposition text
+    """
+    with _export_lock:
+        span_samples = {key: list(values) for key, values in _span_seconds.items()}
+        span_counts = dict(_span_counts)
+        token_counts = dict(_token_counts)
+        cache_hits = dict(_cache_hits)
+
+    lines = [f"# TYPE {prefix}_span_seconds summary"]
+    for (kind, name), values in sorted(span_samples.items()):
+        labels = f'kind="{_label(kind)}",name="{_label(name)}"'
+        for quantile in (0.5, 0.95):
+            lines.append(f'{prefix}_span_seconds{{{labels},quantile="{quantile}"}} {metrics.percentile(values, quantile):.6f}')
+        lines.append(f"{prefix}_span_seconds_sum{{{labels}}} {sum(values):.6f}")
+        lines.append(f"{prefix}_span_seconds_count{{{labels}}} {span_counts.get((kind, name), 0)}")
+    lines.append(f"# TYPE {prefix}_llm_tokens_total counter")
+    for direction, count in sorted(token_counts.items()):
+        lines.append(f'{prefix}_llm_tokens_total{{direction="{direction}"}} {count}')
+    lines.append(f"# TYPE {prefix}_tool_cache_hits_total counter")
+    for tool, count in sorted(cache_hits.items()):
+        lines.append(f'{prefix}_tool_cache_hits_total{{tool="{_label(tool)}"}} {count}')
+
+    snapshot = metrics.snapshot()
+    for name, value in sorted(snapshot["counters"].items()):
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, summary in sorted(snapshot["timings"].items()):
+        metric = f"{prefix}_{_metric_name(name)}"
+        lines.append(f"# TYPE {metric} summary")
+        lines.append(f'{metric}{{quantile="0.5"}} {summary["p50"]:.6f}')
+        lines.append(f'{metric}{{quantile="0.95"}} {summary["p95"]:.6f}')
+        lines.append(f"{metric}_count {summary['count']}")
+    for name, value in sorted((gauges or {}).items()):
+        metric = f"{prefix}_{_metric_name(name)}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
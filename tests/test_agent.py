@@ -0,0 +1,334 @@
+"""
+Tests for agent construction and the shared resource layer.
+"""
+
+from src.agent import resources
+from src.utils import metrics
+
+def test_get_resource_builds_once():
+    resources.clear_resources()
+    calls = []
+    
+    def factory():
+        calls.append(1)
+        return object()
+    
+    first = resources.get_resource("test_resource", factory)
+    second = resources.get_resource("test_resource", factory)
+    
+    assert first is second
+    assert len(calls) == 1
+    resources.clear_resources()
+
+def test_get_resource_counts_builds():
+    resources.clear_resources()
+    before = metrics.get_count(resources.OBJECTS_BUILT)
+    
+    resources.get_resource("counted", object)
+    resources.get_resource("counted", object)
+    
+    assert metrics.get_count(resources.OBJECTS_BUILT) - before == 1
+    resources.clear_resources()
+
+def test_normalize_question_canonicalizes_notation():
+    from src.cache.response_cache import normalize_question
+    
+    assert normalize_question("Solve  2x² + 5x − 3 = 0 ?") == normalize_question("solve 2x^2+5x-3=0")
+    assert normalize_question("3 × 4") == normalize_question("3*4")
+
+def test_response_cache_round_trip_and_lru_eviction(tmp_path):
+    from src.cache.response_cache import ResponseCache
+    
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), max_entries=2)
+    cache.put("What is 2 + 2?", "4")
+    
+    assert cache.get("what is 2+2") == "4"
+    assert cache.get("What is 2 + 3?") is None
+    
+    cache.put("q1", "a1")
+    cache.put("q2", "a2")
+    assert len(cache) == 2
+    assert cache.get("What is 2 + 2?") is None
+
+def test_response_cache_skips_context_dependent_questions(tmp_path):
+    from src.cache.response_cache import ResponseCache
+    
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"))
+    cache.put("Use the matrix from earlier", "answer")
+    for follow_up in ("Now integrate it", "Differentiate it", "Why does that work?", "what is the derivative of that"):
+        cache.put(follow_up, "answer")
+    assert len(cache) == 0
+    
+    # Symbols the session defined make the answer session-specific
+    from src.memory.math_context import MathContextIndex
+    
+    context = MathContextIndex()
+    context.add("Let a = 3 and f(x) = x^2 + a")
+    cache.put("What is a?", "3", context)
+    cache.put("What is f(2)?", "7", context)
+    assert len(cache) == 0
+    cache.put("What is a?", "a letter")
+    assert cache.get("What is a?") == "a letter"
+    assert cache.get("What is a?", context) is None
+
+def test_response_cache_ignores_articles_and_pronouns_that_are_not_references():
+    from src.cache.response_cache import is_cacheable
+    from src.memory.math_context import MathContextIndex
+    
+    context = MathContextIndex()
+    context.add("Let a = 3")
+    for question in ("What is a prime number?", "What's 2 + 2?", "Is 7 a prime?",
+                     "Is it true that every prime is odd?", "Prove that x > 0"):
+        assert is_cacheable(question, context)
+    for question in ("What is a + 1?", "What is 2a?", "Find its derivative", "Integrate it with respect to x"):
+        assert not is_cacheable(question, context)
+
+def test_response_cache_keys_include_the_provider(tmp_path):
+    from src.cache.response_cache import ResponseCache
+    
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(path=path, model="groq:llama3-70b-8192").put("What is 2 + 2?", "4")
+    
+    assert ResponseCache(path=path, model="llamacpp:qwen.gguf").get("What is 2 + 2?") is None
+    assert ResponseCache(path=path, model="groq:llama3-70b-8192").get("What is 2 + 2?") == "4"
+
+def test_response_cache_respects_ttl(tmp_path):
+    from src.cache.response_cache import ResponseCache
+    
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), ttl_seconds=-1)
+    cache.put("What is 2 + 2?", "4")
+    
+    assert cache.get("What is 2 + 2?") is None
+
+def test_final_answer_stream_handler_streams_only_the_answer(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.ui import streaming
+    
+    class Placeholder:
+        def __init__(self):
+            self.rendered = []
+        
+        def markdown(self, text):
+            self.rendered.append(text)
+    
+    monkeypatch.setattr(streaming, "REDRAW_INTERVAL", 0)
+    placeholder = Placeholder()
+    handler = streaming.FinalAnswerStreamHandler(placeholder)
+    llm = FakeListChatModel(responses=["Thought: done\nFinal Answer: x = 4"])
+    
+    for _ in llm.stream("question", config={"callbacks": [handler]}):
+        pass
+    
+    assert handler.answer == "x = 4"
+    assert handler.answer_ttft is not None
+    assert all("Thought" not in text for text in placeholder.rendered)
+
+class _SlowAgent:
+    """Minimal stand-in for an AgentExecutor with an async entry point."""
+    
+    memory = None
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+    
+    async def ainvoke(self, inputs, config=None):
+        import asyncio
+        
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return {"output": inputs["input"].upper()}
+
+def test_prepare_markdown_converts_latex_delimiters():
+    from src.ui.rendering import prepare_markdown
+    
+    text = "The root is \\(x = \\frac{1}{2}\\), so \\[x^2 = \\tfrac14\\] and `\\(code\\)` stays."
+    assert prepare_markdown(text) == "The root is $x = \\frac{1}{2}$, so $$x^2 = \\tfrac14$$ and `\\(code\\)` stays."
+
+def test_agent_pool_bounds_in_flight_runs():
+    from src.agent.executor import AgentPool
+    
+    pool = AgentPool(max_in_flight=2, max_queued=10, timeout=5)
+    agent = _SlowAgent(0.05)
+    futures = [pool.submit(agent, {"input": f"q{i}"}) for i in range(6)]
+    
+    assert [future.result() for future in futures] == [f"Q{i}" for i in range(6)]
+    assert agent.peak == 2
+
+def test_agent_pool_times_out_and_sheds_load():
+    import pytest
+    from src.agent.executor import AgentPool, AgentTimeoutError, AgentPoolFullError
+    
+    pool = AgentPool(max_in_flight=1, max_queued=1, timeout=0.05)
+    with pytest.raises(AgentTimeoutError):
+        pool.run(_SlowAgent(1), "slow")
+    
+    pool = AgentPool(max_in_flight=1, max_queued=1, timeout=5)
+    agent = _SlowAgent(0.2)
+    futures = [pool.submit(agent, {"input": f"q{i}"}) for i in range(3)]
+    
+    with pytest.raises(AgentPoolFullError):
+        futures[2].result()
+
+def test_classify_question_routes_simple_problems_to_tools():
+    from src.agent.router import classify_question
+    
+    assert classify_question("what is 12 * 7?") == "arithmetic"
+    assert classify_question("Find the derivative of f(x) = x³ - 4x² + 7x - 9") == "calculus"
+    assert classify_question("Calculate the eigenvalues of matrix [[4, 2], [1, 3]]") == "linear_algebra"
+    assert classify_question("mean of [1, 2, 3]") == "statistics"
+    assert classify_question("Explain eigenvalues") == "conceptual"
+
+def test_classify_question_keeps_multi_step_and_contextual_questions_on_the_agent():
+    from src.agent.router import classify_question
+    
+    assert classify_question("Use the matrix from earlier") == "agent"
+    assert classify_question("(a) find the derivative of x^2 (b) integrate it") == "agent"
+    assert classify_question("Solve the quadratic equation: 2x² + 5x - 3 = 0") == "agent"
+    for follow_up in ("Why does that work?", "Explain it again more simply", "what is the derivative of that"):
+        assert classify_question(follow_up) == "agent"
+
+def test_router_keeps_questions_about_session_variables_on_the_agent():
+    from src.agent.router import classify_question
+    from src.memory.math_context import MathContextIndex
+    
+    context = MathContextIndex()
+    assert classify_question("What is a?", context) == "conceptual"
+    context.add("Let a = 3")
+    assert classify_question("What is a?", context) == "agent"
+    assert classify_question("Explain eigenvalues", context) == "conceptual"
+
+def test_route_question_answers_arithmetic_without_llm():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent.math_agent import build_math_tools
+    from src.agent.router import route_question, get_route_stats
+    
+    tools = build_math_tools(FakeListChatModel(responses=[]))
+    before = get_route_stats()["arithmetic"]
+    
+    assert route_question("2 + 3 * 4", tools) == ("arithmetic", "Answer: 14")
+    assert get_route_stats()["arithmetic"] == before + 1
+
+def test_compact_observation_respects_budget_and_drops_repeats():
+    from src.agent.prompt_budget import compact_observation, estimate_tokens
+    
+    assert compact_observation("a\nb\na\nb") == "a\nb"
+    
+    long_text = "\n".join(f"line {i} " + "x" * 50 for i in range(200))
+    compacted = compact_observation(long_text, budget=100)
+    assert estimate_tokens(compacted) <= 120
+    assert compacted.startswith("line 0") and "tokens omitted" in compacted
+
+def test_compact_tool_deduplicates_observations_within_a_request():
+    from langchain.agents import Tool
+    from src.agent.prompt_budget import compact_tool
+    from src.cache.tool_cache import tool_cache_scope
+    
+    tool = compact_tool(Tool(name="Echo", func=lambda text: f"result {text}", description="Echo"))
+    with tool_cache_scope("session"):
+        assert tool.run("a") == "result a"
+        assert tool.run("a") == "Same result as the earlier Echo call above."
+    with tool_cache_scope("session"):
+        assert tool.run("a") == "result a"
+
+def test_prompt_budget_handler_records_each_call():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent.prompt_budget import PromptBudgetHandler
+    
+    handler = PromptBudgetHandler()
+    llm = FakeListChatModel(responses=["ok", "ok"])
+    llm.invoke("x" * 40, config={"callbacks": [handler]})
+    llm.invoke("x" * 80, config={"callbacks": [handler]})
+    
+    assert handler.report() == {"calls": 2, "total_prompt_tokens": 30, "per_call": [10, 20]}
+
+def test_plan_locally_splits_independent_parts():
+    from src.agent.planner import plan_locally
+    
+    steps = plan_locally("(a) find the determinant of [[1, 2], [3, 4]] (b) mean of [1, 2, 3] (c) 5 * 6")
+    assert [(step.label, step.tool) for step in steps] == [("(a)", "LinearAlgebra"), ("(b)", "Statistics"), ("(c)", "Calculator")]
+    # Shared data before the first part is given to every part
+    steps = plan_locally("Given A = [[1, 2], [3, 4]]:\n1. find the determinant of A\n2. find the eigenvalues of A")
+    assert [step.input for step in steps] == [
+        "Given A = [[1, 2], [3, 4]]: find the determinant of A",
+        "Given A = [[1, 2], [3, 4]]: find the eigenvalues of A",
+    ]
+    # Parts that lean on earlier ones, and numbers that are not part markers, are left to the agent
+    assert plan_locally("(a) find the derivative of x^2 (b) integrate it") is None
+    assert plan_locally("Let x = 1. Then find y") is None
+
+def _sleepy_tool(name, seconds, calls):
+    import asyncio
+    from langchain.agents import Tool
+    
+    async def solve(tool_input):
+        calls.append(tool_input)
+        await asyncio.sleep(seconds)
+        return f"{name}({tool_input})"
+    
+    return Tool(name=name, func=lambda tool_input: None, coroutine=solve, description=name)
+
+def test_execute_plan_runs_independent_steps_concurrently():
+    import asyncio
+    import time
+    from src.agent.planner import PlanStep, aexecute_plan, order_steps
+    
+    calls = []
+    tools = [_sleepy_tool("Calculus", 0.2, calls), _sleepy_tool("Calculator", 0.2, calls)]
+    steps = order_steps([
+        PlanStep("s3", "Calculator", "evaluate {s1} + {s2}", ("s1", "s2")),
+        PlanStep("s1", "Calculus", "d/dx x^2"),
+        PlanStep("s2", "Calculus", "d/dx x^3"),
+    ])
+    
+    started = time.perf_counter()
+    results = asyncio.run(aexecute_plan(steps, tools))
+    elapsed = time.perf_counter() - started
+    
+    assert results["s3"] == "Calculator(evaluate Calculus(d/dx x^2) + Calculus(d/dx x^3))"
+    # Two levels of the DAG, not three sequential calls
+    assert elapsed < 0.55
+
+def test_parse_plan_rejects_cycles_and_unknown_tools():
+    import pytest
+    from src.agent.planner import parse_plan, PlanError
+    
+    steps = parse_plan('Plan: [{"id": "s1", "tool": "Calculus", "input": "x", "depends_on": []}, '
+                       '{"id": "s2", "tool": "Calculator", "input": "{s1}", "depends_on": ["s1"]}]')
+    assert [step.id for step in steps] == ["s1", "s2"]
+    with pytest.raises(PlanError):
+        parse_plan('[{"id": "s1", "tool": "Calculus", "input": "x", "depends_on": ["s2"]}, '
+                   '{"id": "s2", "tool": "Calculus", "input": "y", "depends_on": ["s1"]}]')
+    with pytest.raises(PlanError):
+        parse_plan('[{"id": "s1", "tool": "Shell", "input": "x"}]')
+
+def test_parse_plan_infers_dependencies_from_placeholders():
+    import pytest
+    from src.agent.planner import parse_plan, PlanError
+    
+    steps = parse_plan('[{"id": "s2", "tool": "Calculator", "input": "{s1} + 1"}, '
+                       '{"id": "s1", "tool": "Calculus", "input": "x"}]')
+    assert [step.id for step in steps] == ["s1", "s2"]
+    assert steps[1].depends_on == ("s1",)
+    with pytest.raises(PlanError):
+        parse_plan('[{"id": "s1", "tool": "Calculator", "input": "{s9} + 1"}]')
+
+def test_plan_and_execute_solver_merges_llm_planned_steps():
+    import asyncio
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent.planner import PlanAndExecuteSolver
+    
+    plan = ('[{"id": "s1", "tool": "Calculus", "input": "integrate x^2", "depends_on": []}, '
+            '{"id": "s2", "tool": "Calculator", "input": "2 * 3", "depends_on": []}]')
+    llm = FakeListChatModel(responses=[plan, "merged answer"])
+    calls = []
+    tools = [_sleepy_tool("Calculus", 0, calls), _sleepy_tool("Calculator", 0, calls)]
+    fallback = LLMChain(llm=FakeListChatModel(responses=["fallback"]), prompt=PromptTemplate.from_template("{question}"))
+    
+    assert asyncio.run(PlanAndExecuteSolver(llm, tools, fallback).arun("a hard problem")) == "merged answer"
+    assert sorted(calls) == ["2 * 3", "integrate x^2"]
@@ -0,0 +1,69 @@
+"""
+Tests for the headless batch runner.
+"""
+
+import asyncio
+import json
+import time
+
+from src.batch.runner import read_problems, run_batch, RateLimiter
+
+class SlowSolver:
+    """Answers every question after a fixed delay."""
+    
+    def __init__(self, seconds=0.1, fail_on=None):
+        self.seconds = seconds
+        self.fail_on = fail_on
+        self.solved = []
+    
+    async def solve(self, question, callbacks=None):
+        await asyncio.sleep(self.seconds)
+        if question == self.fail_on:
+            raise ValueError("cannot parse")
+        self.solved.append(question)
+        return "agent", f"answer to {question}"
+
+def _write_problems(path, count):
+    with open(path, "w") as handle:
+        for i in range(count):
+            handle.write(json.dumps({"id": i, "question": f"q{i}"}) + "\n")
+
+def test_read_problems_streams_jsonl_and_csv(tmp_path):
+    csv_path = tmp_path / "problems.csv"
+    csv_path.write_text("problem_id,problem\na1,What is 2+2?\na2,\na3,Integrate x\n")
+    jsonl_path = tmp_path / "problems.jsonl"
+    jsonl_path.write_text('{"question": "first"}\n\n{"id": 7, "prompt": "second"}\n')
+    
+    assert list(read_problems(str(csv_path))) == [
+        {"id": "a1", "question": "What is 2+2?"},
+        {"id": "a3", "question": "Integrate x"},
+    ]
+    assert list(read_problems(str(jsonl_path))) == [{"id": "1", "question": "first"}, {"id": "7", "question": "second"}]
+
+def test_run_batch_is_concurrent_and_resumes_from_its_output(tmp_path):
+    input_path, output_path = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")
+    _write_problems(input_path, 8)
+    
+    started = time.perf_counter()
+    report = run_batch(SlowSolver(fail_on="q3"), input_path, output_path, concurrency=4)
+    assert time.perf_counter() - started < 0.6
+    assert (report["solved"], report["failed"], report["routes"]) == (7, 1, {"agent": 7})
+    assert report["latency_p95_seconds"] >= report["latency_p50_seconds"] > 0
+    
+    # A rerun retries the failure and solves only problems without an answer
+    with open(input_path, "a") as handle:
+        handle.write(json.dumps({"id": 8, "question": "q8"}) + "\n")
+    solver = SlowSolver(seconds=0)
+    report = run_batch(solver, input_path, output_path, concurrency=1)
+    assert solver.solved == ["q3", "q8"] and report["skipped"] == 7
+    with open(output_path) as handle:
+        assert len(handle.readlines()) == 10
+
+def test_rate_limiter_spaces_out_starts():
+    async def start_five():
+        limiter = RateLimiter(rate=20)
+        started = time.perf_counter()
+        await asyncio.gather(*(limiter.wait() for _ in range(5)))
+        return time.perf_counter() - started
+    
+    assert asyncio.run(start_five()) >= 0.19
@@ -0,0 +1,40 @@
+"""
+Tests for the benchmark fake model and corpus.
+"""
+
+import time
+
+from src.bench.corpus import CORPUS, scripts_for
+from src.bench.fake_llm import ScriptedChatModel
+
+def test_scripted_model_drives_the_agent_through_its_steps():
+    from src.agent.math_agent import build_math_tools, create_math_agent
+
+    question = "A shop sells pens at 3 for $2. How much do 12 pens cost?"
+    model = ScriptedChatModel(
+        scripts={question: {"steps": [("Calculus", "derivative of x^2")], "answer": "They cost $8."}},
+        latency_seconds=0.01,
+    )
+    agent = create_math_agent(model, None, tools=build_math_tools(model))
+
+    started = time.perf_counter()
+    assert agent.invoke({"input": question})["output"] == "They cost $8."
+    stats = model.stats()
+    # One tool step, the tool's explanation call, then the final answer
+    assert stats["calls"] == 3 and stats["prompt_tokens"] > 0
+    assert time.perf_counter() - started >= 0.03
+
+    model.reset_stats()
+    assert model.stats()["calls"] == 0
+    assert model.invoke("Explain integration").content == model.default_answer
+
+def test_corpus_agent_questions_are_routed_to_the_agent():
+    from src.agent.router import classify_question, AGENT_ROUTE
+
+    scripts = scripts_for(CORPUS)
+    for item in CORPUS:
+        if item.kind == "agent":
+            assert classify_question(item.question) == AGENT_ROUTE
+            assert scripts[item.question]["steps"]
+        elif item.kind != "multi_part":
+            assert classify_question(item.question) == item.kind
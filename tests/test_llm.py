@@ -0,0 +1,146 @@
+"""
+Tests for the language model providers and failover.
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.bench.fake_llm import ScriptedChatModel
+from src.llm import providers, rate_limit
+from src.llm.model import initialize_llm, SUMMARY_TASK
+from src.llm.rate_limit import RateLimitedChatModel, RateLimitExceededError, TokenBucket, parse_duration
+from src.utils.tracing import RequestTracer
+
+class BrokenChatModel(BaseChatModel):
+    """Chat model whose every call fails, like an unreachable provider."""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "broken"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        raise ConnectionError("provider unreachable")
+
+@pytest.fixture(autouse=True)
+def fresh_health():
+    providers.reset_provider_health()
+    yield
+    providers.reset_provider_health()
+
+def test_failover_skips_a_failing_provider_until_its_cooldown_ends(monkeypatch):
+    monkeypatch.setattr(providers, "LLM_PROVIDER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(providers, "LLM_PROVIDER_COOLDOWN_SECONDS", 0.2)
+    broken = BrokenChatModel()
+    backup = FakeListChatModel(responses=["42"])
+    monkeypatch.setitem(providers.PROVIDERS, "remote", providers.Provider("remote", lambda: broken))
+    monkeypatch.setitem(providers.PROVIDERS, "backup", providers.Provider("backup", lambda: backup))
+    llm = providers.build_failover_llm(["remote", "backup"])
+
+    tracer = RequestTracer("q")
+    assert llm.invoke("What is 6 * 7?", config={"callbacks": [tracer]}).content == "42"
+    assert [span.name for span in tracer.spans if span.kind == "llm"] == ["backup"]
+    status = providers.get_provider_status()
+    assert not status["remote"]["healthy"] and "unreachable" in status["remote"]["last_error"]
+    assert status["backup"]["healthy"] and status["backup"]["latency"]["count"] == 1
+
+    # While cooling down the failed provider is not tried first
+    llm.invoke("again")
+    assert broken.calls == 1
+
+    # Afterwards the next request probes it again
+    time.sleep(0.25)
+    llm.invoke("and again")
+    assert broken.calls == 2
+
+    monkeypatch.setitem(providers.PROVIDERS, "backup", providers.Provider("backup", lambda: BrokenChatModel()))
+    with pytest.raises(providers.LLMProviderError):
+        providers.build_failover_llm(["remote", "backup"]).invoke("nobody answers")
+
+def test_cheap_tasks_use_a_local_provider_and_fall_back_to_the_main_model(monkeypatch):
+    main = FakeListChatModel(responses=["main"])
+    monkeypatch.setitem(providers.LLM_TASK_PROVIDERS, "summary", ["tiny"])
+    # Without a usable local provider the task simply uses the main model
+    monkeypatch.setitem(providers.PROVIDERS, "tiny", providers.Provider("tiny", BrokenChatModel, lambda: "not installed", local=True))
+    assert initialize_llm(SUMMARY_TASK, fallback=main) is main
+
+    local = FakeListChatModel(responses=["local"])
+    monkeypatch.setitem(providers.PROVIDERS, "tiny", providers.Provider("tiny", lambda: local, local=True))
+    llm = initialize_llm(SUMMARY_TASK, fallback=main)
+    assert llm.provider_names == ["tiny", "main"] and llm.serialized == ["tiny"]
+    assert asyncio.run(llm.ainvoke("Summarize")).content == "local"
+
+def test_offline_mode_uses_only_local_providers(monkeypatch):
+    monkeypatch.setattr(providers, "OFFLINE_MODE", True)
+    monkeypatch.setattr(providers, "LLM_PROVIDERS", ["groq", "llamacpp"])
+    monkeypatch.setattr(providers, "LOCAL_MODEL_PATH", "")
+    assert providers.provider_names() == ["llamacpp"]
+    assert "MATHGPT_LOCAL_MODEL" in providers.configuration_error()
+    with pytest.raises(providers.LLMConfigurationError):
+        initialize_llm()
+
+class RateLimitedError(Exception):
+    """Provider error carrying an HTTP status and response headers, like the Groq SDK's."""
+
+    def __init__(self, status_code, headers):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers})()
+
+class FlakyChatModel(FakeListChatModel):
+    """Answers after failing with the given errors first."""
+
+    errors: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+def test_token_bucket_queues_then_sheds_calls_beyond_the_quota():
+    bucket = TokenBucket(tokens_per_minute=600)
+    assert bucket.reserve(600) == 0
+    # 10 tokens per second come back, so the next 5 tokens are half a second away
+    assert bucket.reserve(5, max_wait=1) == pytest.approx(0.5, abs=0.05)
+    with pytest.raises(RateLimitExceededError):
+        bucket.reserve(5, max_wait=1, max_queued=1)
+    with pytest.raises(RateLimitExceededError):
+        bucket.reserve(20, max_wait=1)
+    bucket.release_wait()
+    bucket.adjust(-600)
+    assert bucket.reserve(5) == 0 and bucket.stats()["waiting"] == 0
+
+def test_identical_concurrent_prompts_share_one_upstream_call():
+    model = ScriptedChatModel(latency_seconds=0.2)
+    llm = RateLimitedChatModel(model=model, requests_per_minute=600, tokens_per_minute=100000)
+
+    async def burst():
+        same = [llm.ainvoke("Integrate x^2") for _ in range(5)]
+        return await asyncio.gather(*same, llm.ainvoke("Differentiate x^2"))
+
+    replies = asyncio.run(burst())
+    assert len({reply.content for reply in replies[:5]}) == 1
+    assert model.stats()["calls"] == 2
+    assert llm.stats()["in_flight"] == 0
+
+def test_rate_limited_calls_are_retried_after_the_provider_reset(monkeypatch):
+    monkeypatch.setattr(rate_limit, "LLM_RETRY_BASE_SECONDS", 0.01)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12) and parse_duration("soon") is None
+
+    model = FlakyChatModel(responses=["ok"], errors=[RateLimitedError(429, {"retry-after": "0.1"})])
+    llm = RateLimitedChatModel(model=model)
+    started = time.perf_counter()
+    assert llm.invoke("What is 1 + 1?").content == "ok"
+    assert time.perf_counter() - started >= 0.1
+
+    # Client errors are not retried
+    model.errors = [RateLimitedError(400, {})]
+    with pytest.raises(RateLimitedError):
+        llm.invoke("What is 2 + 2?")
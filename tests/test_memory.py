@@ -0,0 +1,193 @@
+"""
+Tests for the conversation memory tiers.
+"""
+
+import os
+import time
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from src.memory.tiered_memory import TieredMathMemory
+from src.memory.math_context import MathContextIndex
+from src.memory.retrieval import TurnRetriever
+from src.memory.history_store import SQLiteChatMessageHistory, get_recent_messages
+from src.utils.tokens import estimate_tokens
+
+def _memory(**kwargs):
+    return TieredMathMemory(chat_memory=ChatMessageHistory(), input_key="input", output_key="output", **kwargs)
+
+def _add_turns(memory, count, start=0):
+    for i in range(start, start + count):
+        memory.save_context({"input": f"question {i}"}, {"output": f"answer {i}"})
+
+def test_tiered_memory_keeps_recent_turns_verbatim():
+    memory = _memory(k=2)
+    _add_turns(memory, 5)
+    
+    rendered = memory.load_memory_variables({})["chat_history"]
+    assert rendered.endswith("Human: question 3\nAI: answer 3\nHuman: question 4\nAI: answer 4")
+    assert "question 0" in memory.summary
+    assert memory.summarized_count == 6
+
+def test_tiered_memory_summarizes_incrementally():
+    llm = FakeListChatModel(responses=["summary one", "summary two", "unused"])
+    memory = _memory(k=1, llm=llm)
+    
+    _add_turns(memory, 2)
+    assert memory.summary == "summary one"
+    _add_turns(memory, 1, start=2)
+    assert memory.summary == "summary two"
+    # Each turn leaving the window costs exactly one summarization call
+    assert llm.i == 2
+
+def test_tiered_memory_enforces_token_cap():
+    memory = _memory(k=3, max_token_limit=100)
+    for i in range(3):
+        memory.save_context({"input": "q" * 1000}, {"output": "a" * 1000})
+    
+    assert estimate_tokens(memory.load_memory_variables({})["chat_history"]) <= 110
+
+def test_tiered_memory_resets_when_history_is_cleared():
+    memory = _memory(k=1)
+    _add_turns(memory, 3)
+    memory.chat_memory.clear()
+    
+    assert memory.load_memory_variables({})["chat_history"] == ""
+    assert memory.summary == ""
+
+def test_math_context_index_extracts_variables_equations_and_concepts():
+    index = MathContextIndex()
+    index.add("Let a = 3 and suppose n equals 10. Solve 2x + 3 = 7 with the quadratic formula.")
+    index.add("By the Pythagorean theorem, f(x) = x^2 + 1 and 2 + 2 = 4.")
+    
+    assert [entry.text for entry in index.variables.values()] == ["n = 10", "a = 3"]
+    assert list(index.equations) == ["2x + 3 = 7", "f(x) = x^2 + 1"]
+    assert set(index.concepts) == {"quadratic formula", "pythagorean theorem"}
+
+def test_math_context_index_selects_relevant_entries():
+    index = MathContextIndex()
+    index.add("Let a = 3 and b = 4. Let d = a + b. Also g(t) = 5t and n = 10.")
+    
+    assert [entry.text for entry in index.relevant("what is d/2?")] == ["a = 3", "b = 4", "d = a + b"]
+    assert index.render("what is 5*5?") == ""
+    assert "g(t) = 5t" in index.render("evaluate g(2)")
+
+def test_tiered_memory_injects_math_context_from_old_turns():
+    index = MathContextIndex()
+    memory = _memory(k=1, context_index=index)
+    memory.save_context({"input": "let k = 12"}, {"output": "Noted, k = 12."})
+    _add_turns(memory, 3)
+    
+    rendered = memory.load_memory_variables({"input": "what is k + 1?"})["chat_history"]
+    assert rendered.startswith("Known math context:\n- k = 12")
+    # Each message is parsed once, as it arrives
+    assert index.indexed_count == len(memory.chat_memory.messages)
+
+def _turn_messages(pairs):
+    history = ChatMessageHistory()
+    for question, answer in pairs:
+        history.add_user_message(question)
+        history.add_ai_message(answer)
+    return history.messages
+
+def test_turn_retriever_finds_the_relevant_turn_incrementally():
+    retriever = TurnRetriever()
+    messages = _turn_messages([
+        ("Find the determinant of the matrix [[1, 2], [3, 4]]", "The determinant is -2."),
+        ("What is the derivative of sin(x)?", "cos(x)"),
+        ("Integrate x^2 from 0 to 1", "1/3"),
+    ])
+    retriever.sync(messages[:4])
+    retriever.sync(messages)
+    
+    assert len(retriever) == 3 and retriever.indexed_messages == 6
+    results = retriever.search("use the matrix from earlier and invert it", k=1)
+    assert [turn["ai"] for _, turn in results] == ["The determinant is -2."]
+    assert retriever.search("use the matrix from earlier", before=0) == []
+
+def test_turn_retriever_persists_per_session(tmp_path):
+    messages = _turn_messages([("Let the matrix be [[2, 0], [0, 2]]", "Noted."), ("Add 2 and 3", "5")])
+    TurnRetriever("session-1", directory=str(tmp_path)).sync(messages)
+    
+    reopened = TurnRetriever("session-1", directory=str(tmp_path))
+    assert len(reopened) == 2 and reopened.indexed_messages == 4
+    assert reopened.search("that matrix", k=1)[0][1]["ai"] == "Noted."
+    assert len(TurnRetriever("session-2", directory=str(tmp_path))) == 0
+    # Ids that used to collide or escape the directory get their own store
+    TurnRetriever("a/b", directory=str(tmp_path)).sync(messages)
+    assert len(TurnRetriever("a_b", directory=str(tmp_path))) == 0
+    assert os.path.dirname(TurnRetriever("..", directory=str(tmp_path)).path) == str(tmp_path)
+
+def test_turn_retriever_searches_thousands_of_turns_quickly():
+    retriever = TurnRetriever()
+    retriever.sync(_turn_messages([(f"problem {i} about topic{i % 97}", f"answer {i}") for i in range(5000)]))
+    
+    started = time.perf_counter()
+    for _ in range(20):
+        retriever.search("problem about topic42")
+    assert (time.perf_counter() - started) / 20 < 0.01
+
+def test_tiered_memory_retrieves_turns_outside_the_window():
+    memory = _memory(k=1, retriever=TurnRetriever())
+    memory.save_context({"input": "Invert the matrix [[4, 7], [2, 6]]"}, {"output": "[[0.6, -0.7], [-0.2, 0.4]]"})
+    _add_turns(memory, 3)
+    
+    rendered = memory.load_memory_variables({"input": "multiply that inverse matrix by 10"})["chat_history"]
+    assert rendered.startswith("Relevant earlier turns:\nHuman: Invert the matrix")
+
+def test_sqlite_history_appends_turns_and_reads_pages(tmp_path):
+    path = str(tmp_path / "chat.sqlite3")
+    history = SQLiteChatMessageHistory("session-1", path=path)
+    memory = TieredMathMemory(chat_memory=history, input_key="input", output_key="output", k=1)
+    _add_turns(memory, 3)
+    
+    # Another process (or replica) sees the same history
+    reopened = SQLiteChatMessageHistory("session-1", path=path)
+    messages = reopened.messages
+    assert len(messages) == 6
+    assert [message.content for message in messages[4:]] == ["question 2", "answer 2"]
+    assert messages[-1].type == "ai" and messages[::3][1].content == "answer 1"
+    assert [message.content for message in reopened.get_recent(2, before=2)[1]] == ["question 0", "answer 0"]
+    assert len(SQLiteChatMessageHistory("session-2", path=path).messages) == 0
+    
+    reopened.clear()
+    assert len(history.messages) == 0
+
+def test_get_recent_messages_pages_any_backend():
+    history = ChatMessageHistory()
+    for i in range(5):
+        history.add_user_message(f"m{i}")
+    
+    start, page = get_recent_messages(history, 2)
+    assert start == 3 and [message.content for message in page] == ["m3", "m4"]
+
+def test_summary_is_stored_with_the_history_and_continued_after_a_reload(tmp_path):
+    path = str(tmp_path / "chat.sqlite3")
+    llm = FakeListChatModel(responses=["summary one", "summary two"])
+    memory = TieredMathMemory(chat_memory=SQLiteChatMessageHistory("s", path=path), input_key="input", output_key="output", k=1, llm=llm)
+    _add_turns(memory, 2)
+    assert memory.summary == "summary one"
+    
+    # A restarted process (or an evicted session) picks up the stored summary
+    reloaded_llm = FakeListChatModel(responses=["summary three", "unused"])
+    reloaded = TieredMathMemory(chat_memory=SQLiteChatMessageHistory("s", path=path), input_key="input", output_key="output", k=1, llm=reloaded_llm)
+    assert reloaded.load_memory_variables({})["chat_history"].startswith("Summary of earlier conversation:\nsummary one")
+    assert reloaded_llm.i == 0
+    _add_turns(reloaded, 1, start=2)
+    assert reloaded.summary == "summary three" and reloaded.summarized_count == 4
+    assert reloaded_llm.i == 1
+    
+    reloaded.clear()
+    assert SQLiteChatMessageHistory("s", path=path).load_summary() == ("", 0)
+
+def test_a_long_unsummarized_backlog_is_folded_in_chunks(tmp_path):
+    history = SQLiteChatMessageHistory("s", path=str(tmp_path / "chat.sqlite3"))
+    for i in range(40):
+        history.add_messages([HumanMessage(content="q" * 2000), AIMessage(content="a" * 2000)])
+    llm = FakeListChatModel(responses=[f"summary {i}" for i in range(30)])
+    memory = TieredMathMemory(chat_memory=history, input_key="input", output_key="output", k=1, llm=llm)
+    
+    memory.fold_old_messages()
+    # 78 messages of 500 (truncated) tokens each, at most 4000 tokens per call
+    assert memory.summarized_count == 78 and llm.i == 10
+    assert history.load_summary() == (memory.summary, 78)
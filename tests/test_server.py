@@ -0,0 +1,208 @@
+"""
+Tests for the Streamlit-free solver core and its HTTP server.
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.agent import resources
+from src.bench.fake_llm import ScriptedChatModel
+from src.cache.tool_cache import clear_tool_cache
+from src.core import solver
+from src.agent.executor import AgentTimeoutError
+from src.core.server import SolverPool, SolverHTTPServer
+from src.memory import chat_memory, history_store
+from src.utils import tracing
+
+WORD_PROBLEM = "A ball is thrown up with h(t) = 20t - 5t^2. When does it peak and how high does it get?"
+
+@pytest.fixture
+def fake_llm(monkeypatch, tmp_path):
+    monkeypatch.setattr(solver, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(chat_memory, "RETRIEVAL_ENABLED", False)
+    monkeypatch.setitem(history_store.HISTORY_BACKENDS, "sqlite", history_store.HISTORY_BACKENDS["memory"])
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(tmp_path / "traces.jsonl"))
+    resources.clear_resources()
+    solver.clear_sessions()
+    clear_tool_cache()
+    tracing.reset_traces()
+    steps = [("Calculus", "derivative of 20*t - 5*t^2"), ("Calculus", "derivative of 20*t - 5*t^2")]
+    model = ScriptedChatModel(scripts={WORD_PROBLEM: {"steps": steps, "answer": "At t = 2 s, 20 m high."}})
+    resources.get_resource("llm", lambda: model)
+    yield
+    resources.clear_resources()
+    solver.clear_sessions()
+
+def test_solve_answers_without_streamlit_and_keeps_the_session(fake_llm):
+    result = solver.solve("What is 12 * 12?", "s1")
+    assert "144" in result.answer
+    assert result.route != "agent" and result.session_id == "s1" and not result.cached
+
+    solver.solve("What is 2 + 3?", "s1")
+    session = solver.get_session("s1")
+    # Welcome message plus two saved turns
+    assert len(session.msgs.messages) == 5
+    assert solver.solve("What is 1 + 1?").session_id != "s1"
+    with pytest.raises(ValueError):
+        solver.solve("   ", "s1")
+
+def test_solve_traces_agent_iterations_tool_calls_and_cache_hits(fake_llm, tmp_path):
+    result = solver.solve(WORD_PROBLEM, "traced")
+    assert result.route == "agent" and result.answer == "At t = 2 s, 20 m high."
+
+    spans = result.trace["spans"]
+    names = [(span["kind"], span["name"]) for span in spans]
+    for expected in [("request", "request"), ("stage", "router"), ("stage", "agent"), ("queue", "queue"),
+                     ("agent", "agent"), ("iteration", "iteration 1"), ("iteration", "iteration 3")]:
+        assert expected in names
+    tools = [span for span in spans if span["kind"] == "tool" and span["name"] == "Calculus"]
+    by_id = {span["id"]: span for span in spans}
+    # The agent's second identical call is served by the tool cache
+    assert [tool["attributes"]["cache_hit"] for tool in tools[-2:]] == [False, True]
+    assert by_id[tools[-1]["parent"]]["name"] == "iteration 2"
+    assert all(span["end"] >= span["start"] for span in spans)
+    assert any(span["kind"] == "llm" and span["attributes"]["input_tokens"] > 0 for span in spans)
+
+    with open(tmp_path / "traces.jsonl") as handle:
+        assert json.loads(handle.readline())["trace_id"] == result.trace["trace_id"]
+    assert tracing.get_recent_traces(session_id="traced")[0]["trace_id"] == result.trace["trace_id"]
+    exposition = tracing.render_prometheus()
+    assert 'mathgpt_span_seconds_count{kind="tool",name="Calculus"}' in exposition
+    assert 'mathgpt_tool_cache_hits_total{tool="Calculus"} 1' in exposition
+
+@pytest.fixture
+def server():
+    def fake_solve(question, session_id):
+        if question == "slow":
+            time.sleep(0.5)
+        if question == "broken":
+            # e.g. a DatasetError: a ValueError raised while solving, not a bad request
+            raise ValueError("internal failure")
+        tracer = tracing.RequestTracer(question, session_id)
+        return {"answer": f"answer to {question}", "route": "agent", "session_id": session_id,
+                "trace": tracer.finish(route="agent")}
+
+    pool = SolverPool(workers=0, max_pending=1, timeout=5, solve_fn=fake_solve)
+    httpd = SolverHTTPServer(("127.0.0.1", 0), pool)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    pool.shutdown()
+
+def _post(url, payload):
+    request = urllib.request.Request(url + "/solve", data=json.dumps(payload).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+def test_server_solves_and_validates_requests(server):
+    status, body = _post(server, {"question": "What is 2+2?", "session_id": "abc"})
+    assert status == 200 and body == {"answer": "answer to What is 2+2?", "route": "agent", "session_id": "abc"}
+
+    status, body = _post(server, {"question": "What is 2+2?"})
+    assert status == 200 and body["session_id"]
+    assert _post(server, {"question": ""})[0] == 400
+    assert _post(server, {"question": "x", "session_id": 5})[0] == 400
+    assert _post(server, {"question": "broken"})[0] == 500
+
+    with urllib.request.urlopen(server + "/health") as response:
+        assert json.load(response)["status"] == "ok"
+
+def test_server_exports_traces_and_metrics(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(tmp_path / "traces.jsonl"))
+    tracing.reset_traces()
+    status, body = _post(server, {"question": "What is 2+2?", "include_trace": True})
+    assert status == 200 and body["trace"]["spans"][0]["attributes"]["route"] == "agent"
+
+    with urllib.request.urlopen(server + "/traces?limit=5") as response:
+        assert len(json.load(response)["traces"]) == 1
+    with urllib.request.urlopen(server + "/metrics") as response:
+        text = response.read().decode()
+    assert 'mathgpt_span_seconds_count{kind="request",name="request"} 1' in text
+    assert "mathgpt_server_pending 0" in text
+
+def test_server_sheds_load_beyond_max_pending(server):
+    slow = threading.Thread(target=_post, args=(server, {"question": "slow"}))
+    slow.start()
+    time.sleep(0.1)
+    status, body = _post(server, {"question": "fast"})
+    slow.join()
+    assert status == 503 and "pending" in body["error"]
+
+def _sleepy_solve(question, session_id):
+    # "wait N" sleeps N seconds, like a slow LLM call or a stuck computation
+    if question.startswith("wait"):
+        time.sleep(float(question.split()[1]))
+    return {"answer": f"answer to {question}", "route": "agent", "session_id": session_id}
+
+def test_worker_processes_answer_concurrently_and_restart_when_stuck():
+    pool = SolverPool(workers=1, max_pending=8, timeout=1.5, solve_fn=_sleepy_solve, threads=4)
+    try:
+        pool.warm_up()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=pool.solve, args=("wait 0.5", f"s{n}")) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Four requests on one worker overlap instead of queueing behind each other
+        assert time.perf_counter() - started < 1.5
+
+        # Only a worker whose every thread is stuck is restarted
+        errors = []
+        def solve_stuck(session_id):
+            with pytest.raises(AgentTimeoutError):
+                pool.solve("wait 60", session_id)
+            errors.append(session_id)
+        threads = [threading.Thread(target=solve_stuck, args=(f"stuck{n}",)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 4
+        assert pool.stats()["worker_restarts"] == 1
+        assert pool.solve("What is 2+2?", "stuck0")["answer"] == "answer to What is 2+2?"
+    finally:
+        pool.shutdown()
+
+def test_one_slow_request_times_out_without_killing_its_neighbours():
+    pool = SolverPool(workers=1, max_pending=8, timeout=1.0, solve_fn=_sleepy_solve, threads=4)
+    try:
+        pool.warm_up()
+        errors = []
+        def solve_slow():
+            try:
+                pool.solve("wait 5", "slow")
+            except AgentTimeoutError as e:
+                errors.append(e)
+        slow = threading.Thread(target=solve_slow)
+        slow.start()
+        time.sleep(0.5)
+        # Still running on the same process when the slow request times out
+        assert pool.solve("wait 0.8", "neighbour")["answer"] == "answer to wait 0.8"
+        slow.join()
+        assert len(errors) == 1
+        assert pool.stats()["worker_restarts"] == 0
+    finally:
+        pool.shutdown()
+
+def test_server_rejects_a_malformed_content_length(server):
+    import http.client
+    
+    host, port = server.split("//")[1].split(":")
+    connection = http.client.HTTPConnection(host, int(port))
+    connection.putrequest("POST", "/solve")
+    connection.putheader("Content-Length", "ten")
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400 and "Content-Length" in json.load(response)["error"]
+    connection.close()
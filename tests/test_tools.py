@@ -0,0 +1,342 @@
+"""
+Tests for the math tools and their local engines.
+"""
+
+import math
+import pytest
+from src.engines.arithmetic import evaluate_expression, format_number, ExpressionParseError
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2+2", 4),
+    ("2(3+4)^2", 98),
+    ("what is 12 × 4 ÷ 3?", 16),
+    ("2³ + 1", 9),
+    ("5!", 120),
+    ("(1+2)(3+4)", 21),
+    ("log(8, 2)", 3),
+])
+def test_evaluate_expression(expression, expected):
+    assert evaluate_expression(expression) == pytest.approx(expected)
+
+def test_evaluate_expression_constants_and_implicit_multiplication():
+    assert evaluate_expression("2pi") == pytest.approx(2 * math.pi)
+    assert evaluate_expression("sqrt(16) + 3e") == pytest.approx(4 + 3 * math.e)
+
+@pytest.mark.parametrize("expression", ["3x + 1", "solve x^2 = 4", "__import__('os')", ""])
+def test_evaluate_expression_rejects_non_arithmetic(expression):
+    with pytest.raises(ExpressionParseError):
+        evaluate_expression(expression)
+
+@pytest.mark.parametrize("expression", ["sqrt(1, 2)", "max(1)", "comb(5)"])
+def test_evaluate_expression_rejects_wrong_arity(expression):
+    with pytest.raises(ExpressionParseError):
+        evaluate_expression(expression)
+
+def test_evaluate_expression_rejects_non_integer_and_complex_results():
+    assert evaluate_expression("gcd(12/2, 4)") == 2
+    with pytest.raises(ValueError):
+        evaluate_expression("gcd(2.5, 3)")
+    with pytest.raises(ValueError):
+        evaluate_expression("(-8)^(1/3)")
+    with pytest.raises(ValueError):
+        format_number(1 + 2j)
+
+def test_evaluate_expression_guards_huge_exponents():
+    with pytest.raises(OverflowError):
+        evaluate_expression("9^9^9")
+    # The base grows the result too; its size is bounded before computing it
+    with pytest.raises(OverflowError):
+        evaluate_expression("(9^9999)^9999")
+    with pytest.raises(OverflowError):
+        evaluate_expression("comb(1000000, 500000)")
+
+def test_format_number():
+    assert format_number(4.0) == "4"
+    assert format_number(1 / 3) == "0.333333333333"
+    assert format_number(2 ** 70) == str(2 ** 70)
+    assert format_number(math.factorial(2000)) == "3.31627509245e+5735"
+    assert format_number(10 ** 1500) == "1e+1500"
+
+def test_calculator_tool_fast_path_skips_llm():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.tools.calculator import create_calculator_tool, get_fast_path_stats
+    
+    tool = create_calculator_tool(FakeListChatModel(responses=[]), "Calculator")
+    before = get_fast_path_stats()["hits"]
+    
+    assert tool.run("12 * (3 + 4)") == "Answer: 84"
+    assert get_fast_path_stats()["hits"] == before + 1
+    assert tool.run("9^9999") == "Answer: 2.95700380802e+9541"
+
+def test_solve_calculus_derivative():
+    from src.engines.calculus import solve_calculus
+    
+    result = solve_calculus("Find the derivative of f(x) = x³ - 4x² + 7x - 9")
+    assert str(result.result) == "3*x**2 - 8*x + 7"
+
+def test_solve_calculus_definite_integral_and_limit():
+    from src.engines.calculus import solve_calculus
+    
+    assert solve_calculus("integral of x^2 dx from 0 to 3").result == 9
+    assert solve_calculus("limit of sin(x)/x as x -> 0").result == 1
+    assert solve_calculus("limit of 1/x as x -> oo").result == 0
+
+def test_solve_calculus_two_sided_limit_that_does_not_exist():
+    from src.engines.calculus import solve_calculus
+    
+    for question in ("limit of abs(x)/x as x -> 0", "limit of 1/x as x -> 0"):
+        result = solve_calculus(question)
+        assert result.result is None
+        assert "does not exist" in result.describe()
+    assert str(solve_calculus("limit of 1/x^2 as x -> 0").result) == "oo"
+
+def test_solve_calculus_rejects_unsafe_or_unrelated_input():
+    from src.engines.calculus import solve_calculus, CalculusParseError
+    
+    with pytest.raises(CalculusParseError):
+        solve_calculus("derivative of __import__('os')")
+    with pytest.raises(CalculusParseError):
+        solve_calculus("What is an integral?")
+
+def test_calculus_rejects_huge_numbers_and_slow_computations(monkeypatch):
+    import time
+    from src.engines import calculus
+    from src.agent.router import classify_question
+    
+    # Rejected while parsing, before SymPy tries to evaluate them
+    for question in ("derivative of 9^9^9^9", "derivative of x^(9^9^9)", "integral of x^1000 from 0 to 10^5"):
+        with pytest.raises(calculus.CalculusParseError):
+            calculus.solve_calculus(question)
+    assert classify_question("derivative of 9^9^9^9") == "agent"
+    
+    monkeypatch.setattr(calculus, "CAS_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(calculus, "_solve_calculus", lambda question: time.sleep(0.5))
+    started = time.perf_counter()
+    with pytest.raises(calculus.CalculusParseError):
+        calculus.solve_calculus("integral of x dx")
+    assert time.perf_counter() - started < 0.4
+
+def test_calculus_tool_passes_verified_result_to_llm():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.tools.advanced_math import create_calculus_tool
+    
+    tool = create_calculus_tool(FakeListChatModel(responses=["Use the power rule."]), "Calculus")
+    output = tool.run("derivative of x^2")
+    
+    assert output.startswith("Verified result: derivative of x**2 with respect to x: 2*x")
+    assert "Use the power rule." in output
+
+def test_solve_linear_algebra_operations():
+    from src.engines.linear_algebra import solve_linear_algebra
+    
+    eigen = solve_linear_algebra("Calculate the eigenvalues of matrix [[4, 2], [1, 3]]")
+    assert sorted(eigen.result["eigenvalues"].real) == pytest.approx([2, 5])
+    assert solve_linear_algebra("determinant of [[1, 2], [3, 4]]").result["determinant"] == pytest.approx(-2)
+    assert list(solve_linear_algebra("solve [[2, 1], [1, 3]] x = [3, 5]").result["x"]) == pytest.approx([0.8, 1.4])
+
+def test_solve_linear_algebra_singular_matrix_reports_error():
+    from src.engines.linear_algebra import solve_linear_algebra
+    
+    assert "error" in solve_linear_algebra("inverse of [[1, 2], [2, 4]]").result
+
+def test_linear_algebra_loads_uploaded_csv_as_memmap(tmp_path, monkeypatch):
+    import numpy as np
+    from src.engines import datasets
+    from src.engines.linear_algebra import solve_linear_algebra
+    
+    monkeypatch.setattr(datasets, "UPLOAD_DIR", str(tmp_path))
+    datasets.save_upload("m.csv", b"a,b\n2,0\n0,3\n")
+    
+    assert isinstance(datasets.load_array("m.csv"), np.memmap)
+    assert solve_linear_algebra("determinant of m.csv").result["determinant"] == pytest.approx(6)
+    # The memory-mapped copy is not listed as an upload
+    assert datasets.list_uploads() == ["m.csv"]
+
+def test_uploads_are_scoped_to_their_session(tmp_path, monkeypatch):
+    from src.engines import datasets
+    from src.engines.linear_algebra import solve_linear_algebra
+    
+    monkeypatch.setattr(datasets, "UPLOAD_DIR", str(tmp_path))
+    datasets.save_upload("m.csv", b"2,0\n0,3\n", session_id="alice")
+    datasets.save_upload("m.csv", b"1,0\n0,1\n", session_id="bob")
+    datasets.save_upload("ragged.csv", b"1,2\n3\n", session_id="bob")
+    
+    assert datasets.list_uploads("alice") == ["m.csv"]
+    assert datasets.list_uploads("bob") == ["m.csv", "ragged.csv"]
+    with datasets.upload_scope("alice"):
+        assert solve_linear_algebra("determinant of m.csv").result["determinant"] == pytest.approx(6)
+    with datasets.upload_scope("bob"):
+        assert solve_linear_algebra("determinant of m.csv").result["determinant"] == pytest.approx(1)
+        with pytest.raises(datasets.DatasetError):
+            datasets.load_array("ragged.csv")
+    with datasets.upload_scope("mallory"):
+        assert datasets.find_file_reference("determinant of m.csv") is None
+
+def test_solve_statistics_coin_flips():
+    from src.engines.statistics import solve_statistics
+    
+    result = solve_statistics("What's the probability of getting at least 2 heads in 5 coin flips?")
+    assert result.values["P(X >= 2)"] == pytest.approx(26 / 32)
+
+def test_solve_statistics_descriptive_and_regression():
+    from src.engines.statistics import solve_statistics
+    
+    descriptive = solve_statistics("mean and median of 2, 4, 4, 4, 5, 5, 7, 9")
+    assert descriptive.values["mean"] == pytest.approx(5)
+    assert descriptive.values["median"] == pytest.approx(4.5)
+    
+    regression = solve_statistics("linear regression x [1, 2, 3, 4] y [3, 5, 7, 9]")
+    assert regression.values["slope"] == pytest.approx(2)
+    assert regression.values["intercept"] == pytest.approx(1)
+
+@pytest.mark.parametrize("question", [
+    "paired t-test of [1, 2, 3] and [2, 3]",
+    "linear regression x [1, 2, 3] y [3, 5]",
+    "chi-square test of [10, 20, 30] expected [20, 40]",
+    "95% confidence interval for [5]",
+    "z-test of [3, 3, 3] with mu = 1",
+    "binomial n = 10 p = 1.5 P(X = 3)",
+])
+def test_solve_statistics_rejects_mismatched_or_undefined_inputs(question):
+    from src.engines.statistics import solve_statistics, StatisticsParseError
+    
+    with pytest.raises(StatisticsParseError):
+        solve_statistics(question)
+
+def test_solve_statistics_selects_csv_column_by_name(tmp_path, monkeypatch):
+    from src.engines import datasets
+    from src.engines.statistics import solve_statistics
+    
+    monkeypatch.setattr(datasets, "UPLOAD_DIR", str(tmp_path))
+    datasets.save_upload("scores.csv", b"age,score\n20,70\n30,80\n40,90\n")
+    
+    result = solve_statistics("mean of column score in scores.csv")
+    assert result.values["mean"] == pytest.approx(80)
+
+def _counting_tool(name="Counter"):
+    from langchain.agents import Tool
+    
+    calls = []
+    
+    def func(tool_input):
+        calls.append(tool_input)
+        return f"result for {tool_input}"
+    
+    return Tool(name=name, func=func, description="Counts calls"), calls
+
+def test_memoize_tool_global_policy_reuses_results():
+    from src.cache.tool_cache import memoize_tool, clear_tool_cache
+    
+    clear_tool_cache()
+    tool, calls = _counting_tool()
+    memoized = memoize_tool(tool, policy="global")
+    
+    assert memoized.run("2 + 2") == memoized.run("2  +  2") == "result for 2 + 2"
+    assert len(calls) == 1
+
+def test_memoize_tool_request_policy_is_scoped_to_one_request():
+    from src.cache.tool_cache import memoize_tool, tool_cache_scope
+    
+    tool, calls = _counting_tool()
+    memoized = memoize_tool(tool, policy="request")
+    
+    with tool_cache_scope("session-a"):
+        memoized.run("x")
+        memoized.run("x")
+    with tool_cache_scope("session-a"):
+        memoized.run("x")
+    memoized.run("x")  # Outside any request nothing is cached
+    
+    assert len(calls) == 3
+
+def test_memoize_tool_session_policy_is_isolated_per_session():
+    from src.cache.tool_cache import memoize_tool, tool_cache_scope, get_tool_cache_stats
+    
+    tool, calls = _counting_tool("SessionCounter")
+    memoized = memoize_tool(tool, policy="session")
+    
+    for session_id in ("a", "b", "a"):
+        with tool_cache_scope(session_id):
+            memoized.run("y")
+    
+    assert len(calls) == 2
+    assert get_tool_cache_stats(["SessionCounter"])["SessionCounter"]["hits"] >= 1
+
+def test_ttl_cache_evicts_least_recently_used():
+    from src.cache.tool_cache import TTLCache
+    
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+
+WIKI_DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <page>
+    <title>Pythagorean theorem</title>
+    <ns>0</ns>
+    <revision><text>{{Short description|Relation in geometry}}
+The '''Pythagorean theorem''' relates the sides of a [[right triangle]]: &lt;math&gt;a^2 + b^2 = c^2&lt;/math&gt;.&lt;ref&gt;Euclid&lt;/ref&gt;
+== Proofs ==
+Many proofs exist.
+[[Category:Theorems in plane geometry]]</text></revision>
+  </page>
+  <page>
+    <title>Pythagoras</title>
+    <ns>0</ns>
+    <redirect title="Pythagoras of Samos" />
+    <revision><text>#REDIRECT [[Pythagoras of Samos]]</text></revision>
+  </page>
+  <page>
+    <title>Football</title>
+    <ns>0</ns>
+    <revision><text>Football is a sport. [[Category:Sports]]</text></revision>
+  </page>
+</mediawiki>
+"""
+
+def test_wikipedia_index_build_and_search(tmp_path):
+    from src.tools.wiki_index import build_index, WikipediaIndex
+    
+    dump = tmp_path / "dump.xml"
+    dump.write_text(WIKI_DUMP)
+    index_path = str(tmp_path / "math.sqlite3")
+    
+    assert build_index(str(dump), index_path) == 1
+    
+    index = WikipediaIndex(index_path)
+    result = index.run("pythagorean theorem triangle")
+    assert result.startswith("Page: Pythagorean theorem")
+    assert "a^2 + b^2 = c^2" in result
+    assert "{{" not in result and "<ref>" not in result
+    assert index.run("football") == ""
+
+def test_tools_are_declared_up_front_and_built_on_first_call():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent.math_agent import build_math_tools
+    from src.tools.registry import TOOL_NAMES, TOOL_SPECS, TOOLS_BUILT
+    from src.utils import metrics
+    
+    before = metrics.get_count(TOOLS_BUILT)
+    tools = build_math_tools(FakeListChatModel(responses=[]))
+    assert tuple(tool.name for tool in tools) == TOOL_NAMES
+    assert [tool.description for tool in tools] == [spec.description for spec in TOOL_SPECS]
+    assert metrics.get_count(TOOLS_BUILT) == before
+    
+    calculator = tools[TOOL_NAMES.index("Calculator")]
+    assert calculator.run("6 * 7") == "Answer: 42"
+    assert calculator.run("6 * 8") == "Answer: 48"
+    assert metrics.get_count(TOOLS_BUILT) == before + 1
+
+def test_built_tools_take_their_description_from_the_registry():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.tools.registry import TOOL_SPECS, _load_factory
+    
+    model = FakeListChatModel(responses=[])
+    for spec in TOOL_SPECS:
+        args = (model,) if spec.model else ()
+        tool = _load_factory(spec.factory)(*args, description=spec.description)
+        assert (tool.name, tool.description) == (spec.name, spec.description)